@@ -0,0 +1,282 @@
+"""Benchmarks of zenodo_rest against the in-process FakeZenodo server
+
+Run from the root of the repository, optionally comparing with a previous run:
+
+    python benchmarks/run.py --output results.json --compare previous.json
+
+Throughputs are measured against localhost, so they show the overhead of this
+package rather than the performance of zenodo.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from zenodo_rest import _json  # noqa: E402
+from zenodo_rest.depositions import actions  # noqa: E402
+from zenodo_rest.entities.deposition import Deposition  # noqa: E402
+from zenodo_rest.entities.record import CompactRecord, Record  # noqa: E402
+from zenodo_rest.testing import FakeZenodo  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def _result(value: float, unit: str, higher_is_better: bool = True) -> dict:
+    return {"value": round(value, 4), "unit": unit, "higher": higher_is_better}
+
+
+def _rate(count: int, fn: Callable[[int], object], workers: int = 1) -> float:
+    start = time.perf_counter()
+    if workers == 1:
+        for i in range(count):
+            fn(i)
+    else:
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(fn, range(count)))
+    return count / (time.perf_counter() - start)
+
+
+def bench_retrieve(fake: FakeZenodo, scale: int) -> dict:
+    client = fake.client(pool_maxsize=8)
+    count = 200 * scale
+    # Concurrent GETs of one id share a request, so every call fetches its own
+    ids = [fake.add_deposition()["id"] for _ in range(count)]
+    fetch = lambda i: Deposition.retrieve(ids[i], client=client)  # noqa: E731
+    sent = len(fake.requests)
+    results = {
+        "retrieve": _rate(count, fetch),
+        "retrieve_8_threads": _rate(count, fetch, workers=8),
+    }
+    assert len(fake.requests) - sent == 2 * count
+    return results
+
+
+def bench_search(fake: FakeZenodo, scale: int) -> dict:
+    client = fake.client()
+    for i in range(100):
+        fake.add_deposition({"title": f"Search {i}"})
+    count = 50 * scale
+    return {
+        "search": _rate(count, lambda _: actions.search(size=10, client=client)),
+        "iter_search_100": _rate(
+            count // 10 or 1,
+            lambda _: list(actions.iter_search(size=25, client=client)),
+        ),
+    }
+
+
+def bench_upload(fake: FakeZenodo, scale: int, tmp: Path) -> dict:
+    client = fake.client(pool_maxsize=8)
+    deposition = Deposition.parse_obj(fake.add_deposition())
+
+    single = tmp / "single.bin"
+    single.write_bytes(os.urandom(16 * MB * scale))
+    start = time.perf_counter()
+    deposition.upload_file(str(single), client=client)
+    single_rate = single.stat().st_size / MB / (time.perf_counter() - start)
+
+    small = tmp / "small"
+    small.mkdir()
+    for i in range(200 * scale):
+        (small / f"{i}.bin").write_bytes(os.urandom(4096))
+    paths = [str(x) for x in small.iterdir()]
+    start = time.perf_counter()
+    deposition.upload_files(paths, max_workers=8, client=client)
+    elapsed = time.perf_counter() - start
+    small_rate = len(paths) * 4096 / MB / elapsed
+
+    start = time.perf_counter()
+    deposition.upload_file(str(small), client=client)
+    zip_rate = len(paths) * 4096 / MB / (time.perf_counter() - start)
+
+    return {
+        "upload_single_file": _result(single_rate, "MB/s"),
+        "upload_small_files": _result(small_rate, "MB/s"),
+        "upload_small_files_per_second": _result(len(paths) / elapsed, "files/s"),
+        "upload_directory_zip": _result(zip_rate, "MB/s"),
+    }
+
+
+def bench_parse(fake: FakeZenodo, scale: int) -> dict:
+    template = fake.add_deposition(
+        {"title": "Parse", "creators": [{"name": "Doe, Jane"}]},
+        files={f"{i}.txt": b"data" for i in range(5)},
+    )
+    count = 10000 * scale
+    hits = [dict(template, id=str(i), record_id=i) for i in range(count)]
+    body = json.dumps(hits)
+    start = time.perf_counter()
+    parsed = json.loads(body)
+    decoded = time.perf_counter() - start
+    start = time.perf_counter()
+    [Deposition.parse_obj(x) for x in parsed]
+    validated = time.perf_counter() - start
+    project = actions.deposition_parser(["id", "doi", "links"])
+    start = time.perf_counter()
+    [project(x) for x in parsed]
+    projected = time.perf_counter() - start
+    start = time.perf_counter()
+    _json.loads(body)
+    fast = time.perf_counter() - start
+    return {
+        "parse_json_per_deposition": _result(decoded / count * 1e6, "us", False),
+        "parse_fast_json_per_deposition": _result(fast / count * 1e6, "us", False),
+        "parse_model_per_deposition": _result(validated / count * 1e6, "us", False),
+        "parse_projection_per_deposition": _result(
+            projected / count * 1e6, "us", False
+        ),
+    }
+
+
+def _retained_bytes(build: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        value = build()  # noqa: F841
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(fake: FakeZenodo, scale: int) -> dict:
+    metadata = {
+        "title": "Memory",
+        "upload_type": "dataset",
+        "access_right": "open",
+        "license": "cc-by-4.0",
+        "keywords": ["climate", "model output"],
+        "creators": [
+            {"name": f"Doe, Jane {i}", "affiliation": "University of Somewhere"}
+            for i in range(3)
+        ],
+        "resource_type": {"type": "dataset", "title": "Dataset"},
+    }
+    files = {f"part-{i}.nc": b"data" for i in range(3)}
+    deposition_id = fake.add_deposition(metadata, files, publish=True)["id"]
+    template = fake.record(deposition_id)
+    count = 5000 * scale
+    # Encoded one by one, so decoding does not share strings between records
+    encoded = [
+        json.dumps(dict(template, id=i, doi=f"10.5072/zenodo.{i}"))
+        for i in range(count)
+    ]
+    plain = _retained_bytes(lambda: [Record.parse_obj(json.loads(x)) for x in encoded])
+    compact = _retained_bytes(
+        lambda: [CompactRecord.parse_obj(json.loads(x)) for x in encoded]
+    )
+    return {
+        "memory_per_record": _result(plain / count, "bytes", False),
+        "memory_per_compact_record": _result(compact / count, "bytes", False),
+    }
+
+
+def bench_cli(repeat: int = 5) -> dict:
+    command = [sys.executable, "-m", "zenodo_rest.cli.cli", "--help"]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    interpreter = time.perf_counter() - start
+    return {
+        "cli_cold_start": _result(statistics.median(times) * 1000, "ms", False),
+        "interpreter_start": _result(interpreter * 1000, "ms", False),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scale: int = 1, latency: float = 0.0) -> dict:
+    results: dict = {}
+    # Every benchmark has a server of its own, so their data do not add up
+    with FakeZenodo(latency=latency) as fake:
+        for name, value in bench_retrieve(fake, scale).items():
+            results[name] = _result(value, "req/s")
+    with FakeZenodo(latency=latency) as fake:
+        for name, value in bench_search(fake, scale).items():
+            results[name] = _result(value, "req/s")
+    with FakeZenodo(latency=latency) as fake, tempfile.TemporaryDirectory() as tmp:
+        results.update(bench_upload(fake, scale, Path(tmp)))
+    with FakeZenodo(latency=latency) as fake:
+        results.update(bench_parse(fake, scale))
+        results.update(bench_memory(fake, scale))
+    results.update(bench_cli())
+    return {
+        "commit": _git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "latency": latency,
+        "results": results,
+    }
+
+
+def compare(current: dict, previous: dict, tolerance: float = 0.05) -> list[str]:
+    lines = []
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if before is None or not before["value"]:
+            continue
+        ratio = result["value"] / before["value"]
+        if not result["higher"]:
+            ratio = 1 / ratio if ratio else float("inf")
+        slower = ratio < 1 - tolerance
+        lines.append(
+            f"{name:32} {before['value']:>12.2f} -> {result['value']:>12.2f} "
+            f"{result['unit']:6} {ratio:6.2f}x {'slower' if slower else ''}"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", help="The json file to write results to")
+    parser.add_argument("--compare", "-c", help="A json file of a previous run")
+    parser.add_argument(
+        "--scale", type=int, default=1, help="Multiplies the amount of work"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every request"
+    )
+    args = parser.parse_args()
+
+    report = run(args.scale, args.latency)
+    for name, result in report["results"].items():
+        print(f"{name:32} {result['value']:>12.2f} {result['unit']}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.compare:
+        print()
+        print("\n".join(compare(report, json.loads(Path(args.compare).read_text()))))
+
+
+if __name__ == "__main__":
+    main()
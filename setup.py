@@ -27,6 +27,7 @@ setup(
     long_description=read("README.md"),
     packages=find_packages(exclude=("tests",)),
     install_requires=["click", "pydantic", "python-dotenv", "requests"],
+    extras_require={"aio": ["httpx"], "fast": ["orjson"]},
     classifiers=[
         "Programming Language :: Python",
         "Programming Language :: Python :: 3",
@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+import pytest
+
+from zenodo_rest.aio import AsyncZenodoClient, depositions
+from zenodo_rest.entities.metadata import Metadata
+from zenodo_rest.retry import RetryPolicy
+from zenodo_rest.testing import FakeZenodo
+
+
+def test_deposition_lifecycle(tmp_path):
+    (tmp_path / "data.txt").write_bytes(b"0123456789" * 1000)
+    tree = tmp_path / "tree"
+    (tree / "sub").mkdir(parents=True)
+    (tree / "sub" / "a.txt").write_bytes(b"a")
+
+    async def run(fake: FakeZenodo):
+        async with AsyncZenodoClient("token", fake.url) as client:
+            created = await depositions.create(client, Metadata(title="Async"))
+            uploads = await asyncio.gather(
+                depositions.upload_file(client, created, str(tmp_path / "data.txt")),
+                depositions.upload_file(client, created, str(tree), stream=True),
+                depositions.upload_file(client, created, str(tree)),
+            )
+            assert [x.key for x in uploads] == ["data.txt", "tree.zip", "tree.zip"]
+            assert uploads[0].size == 10000
+
+            deposition = await depositions.retrieve(client, created.id)
+            files = deposition.files or []
+            assert sorted(x.filename for x in files) == ["data.txt", "tree.zip"]
+            zip_file = next(x for x in files if x.filename == "tree.zip")
+            assert await depositions.delete_file(client, created.id, zip_file.id) == 204
+
+            metadata = deposition.metadata.copy(update={"title": "Renamed"})
+            updated = await depositions.update_metadata(client, created.id, metadata)
+            assert updated.title == "Renamed"
+
+            published = await depositions.publish(client, created.id)
+            assert published.submitted
+            await depositions.new_version(client, created.id)
+            drafts = await depositions.search(client, status="draft", size=5)
+            assert [x.title for x in drafts] == ["Renamed"]
+            assert drafts[0].id != created.id
+
+    with FakeZenodo() as fake:
+        asyncio.run(run(fake))
+    assert "/api/deposit/depositions?status=draft&size=5" in [
+        p for _, p in fake.requests
+    ]
+
+
+def test_non_idempotent_calls_are_verified_before_retrying():
+    async def run(fake: FakeZenodo):
+        policy = RetryPolicy(attempts=3, backoff=0.05)
+        async with AsyncZenodoClient("token", fake.url, retry_policy=policy) as client:
+            fake.fail(503, method="POST")
+            with pytest.raises(httpx.HTTPStatusError):
+                await depositions.create(client)
+            deposition = await depositions.create(client)
+
+            fake.fail(503, path="/actions/publish")
+            published = await depositions.publish(client, deposition.id)
+            assert published.submitted
+
+            fake.fail(504, path="/actions/newversion", applied=True)
+            await depositions.new_version(client, deposition.id)
+
+    with FakeZenodo() as fake:
+        asyncio.run(run(fake))
+    posts = [p for m, p in fake.requests if m == "POST"]
+    assert posts == [
+        "/api/deposit/depositions",
+        "/api/deposit/depositions",
+        "/api/deposit/depositions/1/actions/publish",
+        "/api/deposit/depositions/1/actions/publish",
+        "/api/deposit/depositions/1/actions/newversion",
+    ]
+    assert len(fake.depositions) == 2
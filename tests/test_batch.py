@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from zenodo_rest.cli.cli import cli
+from zenodo_rest.depositions.batch import run_batch
+from zenodo_rest.depositions.poller import PublishPoller
+from zenodo_rest.testing import FakeZenodo
+
+
+@pytest.fixture
+def poller(monkeypatch):
+    poller = PublishPoller(interval=0.01)
+    monkeypatch.setattr(PublishPoller, "_default", poller)
+    return poller
+
+
+def test_batch_runs_every_operation(tmp_path, poller):
+    (tmp_path / "data.csv").write_text("a,b\n1,2\n")
+    with FakeZenodo() as fake:
+        draft, upload, publish, delete = (
+            fake.add_deposition({"title": f"Draft {i}"})["id"] for i in range(4)
+        )
+        published = fake.add_deposition(publish=True)["id"]
+        # Publishing is answered late, the poller sees it through
+        fake.fail(504, path=f"/{publish}/actions/publish", applied=True)
+        lines = [
+            json.dumps({"op": "create", "metadata": {"title": "Created"}}),
+            json.dumps({"op": "update", "id": draft, "metadata": {"title": "New"}}),
+            json.dumps(
+                {"op": "upload", "id": upload, "files": [str(tmp_path / "data.csv")]}
+            ),
+            "",
+            "# a comment",
+            json.dumps({"op": "publish", "id": publish}),
+            json.dumps({"op": "new-version", "id": published}),
+            json.dumps({"op": "delete", "id": delete}),
+            "{not json",
+            json.dumps({"op": "rename", "id": draft}),
+        ]
+        results = list(run_batch(lines, max_workers=2, client=fake.client()))
+
+    by_line = {x["line"]: x for x in results}
+    assert sorted(by_line) == [1, 2, 3, 6, 7, 8, 9, 10]
+    assert all(by_line[n]["ok"] for n in (1, 2, 3, 6, 7, 8))
+    assert by_line[1]["result"]["title"] == "Created"
+    assert fake.depositions[draft]["metadata"]["title"] == "New"
+    assert by_line[3]["result"]["files"][0]["key"] == "data.csv"
+    assert by_line[6]["result"]["submitted"]
+    assert "latest_draft" in by_line[7]["result"]["links"]
+    assert delete not in fake.depositions
+    assert by_line[9]["error"].startswith("JSONDecodeError")
+    assert by_line[10] == {
+        "line": 10,
+        "op": "rename",
+        "ok": False,
+        "error": "ValueError: Unknown operation 'rename'",
+        "seconds": by_line[10]["seconds"],
+    }
+    assert poller.pending == 0
+
+
+def test_batch_command_streams_results_and_fails_on_errors(tmp_path, poller):
+    with FakeZenodo() as fake:
+        ids = [fake.add_deposition()["id"] for _ in range(20)]
+        manifest = tmp_path / "manifest.jsonl"
+        manifest.write_text(
+            "\n".join(json.dumps({"op": "publish", "id": x}) for x in ids + ["999"])
+        )
+        result = CliRunner().invoke(
+            cli,
+            ["depositions", "batch", str(manifest), "--max-workers", "2"],
+            env={"ZENODO_URL": fake.url, "ZENODO_TOKEN": "token"},
+        )
+
+    assert result.exit_code == 1
+    lines = [json.loads(x) for x in result.output.splitlines()[:-1]]
+    assert len(lines) == 21
+    assert sum(x["ok"] for x in lines) == 20
+    assert "1 operations failed" in result.output
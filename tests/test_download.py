@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+
+import pytest
+import requests
+from click.testing import CliRunner
+
+from zenodo_rest.cli.cli import cli
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.exceptions import UnsafePath
+from zenodo_rest.files.download import download_file, download_files, remote_files
+from zenodo_rest.records import actions as records
+from zenodo_rest.testing import FakeZenodo
+
+
+@pytest.mark.parametrize("key", ["../escape.txt", "nested/../../escape.txt"])
+def test_keys_leading_outside_of_dest_are_rejected(tmp_path, key):
+    with FakeZenodo() as fake:
+        client = fake.client()
+        deposition = fake.add_deposition(files={key: b"payload"}, publish=True)
+        record = records.retrieve(deposition["record_id"], client=client)
+        with pytest.raises(UnsafePath):
+            download_files(record, str(tmp_path / "dest"), client=client)
+        assert not any(p.startswith("/api/files/") for _, p in fake.requests)
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_absolute_keys_are_rejected(tmp_path):
+    with FakeZenodo() as fake:
+        client = fake.client()
+        target = tmp_path / "absolute.txt"
+        deposition = fake.add_deposition(files={str(target): b"payload"}, publish=True)
+        record = records.retrieve(deposition["record_id"], client=client)
+        with pytest.raises(UnsafePath):
+            download_files(record, str(tmp_path / "dest"), client=client)
+    assert not target.exists()
+
+
+def test_deposition_files_without_links_are_skipped(caplog):
+    with FakeZenodo() as fake:
+        files = {"a.txt": b"a", "b.txt": b"b"}
+        deposition = Deposition.parse_obj(fake.add_deposition(files=files))
+    assert deposition.files is not None
+    deposition.files[0].links = None
+
+    with caplog.at_level(logging.WARNING):
+        remotes = remote_files(deposition)
+    assert [x.name for x in remotes] == [deposition.files[1].filename]
+    assert f"Skipping {deposition.files[0].filename}" in caplog.text
+
+
+def test_segmented_downloads_resume_from_the_finished_segments(tmp_path):
+    data = bytes(range(256)) * 4
+    with FakeZenodo() as fake:
+        client = fake.client()
+        deposition = fake.add_deposition(files={"data.bin": data}, publish=True)
+        record = records.retrieve(deposition["record_id"], client=client)
+        remote = remote_files(record)[0]
+        dest = tmp_path / "dest"
+
+        fake.fail(500, method="GET", path="/api/files/")
+        with pytest.raises(requests.HTTPError):
+            # One segment at a time, so the first one fails
+            download_file(
+                remote, str(dest), segment_size=100, max_segments=1, client=client
+            )
+        assert sorted(json.loads((dest / "data.bin.part.json").read_text())) == list(
+            range(100, 1024, 100)
+        )
+
+        sent = len(fake.requests)
+        path = download_file(remote, str(dest), segment_size=100, client=client)
+        assert len(fake.requests) == sent + 1
+    assert path.read_bytes() == data
+    assert sorted(x.name for x in dest.iterdir()) == ["data.bin"]
+
+
+def _bucket_gets(fake: FakeZenodo) -> list[str]:
+    return [p for m, p in fake.requests if m == "GET" and p.startswith("/api/files/")]
+
+
+def test_download_files_skips_files_already_verified(tmp_path):
+    files = {"large.bin": os.urandom(1000), "a.txt": b"a", "b.txt": b"b" * 50}
+    dest = tmp_path / "dest"
+    with FakeZenodo() as fake:
+        client = fake.client()
+        deposition = fake.add_deposition(files=files, publish=True)
+        record = records.retrieve(deposition["record_id"], client=client)
+
+        paths = download_files(
+            record, str(dest), max_workers=3, segment_size=100, client=client
+        )
+        assert [x.name for x in paths] == [x.key for x in record.files]
+        assert {x.name: x.read_bytes() for x in paths} == files
+        assert len(_bucket_gets(fake)) == 10 + 2
+
+        # Files of the right size and checksum are not fetched again
+        sent = len(fake.requests)
+        download_files(record, str(dest), segment_size=100, client=client)
+        assert len(fake.requests) == sent
+
+        # A file of the right size but with other contents is
+        (dest / "b.txt").write_bytes(b"c" * 50)
+        download_files(record, str(dest), segment_size=100, client=client)
+        assert _bucket_gets(fake)[-1].endswith("/b.txt")
+        assert len(_bucket_gets(fake)) == 13
+    assert (dest / "b.txt").read_bytes() == files["b.txt"]
+
+
+def test_large_files_are_streamed_without_ranges(tmp_path):
+    data = os.urandom(1000)
+    with FakeZenodo(ranges=False) as fake:
+        client = fake.client()
+        deposition = fake.add_deposition(files={"data.bin": data}, publish=True)
+        record = records.retrieve(deposition["record_id"], client=client)
+        path = download_file(
+            remote_files(record)[0],
+            str(tmp_path),
+            segment_size=100,
+            max_segments=1,
+            client=client,
+        )
+        # The first range is answered with the whole file, then it is streamed
+        assert len(_bucket_gets(fake)) == 10 + 1
+    assert path.read_bytes() == data
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["data.bin"]
+
+
+def test_download_commands(tmp_path):
+    files = {"a.txt": b"a", "b.txt": b"b"}
+    with FakeZenodo() as fake:
+        env = {"ZENODO_URL": fake.url, "ZENODO_TOKEN": "token"}
+        published = fake.add_deposition(files=files, publish=True)
+        draft = fake.add_deposition(files={"draft.txt": b"draft"})
+        deposition_json = tmp_path / "deposition.json"
+        deposition_json.write_text(json.dumps(draft))
+        runner = CliRunner()
+
+        result = runner.invoke(
+            cli,
+            ["records", "download", str(published["record_id"]), str(tmp_path / "r")],
+            env=env,
+        )
+        assert result.exit_code == 0, result.output
+        assert sorted(result.output.split()) == [
+            str(tmp_path / "r" / name) for name in sorted(files)
+        ]
+
+        result = runner.invoke(
+            cli,
+            ["depositions", "download", str(deposition_json), str(tmp_path / "d")],
+            env=env,
+        )
+        assert result.exit_code == 0, result.output
+        assert result.output.split() == [str(tmp_path / "d" / "draft.txt")]
+    assert (tmp_path / "r" / "a.txt").read_bytes() == b"a"
+    assert (tmp_path / "d" / "draft.txt").read_bytes() == b"draft"
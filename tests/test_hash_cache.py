@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+from click.testing import CliRunner
+
+from zenodo_rest.cli.cache import cache
+from zenodo_rest.files import hash_cache
+from zenodo_rest.files.hash_cache import HashCache
+
+
+def test_entries_are_kept_until_a_file_changes(tmp_path, monkeypatch):
+    hashed = []
+
+    def md5_file(path):
+        hashed.append(path)
+        return "md5-%d" % len(hashed)
+
+    monkeypatch.setattr(hash_cache, "md5_file", md5_file)
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"data")
+    cache = HashCache(str(tmp_path / "hashes.sqlite"))
+
+    assert cache.md5(str(path)) == "md5-1"
+    assert cache.md5(str(path)) == "md5-1"
+    assert len(hashed) == 1
+
+    # A new mtime, even of the same contents
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert cache.md5(str(path)) == "md5-2"
+
+    # Replaced by a file of the same size and mtime
+    stat = path.stat()
+    replacement = tmp_path / "replacement.bin"
+    replacement.write_bytes(b"atad")
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, path)
+    assert path.stat().st_ino != stat.st_ino
+    assert cache.md5(str(path)) == "md5-3"
+    assert cache.md5(str(path)) == "md5-3"
+    assert len(hashed) == 3
+    cache.close()
+
+
+def test_large_files_are_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(hash_cache, "MMAP_THRESHOLD", 16)
+    monkeypatch.setattr(hash_cache, "BUFFER_SIZE", 7)
+    path = tmp_path / "data.bin"
+    data = os.urandom(100)
+    path.write_bytes(data)
+    assert hash_cache.md5_file(str(path)) == hashlib.md5(data).hexdigest()
+
+
+def test_older_schemas_are_dropped(tmp_path):
+    db = sqlite3.connect(tmp_path / "hashes.sqlite")
+    db.execute("CREATE TABLE hashes (path TEXT PRIMARY KEY, md5 TEXT)")
+    db.execute("INSERT INTO hashes VALUES ('/old', 'abc')")
+    db.execute("PRAGMA user_version=1")
+    db.commit()
+    db.close()
+
+    cache = HashCache(str(tmp_path / "hashes.sqlite"))
+    assert cache.stats()["entries"] == 0
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"data")
+    assert cache.md5(str(path)) == hashlib.md5(b"data").hexdigest()
+    cache.close()
+
+
+def test_prune_prefixes_are_not_patterns(tmp_path):
+    cache = HashCache(str(tmp_path / "hashes.sqlite"))
+    for name in ("a_%b", "axyb"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "data.bin").write_bytes(b"data")
+        cache.md5(str(tmp_path / name / "data.bin"))
+        (tmp_path / name / "data.bin").unlink()
+
+    assert cache.prune(str(tmp_path / "a_%b")) == 1
+    assert cache.stats()["entries"] == 1
+    assert cache.prune(str(tmp_path)) == 1
+    assert cache.stats()["entries"] == 0
+    cache.close()
+
+
+def test_cache_command(tmp_path):
+    database = str(tmp_path / "hashes.sqlite")
+    cache_ = HashCache(database)
+    for name in ("kept.bin", "deleted.bin"):
+        (tmp_path / name).write_bytes(name.encode())
+        cache_.md5(str(tmp_path / name))
+    cache_.close()
+    (tmp_path / "deleted.bin").unlink()
+    runner = CliRunner()
+
+    result = runner.invoke(cache, ["--path", database, "info"])
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output)["entries"] == 2
+
+    result = runner.invoke(cache, ["--path", database, "prune"])
+    assert result.output == "Removed 1 stale entries\n"
+
+    result = runner.invoke(cache, ["--path", database, "clear"], input="n\n")
+    assert result.exit_code == 1
+    result = runner.invoke(cache, ["--path", database, "clear", "--yes"])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(cache, ["--path", database, "info"])
+    assert json.loads(result.output)["entries"] == 0
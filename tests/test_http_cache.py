@@ -0,0 +1,77 @@
+from zenodo_rest.depositions import actions
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.hooks import ClientHooks
+from zenodo_rest.http_cache import CacheEntry, ResponseCache, cache_key
+from zenodo_rest.records import actions as records
+from zenodo_rest.testing import FakeZenodo
+
+
+class Recorder(ClientHooks):
+    def __init__(self):
+        self.sent = []
+
+    def before_request(self, method, url, headers):
+        self.sent.append(dict(headers))
+
+    def after_response(self, method, url, response, elapsed, error=None):
+        self.sent[-1]["status"] = response.status_code
+
+
+def test_gets_are_revalidated_and_invalidated_by_modifications(tmp_path):
+    recorder = Recorder()
+    with FakeZenodo() as fake:
+        deposition_id = fake.add_deposition({"title": "Cached"})["id"]
+        record_id = fake.add_deposition(publish=True)["id"]
+        cache = ResponseCache(directory=str(tmp_path))
+        client = fake.client(cache=cache, hooks=[recorder])
+
+        first = Deposition.retrieve(deposition_id, client=client)
+        assert "If-None-Match" not in recorder.sent[-1]
+        assert Deposition.retrieve(deposition_id, client=client).dict() == first.dict()
+        assert recorder.sent[-1]["status"] == 304
+        assert recorder.sent[-1]["If-None-Match"].startswith('"')
+        assert "If-Modified-Since" in recorder.sent[-1]
+
+        # Revalidated from disk by a new client, e.g. the next CLI invocation
+        other = fake.client(
+            cache=ResponseCache(directory=str(tmp_path)), hooks=[recorder]
+        )
+        assert Deposition.retrieve(deposition_id, client=other).dict() == first.dict()
+        assert recorder.sent[-1]["status"] == 304
+        records.retrieve(record_id, client=client)
+        records.retrieve(record_id, client=client)
+        assert recorder.sent[-1]["status"] == 304
+
+        metadata = first.metadata.copy(update={"title": "Changed"})
+        actions.update_metadata(deposition_id, metadata, client=client)
+        changed = Deposition.retrieve(deposition_id, client=client)
+        assert changed.title == "Changed"
+        assert "If-None-Match" not in recorder.sent[-1]
+        assert recorder.sent[-1]["status"] == 200
+
+
+def test_cached_values_are_not_shared_between_callers():
+    with FakeZenodo() as fake:
+        deposition_id = fake.add_deposition({"title": "Served"})["id"]
+        client = fake.client(cache=ResponseCache())
+        deposition = Deposition.retrieve(deposition_id, client=client)
+        deposition.metadata.title = "Edited locally"
+
+        again = Deposition.retrieve(deposition_id, client=client)
+    assert fake.requests[-1] == ("GET", f"/api/deposit/depositions/{deposition_id}")
+    assert again.metadata.title == "Served"
+    assert again is not deposition
+
+
+def test_disk_entries_are_limited_and_dropped_by_url(tmp_path):
+    cache = ResponseCache(max_entries=1, directory=str(tmp_path), max_disk_entries=10)
+    urls = [f"https://zenodo.org/api/deposit/depositions/{i}" for i in range(25)]
+    for url in urls:
+        cache.put(cache_key(url, "Bearer a"), CacheEntry('"etag"', None, "{}"))
+    assert len(list(tmp_path.glob("*.json"))) <= 10
+
+    cache.invalidate(urls[-1])
+    reopened = ResponseCache(directory=str(tmp_path))
+    assert reopened.get(cache_key(urls[-1], "Bearer a")) is None
+    assert reopened.get(cache_key(urls[-2], "Bearer a")).etag == '"etag"'
+    assert reopened.get(cache_key(urls[-2], "Bearer b")) is None
@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+# Cumulative microseconds of importing the modules, excluding the interpreter
+BUDGETS = {
+    "zenodo_rest": 20_000,
+    "zenodo_rest.cli.cli": 60_000,
+}
+
+
+def import_time(statement: str) -> dict[str, int]:
+    """The cumulative import time of every module imported by a statement"""
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_heavy_dependencies_are_imported_lazily():
+    times = import_time("import zenodo_rest; from zenodo_rest.entities import Metadata")
+    for heavy in ("requests", "click", "dotenv", "zenodo_rest.cli"):
+        assert heavy not in times
+    assert "zenodo_rest.entities.deposition" not in times
+
+    times = import_time("import zenodo_rest.cli.cli")
+    assert "requests" not in times
+    assert "zenodo_rest.cli.depositions" not in times
+
+
+def test_import_time_budget():
+    for module, budget in BUDGETS.items():
+        # The best of a few runs, to not fail on a busy machine
+        best = min(import_time(f"import {module}")[module] for _ in range(3))
+        assert best <= budget, f"importing {module} took {best}us"
@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.depositions import actions
+from zenodo_rest.entities.deposition import Deposition
+
+
+def deposition_json(base_url: str, deposition_id: str, **links) -> dict:
+    return {
+        "created": "2022-01-01T00:00:00",
+        "doi": None,
+        "doi_url": None,
+        "files": [],
+        "id": deposition_id,
+        "links": {
+            "self": f"{base_url}/api/deposit/depositions/{deposition_id}",
+            **{k: f"{base_url}/api/deposit/depositions/{v}" for k, v in links.items()},
+        },
+        "metadata": {},
+        "modified": "2022-01-01T00:00:00",
+        "owner": 1,
+        "record_id": int(deposition_id),
+        "record_url": None,
+        "state": "done",
+        "submitted": True,
+        "title": "",
+    }
+
+
+class CountingServer(BaseHTTPRequestHandler):
+    """Serves version 1 of a deposition whose latest version is 2 and draft is 3"""
+
+    protocol_version = "HTTP/1.1"
+    requests: list = []
+    delay: float = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _deposition(self, deposition_id: str) -> dict:
+        base_url = f"http://{self.headers['Host']}"
+        return deposition_json(base_url, deposition_id, latest="2", latest_draft="3")
+
+    def do_GET(self):
+        self.requests.append(("GET", self.path))
+        time.sleep(self.delay)
+        self._send(self._deposition(self.path.rsplit("/", 1)[1]))
+
+    def do_POST(self):
+        self.requests.append(("POST", self.path))
+        self._send(self._deposition(self.path.split("/")[4]))
+
+
+@pytest.fixture
+def server():
+    CountingServer.requests = []
+    CountingServer.delay = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), CountingServer)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def deposition_file(server, tmp_path):
+    path = tmp_path / "deposition.json"
+    path.write_text(json.dumps(deposition_json(server, "1")))
+    return path
+
+
+def test_new_version_resolves_latest_from_links(server, deposition_file):
+    # The calls of the new-version command
+    client = ZenodoClient(base_url=server, token="token")
+    deposition = Deposition.parse_file(deposition_file)
+    actions.new_version(deposition.latest_id(client=client), client=client)
+
+    assert CountingServer.requests == [
+        ("GET", "/api/deposit/depositions/1"),
+        ("POST", "/api/deposit/depositions/2/actions/newversion"),
+    ]
+
+
+def test_fresh_links_are_reused(server):
+    client = ZenodoClient(base_url=server, token="token")
+    deposition = Deposition.retrieve("1", client=client)
+
+    assert deposition.latest_draft_id(max_staleness=60, client=client) == "3"
+    assert deposition.get_latest_draft(client=client, max_staleness=60).id == "3"
+    assert len(CountingServer.requests) == 2
+
+    # A deposition read from a file is never fresh
+    stale = Deposition.parse_raw(deposition.json())
+    assert stale.latest_id(max_staleness=60, client=client) == "2"
+    assert len(CountingServer.requests) == 3
+
+
+def test_concurrent_lookups_share_a_request(server):
+    CountingServer.delay = 0.2
+    client = ZenodoClient(base_url=server, token="token")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(lambda _: Deposition.retrieve("1", client=client), range(8))
+        )
+
+    assert {x.id for x in results} == {"1"}
+    assert CountingServer.requests == [("GET", "/api/deposit/depositions/1")]
@@ -0,0 +1,53 @@
+from zenodo_rest.depositions import actions
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.entities.metadata import Metadata
+from zenodo_rest.hooks import ClientHooks
+from zenodo_rest.metrics import MetricsCollector, endpoint, export_text
+from zenodo_rest.retry import RetryPolicy
+from zenodo_rest.testing import FakeZenodo
+
+
+def test_endpoints_are_named():
+    base = "https://zenodo.org/api"
+    assert endpoint("POST", f"{base}/deposit/depositions") == "create"
+    assert endpoint("GET", f"{base}/deposit/depositions?page=2") == "search"
+    assert endpoint("GET", f"{base}/deposit/depositions/12") == "retrieve"
+    assert endpoint("POST", f"{base}/deposit/depositions/12/actions/publish") == (
+        "publish"
+    )
+    assert endpoint("PUT", f"{base}/files/abc/data.zip") == "bucket_put"
+    assert endpoint("GET", "https://example.org/") == "other"
+
+
+def test_requests_are_measured_per_endpoint(tmp_path):
+    class Tracing(ClientHooks):
+        def before_request(self, method, url, headers):
+            headers["X-Trace"] = "1"
+
+    collector = MetricsCollector()
+    with FakeZenodo() as fake:
+        client = fake.client(
+            hooks=[collector, Tracing()],
+            retry_policy=RetryPolicy(attempts=3, backoff=0),
+        )
+        deposition = Deposition.create(Metadata(title="Measured"), client=client)
+        (tmp_path / "data.bin").write_bytes(b"x" * 1000)
+        deposition.upload_file(str(tmp_path / "data.bin"), client=client)
+        fake.fail(503, path="/actions/publish")
+        actions.publish(deposition.id, client=client)
+
+    summary = collector.summary()
+    assert summary["create"]["statuses"] == {"201": 1}
+    assert summary["bucket_put"]["bytes_sent"] == 1000
+    assert summary["publish"]["statuses"] == {"503": 1, "202": 1}
+    assert summary["publish"]["retries"] == 1
+    # The publication was verified to not have happened before retrying
+    assert summary["retrieve"]["requests"] == 1
+
+    text = export_text(collector)
+    assert 'zenodo_rest_requests_total{endpoint="publish",status="503"} 1' in text
+    assert 'zenodo_rest_retries_total{endpoint="publish"} 1' in text
+    assert (
+        'zenodo_rest_request_duration_seconds_bucket{endpoint="create",le="+Inf"} 1'
+        in text
+    )
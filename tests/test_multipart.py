@@ -0,0 +1,97 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from requests import HTTPError
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.files.multipart import UploadCheckpoint, upload_resumable
+
+
+class MultipartBucket(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    uploads: dict = {}
+    files: dict = {}
+    part_puts: list = []
+    fail_parts: set = set()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: dict, status: int = 200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _query(self):
+        url = urlparse(self.path)
+        return url.path.rsplit("/", 1)[1], parse_qs(url.query, keep_blank_values=True)
+
+    def do_POST(self):
+        key, query = self._query()
+        if "uploads" in query:
+            upload_id = f"upload-{len(self.uploads)}"
+            self.uploads[upload_id] = {}
+            return self._send({"id": upload_id})
+        parts = self.uploads.pop(query["uploadId"][0])
+        self.files[key] = b"".join(parts[n] for n in sorted(parts))
+        checksum = f"md5:{hashlib.md5(self.files[key]).hexdigest()}"
+        self._send({"key": key, "size": len(self.files[key]), "checksum": checksum})
+
+    def do_PUT(self):
+        key, query = self._query()
+        data = self.rfile.read(int(self.headers["Content-Length"]))
+        part_number = int(query["partNumber"][0])
+        self.part_puts.append(part_number)
+        if part_number in self.fail_parts:
+            self.fail_parts.discard(part_number)
+            return self._send({"message": "internal error"}, 500)
+        self.uploads[query["uploadId"][0]][part_number] = data
+        self._send({})
+
+    def do_GET(self):
+        key, query = self._query()
+        upload = self.uploads.get(query["uploadId"][0])
+        if upload is None:
+            return self._send({}, 404)
+        self._send({"parts": [{"part_number": n} for n in upload]})
+
+
+@pytest.fixture
+def bucket_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MultipartBucket)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/api/files/bucket"
+    server.shutdown()
+
+
+def test_upload_resumes_after_failed_part(bucket_url, tmp_path):
+    content = bytes(range(256)) * 40
+    path = tmp_path / "data.bin"
+    path.write_bytes(content)
+    checkpoints = tmp_path / "checkpoints"
+    client = ZenodoClient(token="token")
+    MultipartBucket.fail_parts.add(3)
+
+    with pytest.raises(HTTPError):
+        upload_resumable(
+            bucket_url, path, part_size=1024, checkpoint_dir=checkpoints, client=client
+        )
+    checkpoint = UploadCheckpoint(bucket_url, "data.bin", checkpoints)
+    assert checkpoint.load(len(content), path.stat().st_mtime_ns, 1024)
+    assert checkpoint.parts == {0, 1, 2}
+
+    MultipartBucket.part_puts.clear()
+    result = upload_resumable(
+        bucket_url, path, part_size=1024, checkpoint_dir=checkpoints, client=client
+    )
+    assert MultipartBucket.part_puts == [3, 4, 5, 6, 7, 8, 9]
+    assert result["size"] == len(content)
+    assert result["checksum"] == f"md5:{hashlib.md5(content).hexdigest()}"
+    assert MultipartBucket.files["data.bin"] == content
+    assert not checkpoint.path.exists()
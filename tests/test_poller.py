@@ -0,0 +1,79 @@
+import pytest
+import requests
+
+from zenodo_rest.depositions import actions
+from zenodo_rest.depositions.poller import PublishPoller
+from zenodo_rest.retry import RetryPolicy
+from zenodo_rest.testing import FakeZenodo
+
+
+@pytest.fixture
+def fake():
+    with FakeZenodo() as fake:
+        yield fake
+
+
+def publishes(fake: FakeZenodo) -> list[str]:
+    return [m for m, p in fake.requests if "/actions/publish" in p or m == "GET"]
+
+
+def test_publish_is_sent_again_when_it_was_not_applied(fake):
+    deposition_id = fake.add_deposition()["id"]
+    client = fake.client(retry_policy=RetryPolicy(attempts=3, backoff=0.01))
+    poller = PublishPoller(interval=0.01)
+    fake.fail(503, times=2, path="/actions/publish")
+
+    future = actions.publish(deposition_id, client=client, wait=False, poller=poller)
+    assert future.result(timeout=5).submitted
+    assert publishes(fake) == ["POST", "GET", "POST", "GET", "POST"]
+    assert poller.pending == 0
+
+
+def test_publish_applied_despite_an_error_is_only_polled(fake):
+    deposition_id = fake.add_deposition()["id"]
+    poller = PublishPoller(interval=0.01)
+    fake.fail(504, path="/actions/publish", applied=True)
+
+    future = actions.publish(
+        deposition_id, client=fake.client(), wait=False, poller=poller
+    )
+    assert future.result(timeout=5).submitted
+    assert publishes(fake) == ["POST", "GET"]
+
+
+def test_publish_fails_with_the_last_error_once_retries_are_exhausted(fake):
+    deposition_id = fake.add_deposition()["id"]
+    client = fake.client(retry_policy=RetryPolicy(attempts=1, backoff=0.01))
+    poller = PublishPoller(interval=0.01)
+    fake.fail(500, times=3, path="/actions/publish")
+    fake.fail(429, path="/actions/publish")
+
+    future = actions.publish(
+        deposition_id, retries=2, client=client, wait=False, poller=poller
+    )
+    with pytest.raises(requests.HTTPError, match="500"):
+        future.result(timeout=5)
+    assert publishes(fake).count("POST") == 3
+
+    # Throttled publications are sent again too
+    future = actions.publish(
+        deposition_id, retries=1, client=client, wait=False, poller=poller
+    )
+    assert future.result(timeout=5).submitted
+
+
+def test_watched_depositions_time_out_and_fail_on_client_errors(fake):
+    drafts = [fake.add_deposition()["id"] for _ in range(3)]
+    client = fake.client()
+    poller = PublishPoller(interval=0.01, max_interval=0.02, timeout=0.2)
+    futures = [poller.watch(x, client=client) for x in drafts]
+    missing = poller.watch("404", client=client)
+    assert poller.pending == 4
+
+    actions.publish(drafts[0], client=client)
+    assert futures[0].result(timeout=5).submitted
+    for future in futures[1:]:
+        with pytest.raises(TimeoutError):
+            future.result(timeout=5)
+    with pytest.raises(requests.HTTPError):
+        missing.result(timeout=5)
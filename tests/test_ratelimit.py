@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from zenodo_rest.ratelimit import RateLimiter, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after(None) == 0
+    assert parse_retry_after("soon") == 0
+    date = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert parse_retry_after(date, now=1445412480 - 10) == 10
+
+
+def test_concurrency_is_halved_when_throttled_and_grows_back():
+    limiter = RateLimiter(max_concurrency=8)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(429)
+    assert limiter.concurrency == 2
+    assert limiter.throttled == 2
+
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(200)
+    assert 2 < limiter.concurrency <= 8
+
+
+def test_retry_after_pauses_sync_and_async_callers():
+    limiter = RateLimiter()
+    limiter.acquire()
+    limiter.release(429, {"Retry-After": "0.2"})
+
+    start = time.monotonic()
+    limiter.acquire()
+    limiter.release(200)
+    assert time.monotonic() - start >= 0.15
+
+    limiter.acquire()
+    limiter.release(429, {"Retry-After": "0.2"})
+    start = time.monotonic()
+    asyncio.run(limiter.acquire_async())
+    assert time.monotonic() - start >= 0.15
+
+
+def test_rate_follows_the_remaining_quota():
+    limiter = RateLimiter(burst=1)
+    limiter.acquire()
+    reset = str(time.time() + 10)
+    limiter.release(200, {"X-RateLimit-Remaining": "20", "X-RateLimit-Reset": reset})
+    assert 1.9 < limiter.rate <= 2.1
+
+    # The single token of the bucket is refilled after half a second
+    start = time.monotonic()
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(200)
+    assert time.monotonic() - start >= 0.4
@@ -0,0 +1,78 @@
+import pickle
+
+from click.testing import CliRunner
+
+from zenodo_rest.cli.cli import cli
+from zenodo_rest.entities.record import CompactRecord
+from zenodo_rest.files.download import remote_files
+from zenodo_rest.records import actions
+from zenodo_rest.records.harvest import HarvestCheckpoint, harvest_hits
+from zenodo_rest.testing import FakeZenodo
+
+
+def test_compact_records_equal_records_and_share_strings():
+    with FakeZenodo() as fake:
+        for i in range(3):
+            fake.add_deposition(
+                {"title": f"Paper {i}", "license": "cc-by-4.0"},
+                files={"data.csv": b"a,b"},
+                publish=True,
+            )
+        client = fake.client()
+        records = list(actions.iter_records(client=client))
+        compact = list(actions.iter_records(size=1, client=client, compact=True))
+
+    assert [x.to_record() for x in compact] == records
+    assert CompactRecord.from_record(records[0]) == compact[0]
+    assert not hasattr(compact[0], "__dict__")
+    assert compact[0].files[0].key is compact[1].files[0].key
+    assert compact[0].metadata["license"] is compact[1].metadata["license"]
+    assert remote_files(compact[0]) == remote_files(records[0])
+    assert pickle.loads(pickle.dumps(compact[0])) == compact[0]
+
+
+def test_harvest_emits_only_new_and_changed_records(tmp_path):
+    checkpoint = HarvestCheckpoint(str(tmp_path / "harvest.sqlite"))
+    with FakeZenodo() as fake:
+        ids = [fake.add_deposition(publish=True)["id"] for _ in range(3)]
+        client = fake.client()
+
+        def run(**kwargs) -> list:
+            hits = harvest_hits(size=2, checkpoint=checkpoint, client=client, **kwargs)
+            return sorted((x["id"], x["revision"]) for x in hits)
+
+        # An interrupted harvest is continued by the next one, the last record
+        # taken counts as emitted once the following one is requested
+        hits = harvest_hits(size=2, checkpoint=checkpoint, client=client)
+        first, second = next(hits), next(hits)
+        hits.close()
+        continued = [x for x, _ in run()]
+        assert len(continued) == 2
+        assert first["id"] not in continued and second["id"] in continued
+
+        assert run() == []
+        assert "updated" in fake.requests[-1][1]
+
+        fake.update_record(ids[0], {"title": "Changed"})
+        new = fake.add_deposition(publish=True)["id"]
+        assert run() == [(int(ids[0]), 1), (int(new), 0)]
+        assert len(run(overlap=3600)) == 0
+
+        result = CliRunner().invoke(
+            cli,
+            ["records", "harvest", "--checkpoint", str(tmp_path / "cli.sqlite")],
+            env={"ZENODO_URL": fake.url, "ZENODO_TOKEN": "token"},
+        )
+        assert result.exit_code == 0
+        assert len(result.output.splitlines()) == 4
+
+
+def test_harvest_closes_the_checkpoint_it_opened(tmp_path, monkeypatch):
+    monkeypatch.setenv("ZENODO_CACHE_DIR", str(tmp_path))
+    closed = []
+    monkeypatch.setattr(HarvestCheckpoint, "close", lambda self: closed.append(1))
+    with FakeZenodo() as fake:
+        fake.add_deposition(publish=True)
+        assert len(list(harvest_hits(client=fake.client()))) == 1
+    assert closed == [1]
+    assert (tmp_path / "harvest.sqlite").exists()
@@ -0,0 +1,89 @@
+import time
+
+from zenodo_rest.depositions.release import release
+from zenodo_rest.entities.metadata import Metadata
+from zenodo_rest.files.hash_cache import HashCache
+from zenodo_rest.hooks import ClientHooks
+from zenodo_rest.metrics import endpoint
+from zenodo_rest.testing import FakeZenodo
+
+
+class Timeline(ClientHooks):
+    def __init__(self):
+        self.started = {}
+        self.spans = []
+
+    def before_request(self, method, url, headers):
+        self.started[method, url] = time.monotonic()
+
+    def after_response(self, method, url, response, elapsed, error=None):
+        start = self.started.pop((method, url))
+        self.spans.append((endpoint(method, url), start, start + elapsed))
+
+    def of(self, name: str) -> list[tuple[float, float]]:
+        return [(start, end) for e, start, end in self.spans if e == name]
+
+
+def test_release_overlaps_transfers_and_publishes_last(tmp_path):
+    local = tmp_path / "local"
+    local.mkdir()
+    (local / "same.txt").write_bytes(b"same")
+    (local / "changed.txt").write_bytes(b"new contents")
+    (local / "added.txt").write_bytes(b"added")
+    timeline = Timeline()
+    with FakeZenodo(latency=0.05) as fake:
+        previous = fake.add_deposition(
+            {"title": "Version 1"},
+            files={"same.txt": b"same", "changed.txt": b"old", "gone.txt": b"x"},
+            publish=True,
+        )
+        client = fake.client(hooks=[timeline])
+        result = release(
+            previous["id"],
+            str(local),
+            Metadata(title="Version 2"),
+            hash_cache=HashCache(str(tmp_path / "hashes.sqlite")),
+            client=client,
+        )
+
+    assert result.deposition.submitted
+    assert result.deposition.title == "Version 2"
+    assert sorted(x.key for x in result.files.uploaded) == ["added.txt", "changed.txt"]
+    assert result.files.deleted == ["gone.txt"]
+    assert result.files.unchanged == ["same.txt"]
+    assert set(result.timings) == {
+        "new_version",
+        "draft",
+        "files",
+        "metadata",
+        "transfers",
+        "publish",
+        "total",
+    }
+
+    (update,) = timeline.of("update")
+    transfers = timeline.of("bucket_put") + timeline.of("delete_file")
+    assert len(transfers) == 3
+    assert update[0] < max(end for _, end in transfers)
+    assert update[1] > min(start for start, _ in transfers)
+    (publish,) = timeline.of("publish")
+    assert publish[0] >= max(end for _, end in transfers + [update])
+
+
+def test_unpublished_release_returns_the_final_files(tmp_path):
+    local = tmp_path / "local"
+    local.mkdir()
+    (local / "data.txt").write_bytes(b"data")
+    with FakeZenodo() as fake:
+        previous = fake.add_deposition(files={"old.txt": b"old"}, publish=True)
+        result = release(
+            previous["id"],
+            str(local),
+            publish=False,
+            hash_cache=HashCache(str(tmp_path / "hashes.sqlite")),
+            client=fake.client(),
+        )
+
+    assert not result.deposition.submitted
+    assert [x.filename for x in result.deposition.files] == ["data.txt"]
+    assert "publish" not in result.timings
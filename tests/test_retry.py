@@ -0,0 +1,111 @@
+import io
+
+import pytest
+import requests
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.retry import RetryPolicy, call_verified
+from zenodo_rest.testing import FakeZenodo
+
+
+def response(status: int) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r._content = b"{}"
+    return r
+
+
+def test_only_idempotent_replayable_requests_are_retried():
+    policy = RetryPolicy()
+    assert policy.retries("GET")
+    assert policy.retries("put", data=b"part")
+    assert policy.retries("PUT", data=io.BytesIO(b"file"))
+    assert not policy.retries("POST", json={})
+    assert not policy.retries("PUT", data=iter([b"stream"]))
+
+
+def test_backoff_is_capped_and_honors_retry_after():
+    policy = RetryPolicy(backoff=1, max_backoff=4)
+    assert all(0 <= policy.delay(10) <= 4 for _ in range(100))
+    assert policy.delay(0, retry_after=7) == 7
+
+
+def test_verified_call_is_not_sent_again_once_it_took_effect():
+    sent = []
+    result = call_verified(
+        lambda: sent.append(1) or response(504),
+        lambda r: "parsed",
+        lambda: "verified" if sent else None,
+        RetryPolicy(attempts=3, backoff=0),
+    )
+    assert result == "verified"
+    assert len(sent) == 1
+
+
+def test_verified_call_is_retried_until_the_attempts_are_exhausted():
+    sent = []
+    with pytest.raises(requests.HTTPError):
+        call_verified(
+            lambda: sent.append(1) or response(502),
+            lambda r: "parsed",
+            lambda: None,
+            RetryPolicy(attempts=3, backoff=0),
+        )
+    assert len(sent) == 3
+
+    statuses = iter([429, 201])
+    result = call_verified(
+        lambda: response(next(statuses)),
+        lambda r: r.status_code,
+        lambda: pytest.fail("throttled requests were not applied"),
+        RetryPolicy(attempts=2, backoff=0),
+    )
+    assert result == 201
+
+
+def test_failed_creates_are_not_guessed_from_other_drafts():
+    with FakeZenodo() as fake:
+        client = fake.client(retry_policy=RetryPolicy(attempts=3, backoff=0))
+        first = Deposition.create(client=client)
+        fake.fail(503, method="POST")
+        with pytest.raises(requests.HTTPError):
+            Deposition.create(client=client)
+        fake.fail(429, method="POST")
+        second = Deposition.create(client=client)
+
+    assert second.id != first.id
+    assert sum(1 for method, _ in fake.requests if method == "POST") == 4
+
+
+def test_uploads_and_deletes_are_retried(tmp_path):
+    (tmp_path / "data.bin").write_bytes(b"data" * 1000)
+    with FakeZenodo() as fake:
+        client = fake.client(retry_policy=RetryPolicy(attempts=3, backoff=0))
+        deposition = Deposition.parse_obj(fake.add_deposition())
+        fake.fail(503, path="/api/files/")
+        bucket_file = deposition.upload_file(str(tmp_path / "data.bin"), client=client)
+        assert bucket_file.size == 4000
+        assert [m for m, p in fake.requests if p.startswith("/api/files/")] == [
+            "PUT",
+            "PUT",
+        ]
+
+        deposition = deposition.refresh(client=client)
+        fake.fail(504, method="DELETE", applied=True)
+        assert deposition.delete_file(deposition.files[0].id, client=client) == 204
+        assert deposition.refresh(client=client).files == []
+
+
+def test_the_default_client_retries(monkeypatch):
+    monkeypatch.setattr(ZenodoClient, "_default", None)
+    with FakeZenodo() as fake:
+        monkeypatch.setenv("ZENODO_URL", fake.url)
+        monkeypatch.setenv("ZENODO_TOKEN", "token")
+        deposition_id = fake.add_deposition()["id"]
+        fake.fail(503, method="GET")
+        try:
+            assert Deposition.retrieve(deposition_id).id == deposition_id
+        finally:
+            ZenodoClient.default().close()
+        assert len(fake.requests) == 2
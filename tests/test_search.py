@@ -0,0 +1,39 @@
+import pytest
+
+from zenodo_rest._json import response_json
+from zenodo_rest.depositions import actions
+from zenodo_rest.pagination import iter_pages
+from zenodo_rest.testing import FakeZenodo
+
+
+def test_projections_only_set_the_requested_fields():
+    with FakeZenodo() as fake:
+        for i in range(3):
+            fake.add_deposition({"title": f"Paper {i}"}, publish=True)
+        client = fake.client()
+
+        full = actions.search(client=client)
+        projected = list(
+            actions.iter_search(size=2, client=client, fields=["id", "doi"])
+        )
+        assert [(x.id, x.doi) for x in projected] == [(x.id, x.doi) for x in full]
+        with pytest.raises(AttributeError):
+            projected[0].metadata
+
+        with pytest.raises(ValueError):
+            actions.search(client=client, fields=["id", "identifier"])
+
+
+def test_pages_without_links_are_followed_past_capped_sizes():
+    with FakeZenodo(max_page_size=2) as fake:
+        for i in range(5):
+            fake.add_deposition({"title": f"Paper {i}"})
+        client = fake.client()
+        url = f"{fake.url}/api/deposit/depositions"
+
+        # A server which does not link its pages
+        pages = list(
+            iter_pages(client, url, {"size": 3}, lambda r: (response_json(r), None))
+        )
+    assert [len(x) for x in pages] == [2, 2, 1]
+    assert sum(1 for _, p in fake.requests if "depositions" in p) == 4
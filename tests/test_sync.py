@@ -0,0 +1,61 @@
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.files.hash_cache import HashCache
+from zenodo_rest.testing import FakeZenodo
+
+
+def test_sync_uploads_new_and_changed_files_and_deletes_removed_ones(tmp_path):
+    local = tmp_path / "local"
+    local.mkdir()
+    (local / "same.txt").write_bytes(b"same")
+    (local / "changed.txt").write_bytes(b"new contents")
+    (local / "added.txt").write_bytes(b"added")
+    (local / "nested").mkdir()
+    hash_cache = HashCache(str(tmp_path / "hashes.sqlite"))
+    with FakeZenodo() as fake:
+        client = fake.client()
+        files = {"same.txt": b"same", "changed.txt": b"old", "gone.txt": b"gone"}
+        draft = Deposition.parse_obj(fake.add_deposition(files=files))
+
+        result = draft.sync_files(str(local), hash_cache=hash_cache, client=client)
+        assert sorted(x.key for x in result.uploaded) == ["added.txt", "changed.txt"]
+        assert result.deleted == ["gone.txt"]
+        assert result.unchanged == ["same.txt"]
+        assert fake.buckets[fake.depositions[draft.id]["bucket"]] == {
+            "same.txt": b"same",
+            "changed.txt": b"new contents",
+            "added.txt": b"added",
+        }
+
+        # In sync, nothing is sent
+        sent = len(fake.requests)
+        draft = draft.refresh(client=client)
+        result = draft.sync_files(str(local), hash_cache=hash_cache, client=client)
+        assert (result.uploaded, result.deleted) == ([], [])
+        assert len(result.unchanged) == 3
+        assert len(fake.requests) == sent + 1
+
+        # Keeping remote files, as the --keep-remote option of the CLI
+        (local / "added.txt").unlink()
+        result = draft.sync_files(
+            str(local), delete=False, hash_cache=hash_cache, client=client
+        )
+        assert result.deleted == []
+        assert "added.txt" in fake.buckets[fake.depositions[draft.id]["bucket"]]
+
+
+def test_sync_closes_the_hash_cache_it_opened(tmp_path, monkeypatch):
+    monkeypatch.setenv("ZENODO_CACHE_DIR", str(tmp_path / "cache"))
+    closed = []
+    monkeypatch.setattr(HashCache, "close", lambda self: closed.append(self.path))
+    local = tmp_path / "local"
+    local.mkdir()
+    (local / "data.txt").write_bytes(b"data")
+    with FakeZenodo() as fake:
+        client = fake.client()
+        draft = Deposition.parse_obj(fake.add_deposition())
+        draft.sync_files(str(local), client=client)
+        assert closed == [tmp_path / "cache" / "hashes.sqlite"]
+
+        hash_cache = HashCache(str(tmp_path / "own.sqlite"))
+        draft.sync_files(str(local), hash_cache=hash_cache, client=client)
+        assert len(closed) == 1
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+import requests
+
+from zenodo_rest.depositions import actions
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.entities.metadata import Metadata
+from zenodo_rest.files.download import download_file, remote_files
+from zenodo_rest.records import actions as records
+from zenodo_rest.retry import RetryPolicy
+from zenodo_rest.testing import FakeZenodo
+
+
+@pytest.fixture
+def fake():
+    with FakeZenodo() as fake:
+        yield fake
+
+
+def test_deposition_lifecycle(fake, tmp_path):
+    client = fake.client()
+    deposition = Deposition.create(Metadata(title="Lifecycle"), client=client)
+    (tmp_path / "data.txt").write_bytes(b"0123456789" * 100)
+    deposition.upload_file(str(tmp_path / "data.txt"), client=client)
+
+    published = actions.publish(deposition.id, client=client)
+    assert published.submitted
+    record = records.retrieve(published.id, client=client)
+    assert record.files[0].size == 1000
+
+    draft = actions.new_version(deposition.id, client=client).get_latest_draft(
+        client=client
+    )
+    assert draft.id != deposition.id
+    assert draft.files[0].filename == "data.txt"
+
+    path = download_file(
+        remote_files(record)[0], str(tmp_path / "out"), segment_size=300, client=client
+    )
+    assert path.read_bytes() == b"0123456789" * 100
+
+
+def test_searches_are_paginated(fake):
+    for i in range(5):
+        fake.add_deposition({"title": f"Paper {i}"}, publish=i % 2 == 0)
+    client = fake.client()
+
+    assert len(actions.search(size=2, client=client)) == 2
+    assert len(list(actions.iter_search(size=2, client=client))) == 5
+    assert len(list(actions.iter_search(status="draft", client=client))) == 2
+    hits = list(records.iter_hits(size=2, client=client))
+    assert sorted(x["metadata"]["title"] for x in hits) == [
+        "Paper 0",
+        "Paper 2",
+        "Paper 4",
+    ]
+    assert sum(1 for m, p in fake.requests if p.startswith("/api/records")) == 2
+
+
+def test_faults_are_retried(fake):
+    deposition_id = fake.add_deposition()["id"]
+    client = fake.client(retry_policy=RetryPolicy(attempts=3, backoff=0))
+    fake.fail(503, times=2, method="GET")
+    assert Deposition.retrieve(deposition_id, client=client).id == deposition_id
+    assert len(fake.requests) == 3
+
+    fake.fail(404, path="/api/deposit/depositions/")
+    with pytest.raises(requests.HTTPError):
+        Deposition.retrieve(deposition_id, client=client)
+
+
+def test_rate_limit_and_latency():
+    with FakeZenodo(latency=0.05, rate_limit=2, rate_window=60) as fake:
+        deposition_id = fake.add_deposition()["id"]
+        client = fake.client()
+        url = f"{fake.url}/api/deposit/depositions/{deposition_id}"
+        start = time.monotonic()
+        statuses = [client.get(url).status_code for _ in range(3)]
+        assert time.monotonic() - start >= 0.15
+        assert statuses == [200, 200, 429]
+        response = client.get(url)
+        assert response.headers["X-RateLimit-Remaining"] == "0"
+        assert int(response.headers["Retry-After"]) > 0
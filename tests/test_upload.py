@@ -0,0 +1,113 @@
+import hashlib
+import io
+import os
+import tempfile
+import zipfile
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.exceptions import ChecksumMismatch, UploadFailed
+from zenodo_rest.files.zipstream import iter_zip
+from zenodo_rest.testing import FakeZenodo
+
+
+def test_upload_files_reports_failures_after_all_uploads(tmp_path):
+    paths = []
+    for name in ("c.txt", "a.txt", "b.txt", "d.txt"):
+        (tmp_path / name).write_bytes(name.encode())
+        paths.append(str(tmp_path / name))
+    finished = []
+    with FakeZenodo() as fake:
+        client = fake.client()
+        draft = Deposition.parse_obj(fake.add_deposition())
+        fake.fail(400, method="PUT", path="/b.txt$")
+        with pytest.raises(UploadFailed) as raised:
+            draft.upload_files(
+                paths,
+                max_workers=4,
+                client=client,
+                callback=lambda path, result, seconds: finished.append(path),
+            )
+        bucket = fake.buckets[fake.depositions[draft.id]["bucket"]]
+
+    assert list(raised.value.errors) == [paths[2]]
+    assert [x.key for x in raised.value.uploaded] == ["c.txt", "a.txt", "d.txt"]
+    assert str(raised.value).startswith("1 of 4 uploads failed")
+    assert sorted(finished) == sorted(paths)
+    assert sorted(bucket) == ["a.txt", "c.txt", "d.txt"]
+
+
+def _tree(root):
+    return {
+        x.relative_to(root).as_posix(): x.read_bytes() if x.is_file() else None
+        for x in root.rglob("*")
+    }
+
+
+def test_streamed_zip_unzips_to_the_same_tree(tmp_path):
+    source = tmp_path / "data"
+    (source / "nested" / "deeper").mkdir(parents=True)
+    (source / "empty").mkdir()
+    (source / "small.txt").write_bytes(b"small")
+    (source / "nested" / "large.bin").write_bytes(os.urandom(100_000))
+    (source / "nested" / "deeper" / "zero.bin").write_bytes(b"")
+
+    # Chunks smaller than the files, so these are written in several pieces
+    archive = b"".join(iter_zip(str(source), chunk_size=4096))
+    with zipfile.ZipFile(io.BytesIO(archive)) as zipped:
+        assert zipped.testzip() is None
+        zipped.extractall(tmp_path / "unzipped")
+    assert _tree(tmp_path / "unzipped") == _tree(source)
+
+    with FakeZenodo() as fake:
+        draft = Deposition.parse_obj(fake.add_deposition())
+        bucket_file = draft.upload_file(str(source), client=fake.client(), stream=True)
+        stored = fake.buckets[fake.depositions[draft.id]["bucket"]]["data.zip"]
+    assert bucket_file.key == "data.zip"
+    with zipfile.ZipFile(io.BytesIO(stored)) as zipped:
+        zipped.extractall(tmp_path / "uploaded")
+    assert _tree(tmp_path / "uploaded") == _tree(source)
+
+
+def test_corrupted_uploads_raise_checksum_mismatch(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "file.bin").write_bytes(b"contents")
+    with FakeZenodo() as fake:
+        client = fake.client()
+        draft = Deposition.parse_obj(fake.add_deposition())
+        fake.corrupt()
+        with pytest.raises(ChecksumMismatch) as raised:
+            draft.upload_file(str(tmp_path / "data" / "file.bin"), client=client)
+        assert raised.value.name == "file.bin"
+        assert raised.value.actual == f"md5:{hashlib.md5(b'contents').hexdigest()}"
+        assert raised.value.expected != raised.value.actual
+
+        fake.corrupt()
+        with pytest.raises(ChecksumMismatch):
+            draft.upload_file(str(tmp_path / "data"), client=client, stream=True)
+
+        # Only as many uploads as requested are corrupted
+        bucket_file = draft.upload_file(
+            str(tmp_path / "data" / "file.bin"), client=client
+        )
+        assert bucket_file.checksum == raised.value.actual
+
+
+def test_failed_uploads_of_paths_remove_the_temporary_archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+    (tmp_path / "tmp").mkdir()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "file.bin").write_bytes(b"contents")
+    with FakeZenodo() as fake:
+        client = fake.client()
+        draft = Deposition.parse_obj(fake.add_deposition())
+        with monkeypatch.context() as patched:
+            patched.setattr(client, "put", Mock(side_effect=requests.ConnectionError))
+            with pytest.raises(requests.ConnectionError) as raised:
+                draft.upload_file(str(tmp_path / "data"), client=client)
+    # Not left to the garbage collection of the frames of the traceback
+    assert raised.tb is not None
+    assert list((tmp_path / "tmp").iterdir()) == []
@@ -1,8 +1,28 @@
 """zenodo_rest - A python wrapper of Zenodo's REST API for python and the command line."""
-from .cli import depositions
-from .depositions import actions
-from . import entities
+import importlib
 
 __version__ = "0.0.0"
 __author__ = "Kyle Krueger <NA>"
 __all__: list[str] = []
+
+# Subpackages are imported on first access, so importing an entity does not
+# load the CLI, click and requests
+_LAZY_MODULES = {
+    "actions": "zenodo_rest.depositions.actions",
+    "cli": "zenodo_rest.cli",
+    "depositions": "zenodo_rest.depositions",
+    "entities": "zenodo_rest.entities",
+    "records": "zenodo_rest.records",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_LAZY_MODULES[name])
+    globals()[name] = module
+    return module
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_MODULES])
@@ -0,0 +1,25 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode json, with orjson if it is installed, which is several times faster"""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def response_json(response: Any) -> Any:
+    """Decode the json body of a requests or httpx response
+
+    Unlike response.json() this decodes the raw bytes, without detecting the
+    encoding of the text first.
+    """
+
+    return loads(response.content)
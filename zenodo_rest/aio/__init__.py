@@ -0,0 +1,6 @@
+"""asyncio counterparts of the deposition calls, built on httpx"""
+
+from . import depositions
+from .client import AsyncZenodoClient
+
+__all__: list[str] = ["AsyncZenodoClient", "depositions"]
@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional, Sequence, TypeVar
+
+from zenodo_rest.hooks import ClientHooks, call_hooks
+from zenodo_rest.ratelimit import RateLimiter, parse_retry_after
+from zenodo_rest.retry import RetryPolicy
+
+try:
+    import httpx
+except ImportError as e:  # pragma: no cover
+    raise ImportError(
+        "zenodo_rest.aio requires httpx, install it with: pip install zenodo-rest[aio]"
+    ) from e
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncZenodoClient:
+    """An asyncio connection to a zenodo server
+
+    The asyncio counterpart of :class:`zenodo_rest.client.ZenodoClient`, backed by a
+    pooled :class:`httpx.AsyncClient`. Use it as an async context manager, or call
+    :meth:`aclose` once done.
+
+    :param token: Your zenodo token
+        (defaults to the ZENODO_TOKEN envvar, resolved at request time)
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+        (defaults to the ZENODO_URL envvar, resolved at request time)
+    :type base_url: Optional[str]
+    :param max_connections: The maximum number of concurrent connections
+    :type max_connections: int
+    :param max_keepalive_connections: The maximum number of idle connections kept
+    :type max_keepalive_connections: int
+    :param headers: Default headers sent with every request
+    :type headers: Optional[dict]
+    :param timeout: Default timeout in seconds for every request
+    :type timeout: Optional[float]
+    :param rate_limiter: Paces the requests to the limits reported by the server,
+        may be shared with other clients, also synchronous ones
+    :type rate_limiter: Optional[RateLimiter]
+    :param retry_policy: Retries idempotent requests after transient failures
+    :type retry_policy: Optional[RetryPolicy]
+    :param hooks: Callbacks around every request, e.g. a MetricsCollector
+    :type hooks: Sequence[ClientHooks]
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        hooks: Sequence[ClientHooks] = (),
+    ):
+        self.token: Optional[str] = token
+        self.hooks: list[ClientHooks] = list(hooks)
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        self.retry_policy: Optional[RetryPolicy] = retry_policy
+        self.base_url: Optional[str] = base_url
+        self.session: httpx.AsyncClient = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            headers=headers,
+            timeout=timeout,
+        )
+
+    def url(self, path: str, base_url: Optional[str] = None) -> str:
+        if base_url is None:
+            base_url = self.base_url
+        if base_url is None:
+            base_url = os.getenv("ZENODO_URL")
+        return f"{base_url}{path}"
+
+    def auth_header(self, token: Optional[str] = None) -> dict:
+        if token is None:
+            token = self.token
+        if token is None:
+            token = os.getenv("ZENODO_TOKEN")
+        return {"Authorization": f"Bearer {token}"}
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        token: Optional[str] = None,
+        headers: Optional[dict] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send an authorized request over the pooled session
+
+        :param method: The HTTP verb
+        :type method: str
+        :param url: The absolute url of the request
+        :type url: str
+        :param token: Overrides the token of this client
+        :type token: Optional[str]
+        :param headers: Additional headers for this request only
+        :type headers: Optional[dict]
+        :return: The httpx HTTP response, after retries if a retry policy is set,
+            see :meth:`zenodo_rest.client.ZenodoClient.request`
+        :rtype: httpx.Response
+        """
+
+        header = self.auth_header(token)
+        if headers is not None:
+            header.update(headers)
+        policy = self.retry_policy
+        if policy is None or not policy.retries(method, **kwargs):
+            return await self._send(method, url, header, kwargs)
+
+        content: Any = kwargs.get("content")
+        position = content.tell() if hasattr(content, "tell") else None
+        attempts = max(policy.attempts, 1)
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            if position is not None:
+                content.seek(position)
+            retry_after = 0.0
+            try:
+                response = await self._send(method, url, header, kwargs)
+            except httpx.TransportError as e:
+                if last:
+                    raise
+                reason = str(e) or type(e).__name__
+            else:
+                if attempt > 0 and method == "DELETE" and response.status_code == 404:
+                    logger.info(f"{method} {url} took effect on an earlier attempt")
+                    response.status_code = 204
+                    return response
+                if last or response.status_code not in policy.statuses:
+                    return response
+                reason = f"status {response.status_code}"
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                await response.aclose()
+            delay = policy.delay(attempt, retry_after)
+            self.on_retry(method, url, attempt, reason, delay)
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def on_retry(self, method: str, url: str, attempt: int, reason: str, delay: float):
+        """Report that a failed request is sent again after delay seconds"""
+
+        logger.warning(f"{method} {url} failed ({reason}), retrying in {delay:.2f}s")
+        call_hooks(self.hooks, "on_retry", method, url, attempt, reason, delay)
+
+    async def _send(
+        self, method: str, url: str, headers: dict, kwargs: dict
+    ) -> httpx.Response:
+        if not self.hooks:
+            return await self._send_limited(method, url, headers, kwargs)
+
+        headers = dict(headers)
+        call_hooks(self.hooks, "before_request", method, url, headers)
+        start = time.monotonic()
+        try:
+            response = await self._send_limited(method, url, headers, kwargs)
+        except Exception as e:
+            elapsed = time.monotonic() - start
+            call_hooks(self.hooks, "after_response", method, url, None, elapsed, e)
+            raise
+        elapsed = time.monotonic() - start
+        call_hooks(self.hooks, "after_response", method, url, response, elapsed, None)
+        return response
+
+    async def _send_limited(
+        self, method: str, url: str, headers: dict, kwargs: dict
+    ) -> httpx.Response:
+        if self.rate_limiter is None:
+            return await self.session.request(method, url, headers=headers, **kwargs)
+
+        await self.rate_limiter.acquire_async()
+        response = None
+        try:
+            response = await self.session.request(
+                method, url, headers=headers, **kwargs
+            )
+            return response
+        finally:
+            if response is None:
+                self.rate_limiter.release()
+            else:
+                self.rate_limiter.release(response.status_code, response.headers)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def aclose(self):
+        await self.session.aclose()
+
+    async def __aenter__(self) -> "AsyncZenodoClient":
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+
+async def call_verified(
+    send: Callable[[], Awaitable[httpx.Response]],
+    parse: Callable[[httpx.Response], T],
+    verify: Optional[Callable[[], Awaitable[Optional[T]]]],
+    policy: RetryPolicy,
+    description: str = "request",
+    on_retry: Optional[Callable[[int, str, float], None]] = None,
+) -> T:
+    """The asyncio counterpart of :func:`zenodo_rest.retry.call_verified`
+
+    :param send: Sends the request
+    :type send: Callable[[], Awaitable[httpx.Response]]
+    :param parse: Builds the result from a successful response
+    :type parse: Callable[[httpx.Response], T]
+    :param verify: Looks up the result of a request which may have been applied,
+        None if that cannot be told
+    :type verify: Optional[Callable[[], Awaitable[Optional[T]]]]
+    :param policy: The number of attempts and their backoff
+    :type policy: RetryPolicy
+    :param description: Names the request in log messages
+    :type description: str
+    :param on_retry: Called with the attempt, the reason of its failure and the
+        delay instead of logging a retry, e.g. :meth:`AsyncZenodoClient.on_retry`
+    :type on_retry: Optional[Callable[[int, str, float], None]]
+    :return: The result
+    :rtype: T
+    :raises httpx.HTTPStatusError: If the last attempt failed with an error status
+    """
+
+    attempts = max(policy.attempts, 1)
+    for attempt in range(attempts):
+        retry_after = 0.0
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            logger.warning(f"The {description} failed: {e!r}")
+            error: Optional[Exception] = e
+            reason = str(e) or type(e).__name__
+            throttled = False
+        else:
+            if response.status_code not in policy.statuses:
+                response.raise_for_status()
+                return parse(response)
+            logger.warning(f"The {description} returned {response.status_code}")
+            error = None
+            reason = f"status {response.status_code}"
+            throttled = response.status_code == 429
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+        if not throttled and verify is not None:
+            result = await verify()
+            if result is not None:
+                logger.info(f"The {description} took effect despite the error")
+                return result
+        if attempt == attempts - 1 or not (throttled or verify is not None):
+            if error is not None:
+                raise error
+            response.raise_for_status()
+        delay = policy.delay(attempt, retry_after)
+        if on_retry is None:
+            logger.warning(f"Retrying the {description} in {delay:.2f}s")
+        else:
+            on_retry(attempt, reason, delay)
+        await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
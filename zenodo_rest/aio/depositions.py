@@ -0,0 +1,380 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from functools import partial
+from pathlib import Path
+from shutil import make_archive
+from typing import AsyncIterator, Iterator, Optional
+
+from zenodo_rest.aio.client import AsyncZenodoClient, call_verified
+from zenodo_rest.entities.bucket_file import BucketFile
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.entities.metadata import Metadata
+from zenodo_rest.files.hashing import hashing_iter, verify_checksum
+from zenodo_rest.files.zipstream import iter_zip
+from zenodo_rest.pagination import search_params
+from zenodo_rest.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+async def create(
+    client: AsyncZenodoClient,
+    metadata: Optional[Metadata] = None,
+    prereserve_doi: Optional[bool] = None,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+) -> Deposition:
+    """Create a deposition on the server, but do not publish it.
+
+    Only throttled requests are sent again, see Deposition.create.
+
+    :param client: The client to send the request with
+    :type client: AsyncZenodoClient
+    :param metadata: The metadata to be used when creating the deposition.
+        (defaults to an empty Metadata object with placeholders in required fields)
+    :type metadata: Optional[Metadata]
+    :param prereserve_doi: Whether to prereserve a DOI or not
+    :type prereserve_doi: Optional[bool]
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url for the target zenodo server
+    :type base_url: Optional[str]
+    :return: The Deposition object created
+    :rtype: Deposition
+    """
+
+    if metadata is None:
+        metadata = Metadata()
+    if prereserve_doi is True:
+        metadata.prereserve_doi = True
+
+    url = client.url("/api/deposit/depositions", base_url)
+    return await call_verified(
+        lambda: client.post(
+            url, json={"metadata": metadata.dict(exclude_none=True)}, token=token
+        ),
+        lambda response: Deposition.parse_obj(response.json()),
+        None,
+        client.retry_policy or RetryPolicy(attempts=1),
+        "creation of a deposition",
+        lambda *retry: client.on_retry("POST", url, *retry),
+    )
+
+
+async def retrieve(
+    client: AsyncZenodoClient,
+    deposition_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+) -> Deposition:
+    """Fetch a deposition by id from the remote
+
+    :param client: The client to send the request with
+    :type client: AsyncZenodoClient
+    :param deposition_id: The id of the deposition to fetch
+    :type deposition_id: str
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url for the target zenodo server
+    :type base_url: Optional[str]
+    :return: The deposition fetched by the remote
+    :rtype: Deposition
+    """
+
+    response = await client.get(
+        client.url(f"/api/deposit/depositions/{deposition_id}", base_url),
+        headers={"Accept": "application/json"},
+        token=token,
+    )
+
+    response.raise_for_status()
+    return Deposition.parse_obj(response.json())
+
+
+async def _iter_in_thread(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def upload_file(
+    client: AsyncZenodoClient,
+    deposition: Deposition,
+    path_or_file: str,
+    token: Optional[str] = None,
+    stream: bool = False,
+) -> BucketFile:
+    """Upload or overwrite a file or path attachment for a deposition
+
+    Disk reads and hashing are done in a worker thread, so the event loop is
+    never blocked.
+
+    :param client: The client to send the request with
+    :type client: AsyncZenodoClient
+    :param deposition: The deposition to upload to
+    :type deposition: Deposition
+    :param path_or_file: A path to zip and upload or a file_path to upload
+    :type path_or_file: str
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param stream: Zip a path on the fly while uploading it, see
+        Deposition.upload_file
+    :type stream: bool
+    :return: The object for a successfully uploaded file
+    :rtype: BucketFile
+    :raises ChecksumMismatch: If the checksum reported by the server differs
+        from the md5 of the bytes sent
+    """
+
+    bucket_url = deposition.get_bucket()
+    path = Path(path_or_file)
+    md5 = hashlib.md5()
+    if path.is_dir() and stream:
+        r = await client.put(
+            f"{bucket_url}/{path.stem}.zip",
+            content=_iter_in_thread(hashing_iter(iter_zip(str(path)), md5)),
+            token=token,
+        )
+        r.raise_for_status()
+        bucket_file = BucketFile.parse_obj(r.json())
+        verify_checksum(bucket_file.key, bucket_file.checksum, md5.hexdigest())
+        return bucket_file
+
+    tempdir = None
+    if path.is_dir():
+        tempdir = tempfile.TemporaryDirectory()
+        zip_file = os.path.join(tempdir.name, path.stem)
+        await asyncio.to_thread(make_archive, zip_file, "zip", root_dir=path.absolute())
+        path = Path(f"{zip_file}.zip")
+
+    try:
+        with open(path.absolute(), "rb") as fp:
+            r = await client.put(
+                f"{bucket_url}/{path.name}",
+                content=_iter_in_thread(
+                    hashing_iter(iter(partial(fp.read, CHUNK_SIZE), b""), md5)
+                ),
+                headers={"Content-Length": str(path.stat().st_size)},
+                token=token,
+            )
+    finally:
+        if tempdir is not None:
+            tempdir.cleanup()
+    r.raise_for_status()
+    bucket_file = BucketFile.parse_obj(r.json())
+    verify_checksum(bucket_file.key, bucket_file.checksum, md5.hexdigest())
+    return bucket_file
+
+
+async def delete_file(
+    client: AsyncZenodoClient,
+    deposition_id: str,
+    file_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+) -> int:
+    """Delete a file from a deposition if it is not yet published
+
+    :param client: The client to send the request with
+    :type client: AsyncZenodoClient
+    :param deposition_id: The id of the deposition holding the file
+    :type deposition_id: str
+    :param file_id: The id of the file to be deleted
+    :type file_id: str
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The base url of the zenodo server
+    :type base_url: Optional[str]
+    :return: The HTTP response code of the deletion request.
+    :rtype: int
+    """
+
+    response = await client.delete(
+        client.url(
+            f"/api/deposit/depositions/{deposition_id}/files/{file_id}", base_url
+        ),
+        headers={"Accept": "application/json"},
+        token=token,
+    )
+
+    response.raise_for_status()
+    return response.status_code
+
+
+async def update_metadata(
+    client: AsyncZenodoClient,
+    deposition_id: str,
+    metadata: Metadata,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+) -> Deposition:
+    """Update the metadata of a not yet published deposition
+
+    :param client: The client to send the request with
+    :type client: AsyncZenodoClient
+    :param deposition_id: The id of the deposition to update
+    :type deposition_id: str
+    :param metadata: The metadata to update the deposition with
+    :type metadata: Metadata
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :return: The deposition with updated metadata
+    :rtype: Deposition
+    """
+
+    response = await client.put(
+        client.url(f"/api/deposit/depositions/{deposition_id}", base_url),
+        json={"metadata": metadata.dict(exclude_none=True)},
+        headers={"Accept": "application/json"},
+        token=token,
+    )
+
+    response.raise_for_status()
+    return Deposition.parse_obj(response.json())
+
+
+async def publish(
+    client: AsyncZenodoClient,
+    deposition_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    retries: int = 0,
+) -> Deposition:
+    """Publish a deposition
+
+    When the request fails with a server error or a timeout, the deposition is
+    retrieved to check whether it was published anyway before publishing again
+    after a backoff, as often as the retry policy of the client or retries allow.
+
+    :param client: The client to send the request with
+    :type client: AsyncZenodoClient
+    :param deposition_id: The id of the deposition to be published
+    :type deposition_id: str
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :param retries: Overrides the number of retries of the client's retry policy
+    :type retries: int
+    :return: The published deposition
+    :rtype: Deposition
+    """
+
+    url = client.url(
+        f"/api/deposit/depositions/{deposition_id}/actions/publish", base_url
+    )
+    policy = client.retry_policy or RetryPolicy(attempts=1)
+    if retries > 0:
+        policy = RetryPolicy(retries + 1, policy.backoff, policy.max_backoff)
+
+    async def verify() -> Optional[Deposition]:
+        # Zenodo may time out internally although the deposition was published
+        deposition = await retrieve(client, deposition_id, token, base_url)
+        return deposition if deposition.submitted else None
+
+    return await call_verified(
+        lambda: client.post(url, token=token),
+        lambda response: Deposition.parse_obj(response.json()),
+        verify,
+        policy,
+        f"publication of deposition {deposition_id}",
+        lambda *retry: client.on_retry("POST", url, *retry),
+    )
+
+
+async def new_version(
+    client: AsyncZenodoClient,
+    deposition_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+) -> Deposition:
+    """Create a new version draft of a deposition
+
+    When the request fails with a server error or a timeout, the deposition is
+    retrieved to check whether the draft was created anyway before trying again,
+    as often as the retry policy of the client allows.
+
+    :param client: The client to send the request with
+    :type client: AsyncZenodoClient
+    :param deposition_id: The id of the deposition to create a new version of.
+    :type deposition_id: str
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :return: The currently published deposition (now containing a link to the draft)
+    :rtype: Deposition
+    """
+
+    async def verify() -> Optional[Deposition]:
+        deposition = await retrieve(client, deposition_id, token, base_url)
+        draft_url = deposition.links.get("latest_draft")
+        if draft_url is None or draft_url.rsplit("/", 1)[1] == deposition.id:
+            return None
+        return deposition
+
+    url = client.url(
+        f"/api/deposit/depositions/{deposition_id}/actions/newversion", base_url
+    )
+    return await call_verified(
+        lambda: client.post(url, token=token),
+        lambda response: Deposition.parse_obj(response.json()),
+        verify,
+        client.retry_policy or RetryPolicy(attempts=1),
+        f"new version of deposition {deposition_id}",
+        lambda *retry: client.on_retry("POST", url, *retry),
+    )
+
+
+async def search(
+    client: AsyncZenodoClient,
+    query: Optional[str] = None,
+    status: Optional[str] = None,
+    sort: Optional[str] = None,
+    page: Optional[str] = None,
+    size: Optional[int] = None,
+    all_versions: Optional[bool] = None,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+) -> list[Deposition]:
+    """Search for depositions
+
+    :param client: The client to send the request with
+    :type client: AsyncZenodoClient
+    :param query: An elasticsearch formatted query
+    :type query: Optional[str]
+    :param status: Filter by publication status; either 'draft' or 'published'
+    :type status: Optional[str]
+    :param sort: Sort order 'bestmatch' or 'mostrecent',
+        prefix with - to sort descending.
+    :type sort: Optional[str]
+    :param page: The page of the search to return
+    :type page: Optional[str]
+    :param size: The size limit per page
+    :type size: Optional[int]
+    :param all_versions: True to show all versions
+    :type all_versions: Optional[bool]
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :return: The list of depositions found
+    :rtype: list[Deposition]
+    """
+
+    params = search_params(query, status, sort, page, size, all_versions)
+    response = await client.get(
+        client.url("/api/deposit/depositions", base_url), params=params, token=token
+    )
+
+    response.raise_for_status()
+    return [Deposition.parse_obj(x) for x in response.json()]
@@ -0,0 +1,53 @@
+import json
+from typing import Optional
+
+import click
+
+from zenodo_rest.files.hash_cache import HashCache
+
+
+@click.group()
+@click.option(
+    "--path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="The hash cache database (defaults to hashes.sqlite in ZENODO_CACHE_DIR).",
+)
+@click.pass_context
+def cache(ctx: click.Context, path: Optional[str] = None):
+    """Inspect and prune the local cache of file hashes"""
+
+    hash_cache = HashCache(path)
+    ctx.call_on_close(hash_cache.close)
+    ctx.meta["hash_cache"] = hash_cache
+
+
+@cache.command()
+@click.pass_context
+def info(ctx: click.Context):
+    """Print the location and size of the hash cache"""
+
+    click.echo(json.dumps(ctx.meta["hash_cache"].stats(), indent=4))
+
+
+@cache.command()
+@click.option(
+    "--prefix",
+    default=None,
+    help="Only check entries of paths starting with this prefix.",
+)
+@click.pass_context
+def prune(ctx: click.Context, prefix: Optional[str] = None):
+    """Remove entries of files which were deleted or changed since hashing"""
+
+    removed = ctx.meta["hash_cache"].prune(prefix)
+    click.echo(f"Removed {removed} stale entries")
+
+
+@cache.command()
+@click.confirmation_option(prompt="Remove all entries of the hash cache?")
+@click.pass_context
+def clear(ctx: click.Context):
+    """Remove all entries of the hash cache"""
+
+    ctx.meta["hash_cache"].clear()
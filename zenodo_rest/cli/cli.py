@@ -1,13 +1,19 @@
-import os
 from getpass import getpass
+from typing import Optional
 
 import click
-from dotenv import load_dotenv
 
-from .depositions import depositions
+from .lazy_group import LazyGroup
 
 
-@click.group()
+@click.group(
+    cls=LazyGroup,
+    lazy_subcommands={
+        "cache": "zenodo_rest.cli.cache:cache",
+        "depositions": "zenodo_rest.cli.depositions:depositions",
+        "records": "zenodo_rest.cli.records:records",
+    },
+)
 @click.option(
     "--token",
     is_flag=True,
@@ -20,15 +26,86 @@ from .depositions import depositions
     type=click.Path(exists=True, file_okay=True, dir_okay=False),
     help="Pass a path to a .env file to overwrite and add ENVVARS.",
 )
-def cli(token: bool = None, env: str = None):
+@click.option(
+    "--pool-size",
+    type=click.INT,
+    default=10,
+    show_default=True,
+    help="Maximum number of HTTP connections kept alive to the server.",
+)
+@click.option(
+    "--http-cache",
+    is_flag=True,
+    help="Keep responses on disk and revalidate them with conditional requests.",
+)
+@click.option(
+    "--max-rate",
+    type=click.FLOAT,
+    default=None,
+    help=(
+        "Initial requests per second; the rate then follows the limits reported "
+        "by the server."
+    ),
+)
+@click.option(
+    "--retries",
+    type=click.INT,
+    default=3,
+    show_default=True,
+    help="Number of times to retry requests failing with a transient error.",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help=(
+        "Write latencies, statuses, bytes and retries of the requests per endpoint "
+        "to this file in the Prometheus text format when done."
+    ),
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    token: bool = None,
+    env: str = None,
+    pool_size: int = 10,
+    http_cache: bool = False,
+    max_rate: Optional[float] = None,
+    retries: int = 3,
+    metrics_file: Optional[str] = None,
+):
+    # Imported when a subcommand runs, the help of the group does not need them
+    from zenodo_rest.client import ZenodoClient
+    from zenodo_rest.files.hash_cache import default_cache_dir
+    from zenodo_rest.http_cache import ResponseCache
+    from zenodo_rest.metrics import MetricsCollector, write_text
+    from zenodo_rest.ratelimit import RateLimiter
+    from zenodo_rest.retry import RetryPolicy
+
     if env:
+        from dotenv import load_dotenv
+
         load_dotenv(dotenv_path=env, override=True)
+    client_token = None
     if token:
         prompt = "Please enter your Zenodo token:"
-        os.putenv("ZENODO_TOKEN", getpass(prompt))
-
-
-cli.add_command(depositions)
+        client_token = getpass(prompt)
+    response_cache = None
+    if http_cache:
+        response_cache = ResponseCache(directory=str(default_cache_dir() / "http"))
+    client = ZenodoClient(
+        token=client_token,
+        pool_maxsize=pool_size,
+        cache=response_cache,
+        rate_limiter=RateLimiter(rate=max_rate, max_concurrency=pool_size),
+        retry_policy=RetryPolicy(attempts=retries + 1),
+    )
+    if metrics_file:
+        collector = MetricsCollector()
+        client.hooks.append(collector)
+        ctx.call_on_close(lambda: write_text(collector, metrics_file))
+    ctx.call_on_close(client.close)
+    ctx.obj = client
 
 
 def main():
@@ -1,14 +1,20 @@
+import json
 import os
-from typing import Optional
+import time
+from typing import Iterable, Optional, TextIO, Union
 
 import click
 from requests import Response
 
+from zenodo_rest.client import ZenodoClient
 from zenodo_rest.entities import Deposition, Metadata
 from zenodo_rest.entities.bucket_file import BucketFile
-from zenodo_rest.exceptions import NoDraftFound
+from zenodo_rest.exceptions import NoDraftFound, UploadFailed
+from zenodo_rest.files.download import download_files
 
 from zenodo_rest.depositions import actions
+from zenodo_rest.depositions.batch import run_batch
+from zenodo_rest.depositions.release import release as release_deposition
 
 
 @click.group()
@@ -34,7 +40,9 @@ def depositions():
     default=None,
     help="A file to write the resulting deposition json representation to.",
 )
+@click.pass_obj
 def create(
+    client: Optional[ZenodoClient],
     metadata: Optional[str] = None,
     metadata_file: Optional[str] = None,
     prereserve_doi: Optional[bool] = None,
@@ -51,7 +59,9 @@ def create(
     if metadata_file is not None:
         metadata_parsed = Metadata.parse_file(metadata_file)
 
-    deposition: Deposition = Deposition.create(metadata_parsed, prereserve_doi)
+    deposition: Deposition = Deposition.create(
+        metadata_parsed, prereserve_doi, client=client
+    )
     json_response = deposition.json(exclude_none=True, indent=4)
     click.echo(json_response)
     if dest is None:
@@ -70,12 +80,15 @@ def create(
     default=None,
     help="A file to write the resulting deposition json representation to.",
 )
-def retrieve(deposition_id: str, dest: Optional[str] = None):
+@click.pass_obj
+def retrieve(
+    client: Optional[ZenodoClient], deposition_id: str, dest: Optional[str] = None
+):
     """Retrieve deposition by ID from server.
 
     DEPOSITION-ID is the id of the deposition to be fetched
     """
-    deposition: Deposition = Deposition.retrieve(deposition_id)
+    deposition: Deposition = Deposition.retrieve(deposition_id, client=client)
     json_response = deposition.json(exclude_none=True, indent=4)
     click.echo(json_response)
     if dest is None:
@@ -106,16 +119,37 @@ def retrieve(deposition_id: str, dest: Optional[str] = None):
     "--all-versions",
     help="Show (true or 1) or hide (false or 0) all versions of deposits.",
 )
+@click.option(
+    "--all-pages",
+    is_flag=True,
+    help="Stream the depositions of all pages instead of a single page.",
+)
+@click.option(
+    "--fields",
+    help="Comma separated fields to print, e.g. id,doi; skips validating the rest.",
+)
+@click.pass_obj
 def search_depositions(
+    client: Optional[ZenodoClient],
     query: Optional[str] = None,
     status: Optional[str] = None,
     sort: Optional[str] = None,
     page: Optional[str] = None,
     size: Optional[int] = None,
     all_versions: bool = None,
+    all_pages: bool = False,
+    fields: Optional[str] = None,
 ):
-    result: list[Deposition]
-    result = actions.search(query, status, sort, page, size, all_versions)
+    result: Iterable[Deposition]
+    names = None if fields is None else [x.strip() for x in fields.split(",")]
+    if all_pages:
+        result = actions.iter_search(
+            query, status, sort, size, all_versions, client=client, fields=names
+        )
+    else:
+        result = actions.search(
+            query, status, sort, page, size, all_versions, client=client, fields=names
+        )
     for x in result:
         click.echo(x.json(exclude_none=True, indent=2))
 
@@ -129,7 +163,9 @@ def search_depositions(
     "metadata_file",
     type=click.Path(exists=True, file_okay=True, dir_okay=False),
 )
+@click.pass_obj
 def update(
+    client: Optional[ZenodoClient],
     deposition_json: str,
     metadata_file: str,
 ):
@@ -142,10 +178,10 @@ def update(
     """
 
     deposition: Deposition = Deposition.parse_file(deposition_json)
-    deposition = deposition.get_latest_draft()
+    draft_id = deposition.latest_draft_id(client=client)
     metadata = Metadata.parse_file(metadata_file)
 
-    deposition = actions.update_metadata(deposition.id, metadata)
+    deposition = actions.update_metadata(draft_id, metadata, client=client)
     json_response = deposition.json(exclude_none=True, indent=4)
     click.echo(json_response)
 
@@ -155,7 +191,9 @@ def update(
     "deposition-json",
     type=click.Path(exists=True, file_okay=True, dir_okay=False),
 )
+@click.pass_obj
 def delete(
+    client: Optional[ZenodoClient],
     deposition_json: str,
 ):
     """Delete a not yet published deposition
@@ -164,8 +202,8 @@ def delete(
     """
 
     deposition: Deposition = Deposition.parse_file(deposition_json)
-    deposition = deposition.get_latest_draft()
-    response: Response = actions.delete_remote(deposition.id)
+    draft_id = deposition.latest_draft_id(client=client)
+    response: Response = actions.delete_remote(draft_id, client=client)
     json_response = response.json(exclude_none=True, indent=4)
     click.echo(json_response)
 
@@ -179,9 +217,23 @@ def delete(
     "file",
     type=click.Path(exists=True, file_okay=True, dir_okay=True),
 )
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Zip directories on the fly while uploading instead of to a temp file.",
+)
+@click.option(
+    "--resumable",
+    is_flag=True,
+    help="Upload large files in parts which can be resumed after a failure.",
+)
+@click.pass_obj
 def upload_file(
+    client: Optional[ZenodoClient],
     deposition_json: str,
     file: str,
+    stream: bool = False,
+    resumable: bool = False,
 ):
     """Upload a file to the bucket of a not yet published deposition
 
@@ -191,8 +243,10 @@ def upload_file(
     """
 
     deposition: Deposition = Deposition.parse_file(deposition_json)
-    deposition = deposition.get_latest_draft()
-    bucket_file: BucketFile = deposition.upload_file(file)
+    deposition = deposition.get_latest_draft(client=client)
+    bucket_file: BucketFile = deposition.upload_file(
+        file, client=client, stream=stream, resumable=resumable
+    )
     json_response = bucket_file.json(exclude_none=True, indent=4)
     click.echo(json_response)
 
@@ -202,7 +256,78 @@ def upload_file(
     "deposition-json",
     type=click.Path(exists=True, file_okay=True, dir_okay=False),
 )
+@click.argument(
+    "files",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, file_okay=True, dir_okay=True),
+)
+@click.option(
+    "--max-workers",
+    type=click.INT,
+    default=4,
+    show_default=True,
+    help="Maximum number of concurrent uploads.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Zip directories on the fly while uploading instead of to a temp file.",
+)
+@click.pass_obj
+def upload_files(
+    client: Optional[ZenodoClient],
+    deposition_json: str,
+    files: tuple[str, ...],
+    max_workers: int = 4,
+    stream: bool = False,
+):
+    """Upload files concurrently to the bucket of a not yet published deposition
+
+    Per file results and the aggregate throughput are reported on stderr.
+
+    DEPOSITION_JSON json representation of the deposition to be uploaded to.
+
+    FILES the paths to the files to be uploaded
+    """
+
+    def report(path: str, result: Union[BucketFile, Exception], seconds: float):
+        if isinstance(result, Exception):
+            click.echo(f"FAILED {path}: {result}", err=True)
+        else:
+            click.echo(f"OK {path} {result.size} bytes {seconds:.2f}s", err=True)
+
+    deposition: Deposition = Deposition.parse_file(deposition_json)
+    deposition = deposition.get_latest_draft(client=client)
+    start = time.perf_counter()
+    failure: Optional[UploadFailed] = None
+    try:
+        bucket_files = deposition.upload_files(
+            list(files), max_workers, client=client, callback=report, stream=stream
+        )
+    except UploadFailed as e:
+        failure = e
+        bucket_files = e.uploaded
+    seconds = time.perf_counter() - start
+    total = sum(x.size for x in bucket_files)
+    click.echo(
+        f"{len(bucket_files)}/{len(files)} files, {total} bytes in {seconds:.2f}s "
+        f"({total / max(seconds, 1e-9) / 1e6:.2f} MB/s)",
+        err=True,
+    )
+    click.echo(json.dumps([x.dict(exclude_none=True) for x in bucket_files], indent=4))
+    if failure is not None:
+        raise click.ClickException(str(failure))
+
+
+@depositions.command()
+@click.argument(
+    "deposition-json",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.pass_obj
 def delete_files(
+    client: Optional[ZenodoClient],
     deposition_json: str,
 ):
     """Delete files from the bucket of a not yet published deposition
@@ -211,11 +336,55 @@ def delete_files(
     """
 
     deposition: Deposition = Deposition.parse_file(deposition_json)
-    deposition = deposition.get_latest_draft()
-    responses = deposition.delete_files()
+    deposition = deposition.get_latest_draft(client=client)
+    responses = deposition.delete_files(client=client)
     click.echo(responses)
 
 
+@depositions.command()
+@click.argument(
+    "deposition-json",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.argument(
+    "local-dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--max-workers",
+    type=click.INT,
+    default=4,
+    show_default=True,
+    help="Maximum number of concurrent uploads.",
+)
+@click.option(
+    "--keep-remote",
+    is_flag=True,
+    help="Do not delete files of the deposition which are missing locally.",
+)
+@click.pass_obj
+def sync_files(
+    client: Optional[ZenodoClient],
+    deposition_json: str,
+    local_dir: str,
+    max_workers: int = 4,
+    keep_remote: bool = False,
+):
+    """Upload new or changed files and delete removed files of a draft
+
+    DEPOSITION_JSON json representation of the deposition to be synced.
+
+    LOCAL_DIR the directory holding the files the deposition should have
+    """
+
+    deposition: Deposition = Deposition.parse_file(deposition_json)
+    deposition = deposition.get_latest_draft(client=client)
+    result = deposition.sync_files(
+        local_dir, max_workers, delete=not keep_remote, client=client
+    )
+    click.echo(result.json(exclude_none=True, indent=4))
+
+
 @depositions.command()
 @click.argument(
     "deposition-json",
@@ -227,7 +396,9 @@ def delete_files(
     default=None,
     help="A file to write the resulting deposition json representation to.",
 )
+@click.pass_obj
 def publish(
+    client: Optional[ZenodoClient],
     deposition_json: str,
     dest: Optional[str] = None,
 ):
@@ -237,8 +408,8 @@ def publish(
     """
 
     deposition: Deposition = Deposition.parse_file(deposition_json)
-    deposition = deposition.get_latest_draft()
-    deposition = actions.publish(deposition.id)
+    draft_id = deposition.latest_draft_id(client=client)
+    deposition = actions.publish(draft_id, client=client)
     json_response = deposition.json(exclude_none=True, indent=4)
     click.echo(json_response)
     if dest is None:
@@ -260,16 +431,18 @@ def publish(
     default=None,
     help="A file to write the resulting deposition json representation to.",
 )
-def new_version(deposition_json: str, dest: Optional[str] = None):
+@click.pass_obj
+def new_version(
+    client: Optional[ZenodoClient], deposition_json: str, dest: Optional[str] = None
+):
     """Create a new version of a published disposition
 
     DEPOSITION_JSON json representation of the deposition to be published
     """
 
     deposition: Deposition = Deposition.parse_file(deposition_json)
-    deposition = deposition.refresh()
-    deposition = deposition.get_latest()
-    deposition = actions.new_version(deposition.id)
+    latest_id = deposition.latest_id(client=client)
+    deposition = actions.new_version(latest_id, client=client)
     json_response = deposition.json(exclude_none=True, indent=4)
     click.echo(json_response)
     if dest is None:
@@ -280,6 +453,168 @@ def new_version(deposition_json: str, dest: Optional[str] = None):
         f.write(json_response)
 
 
+@depositions.command()
+@click.argument(
+    "deposition-json",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.argument("dest", type=click.Path(file_okay=False, dir_okay=True))
+@click.option(
+    "--max-workers",
+    type=click.INT,
+    default=4,
+    show_default=True,
+    help="Maximum number of files downloaded at once.",
+)
+@click.option(
+    "--max-segments",
+    type=click.INT,
+    default=4,
+    show_default=True,
+    help="Maximum number of concurrent byte ranges per large file.",
+)
+@click.pass_obj
+def download(
+    client: Optional[ZenodoClient],
+    deposition_json: str,
+    dest: str,
+    max_workers: int = 4,
+    max_segments: int = 4,
+):
+    """Download the files of a deposition, verifying their checksums
+
+    DEPOSITION_JSON json representation of the deposition
+
+    DEST the directory to download the files into
+    """
+
+    deposition: Deposition = Deposition.parse_file(deposition_json)
+    deposition = deposition.refresh(client=client)
+    paths = download_files(
+        deposition, dest, max_workers, max_segments=max_segments, client=client
+    )
+    for path in paths:
+        click.echo(path)
+
+
+@depositions.command()
+@click.argument(
+    "deposition-json",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.argument(
+    "local-dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--metadata-file",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    help="Optional json file of metadata for the new version.",
+)
+@click.option(
+    "--max-workers",
+    type=click.INT,
+    default=4,
+    show_default=True,
+    help="Maximum number of concurrent file transfers.",
+)
+@click.option(
+    "--keep-remote",
+    is_flag=True,
+    help="Do not delete files of the previous version which are missing locally.",
+)
+@click.option(
+    "--no-publish",
+    is_flag=True,
+    help="Leave the new version as a draft.",
+)
+@click.option(
+    "--retries",
+    type=click.INT,
+    default=0,
+    show_default=True,
+    help="Number of times to retry publishing after a server error.",
+)
+@click.pass_obj
+def release(
+    client: Optional[ZenodoClient],
+    deposition_json: str,
+    local_dir: str,
+    metadata_file: Optional[str] = None,
+    max_workers: int = 4,
+    keep_remote: bool = False,
+    no_publish: bool = False,
+    retries: int = 0,
+):
+    """Publish a new version of a deposition with the files of a directory
+
+    Creates the new version, syncs its files while updating its metadata, and
+    publishes it. The result includes the seconds taken by every stage.
+
+    DEPOSITION_JSON json representation of any version of the deposition
+
+    LOCAL_DIR the directory holding the files of the new version
+    """
+
+    deposition: Deposition = Deposition.parse_file(deposition_json)
+    metadata = None
+    if metadata_file is not None:
+        metadata = Metadata.parse_file(metadata_file)
+    result = release_deposition(
+        deposition.latest_id(client=client),
+        local_dir,
+        metadata,
+        max_workers,
+        delete=not keep_remote,
+        publish=not no_publish,
+        retries=retries,
+        client=client,
+    )
+    click.echo(result.json(exclude_none=True, indent=4))
+
+
+@depositions.command()
+@click.argument("manifest", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--output",
+    "-o",
+    type=click.File("w", encoding="utf-8"),
+    default="-",
+    help="A file to write the JSONL results to (defaults to stdout).",
+)
+@click.option(
+    "--max-workers",
+    type=click.INT,
+    default=8,
+    show_default=True,
+    help="Maximum number of operations run at once.",
+)
+@click.pass_obj
+def batch(
+    client: Optional[ZenodoClient],
+    manifest: TextIO,
+    output: TextIO,
+    max_workers: int = 8,
+):
+    """Run the operations of a JSONL manifest concurrently
+
+    Each line is one operation, e.g. {"op": "publish", "id": "123"}; the
+    operations are create, update, upload, publish, new-version and delete.
+    A result line is written for every operation as soon as it completes.
+
+    MANIFEST the JSONL file of operations, - for stdin
+    """
+
+    failed = 0
+    for result in run_batch(manifest, max_workers, client=client):
+        failed += not result["ok"]
+        output.write(json.dumps(result, default=str))
+        output.write("\n")
+        output.flush()
+    if failed:
+        raise click.ClickException(f"{failed} operations failed")
+
+
 @depositions.group()
 def doi():
     """Get DOIs related to depositions"""
@@ -298,7 +633,9 @@ def doi():
     is_flag=True,
     help="Return the full url of the latest draft's DOI",
 )
+@click.pass_obj
 def latest(
+    client: Optional[ZenodoClient],
     deposition_json: str,
     full_url: bool,
 ):
@@ -308,7 +645,7 @@ def latest(
     """
 
     deposition: Deposition = Deposition.parse_file(deposition_json)
-    deposition = deposition.get_latest()
+    deposition = deposition.get_latest(client=client)
     if full_url:
         click.echo(deposition.doi_url)
     else:
@@ -326,7 +663,9 @@ def latest(
     is_flag=True,
     help="Return the full url of the latest draft's DOI",
 )
+@click.pass_obj
 def latest_draft(
+    client: Optional[ZenodoClient],
     deposition_json: str,
     full_url: bool,
 ):
@@ -336,7 +675,7 @@ def latest_draft(
     """
 
     deposition: Deposition = Deposition.parse_file(deposition_json)
-    draft: Deposition = deposition.get_latest_draft()
+    draft: Deposition = deposition.get_latest_draft(client=client)
     if draft is None:
         raise NoDraftFound(deposition.id)
     if full_url:
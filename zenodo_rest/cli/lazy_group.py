@@ -0,0 +1,32 @@
+import importlib
+from typing import Optional
+
+import click
+
+
+class LazyGroup(click.Group):
+    """A click group importing the modules of its subcommands when invoked
+
+    :param lazy_subcommands: The import paths of the subcommands by name, as
+        "package.module:attribute"
+    :type lazy_subcommands: Optional[dict[str, str]]
+    """
+
+    def __init__(
+        self, *args, lazy_subcommands: Optional[dict[str, str]] = None, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands: dict[str, str] = lazy_subcommands or {}
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted([*super().list_commands(ctx), *self.lazy_subcommands])
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name not in self.lazy_subcommands:
+            return super().get_command(ctx, cmd_name)
+        module_name, attribute = self.lazy_subcommands[cmd_name].split(":")
+        command = getattr(importlib.import_module(module_name), attribute)
+        # Keep the loaded command, list_commands returns each name once
+        self.add_command(command, cmd_name)
+        del self.lazy_subcommands[cmd_name]
+        return command
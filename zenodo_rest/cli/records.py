@@ -0,0 +1,168 @@
+import json
+from typing import Optional
+
+import click
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.files.download import download_files
+from zenodo_rest.records import actions
+from zenodo_rest.records.harvest import HarvestCheckpoint, harvest_hits, harvest_scope
+
+
+@click.group()
+def records():
+    pass
+
+
+@records.command()
+@click.option(
+    "--query", "-q", help="Search query (using Elasticsearch query string syntax)."
+)
+@click.option(
+    "--status", help="Filter result based on deposit status (either draft or published)"
+)
+@click.option(
+    "--sort",
+    help=(
+        "Sort order (bestmatch or mostrecent)."
+        "Prefix with minus to change form ascending to descending (e.g. -mostrecent)."
+    ),
+)
+@click.option("--size", type=click.INT, help="Number of results to fetch per page.")
+@click.option(
+    "--all-versions",
+    is_flag=True,
+    help="Show all versions of records.",
+)
+@click.option(
+    "--dest",
+    type=click.File("w", encoding="utf-8"),
+    default="-",
+    help="A file to write the records to (defaults to stdout).",
+)
+@click.pass_obj
+def search(
+    client: Optional[ZenodoClient],
+    query: Optional[str] = None,
+    status: Optional[str] = None,
+    sort: Optional[str] = None,
+    size: Optional[int] = None,
+    all_versions: bool = False,
+    dest=None,
+):
+    """Stream the records of all pages of a search as json lines"""
+
+    for hit in actions.iter_hits(
+        query, status, sort, size, all_versions, client=client
+    ):
+        dest.write(json.dumps(hit, separators=(",", ":")))
+        dest.write("\n")
+
+
+@records.command()
+@click.option(
+    "--query", "-q", help="Search query (using Elasticsearch query string syntax)."
+)
+@click.option("--size", type=click.INT, help="Number of results to fetch per page.")
+@click.option(
+    "--all-versions",
+    is_flag=True,
+    help="Harvest all versions of records.",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="The checkpoint database (defaults to harvest.sqlite in ZENODO_CACHE_DIR).",
+)
+@click.option(
+    "--overlap",
+    type=click.FLOAT,
+    default=300.0,
+    show_default=True,
+    help="Seconds before the last harvest to search again for late records.",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Forget the checkpoint of this harvest and emit all records again.",
+)
+@click.option(
+    "--dest",
+    type=click.File("w", encoding="utf-8"),
+    default="-",
+    help="A file to write the records to (defaults to stdout).",
+)
+@click.pass_obj
+def harvest(
+    client: Optional[ZenodoClient],
+    query: Optional[str] = None,
+    size: Optional[int] = None,
+    all_versions: bool = False,
+    checkpoint: Optional[str] = None,
+    overlap: float = 300.0,
+    full: bool = False,
+    dest=None,
+):
+    """Stream the records new or changed since the last harvest as json lines
+
+    The first harvest of a query emits all of its records, every later one only
+    the records updated since, with a revision not emitted before.
+    """
+
+    harvest_checkpoint = HarvestCheckpoint(checkpoint)
+    try:
+        if full:
+            harvest_checkpoint.reset(harvest_scope(query, all_versions, client=client))
+        for hit in harvest_hits(
+            query,
+            all_versions,
+            size,
+            harvest_checkpoint,
+            overlap,
+            client=client,
+        ):
+            dest.write(json.dumps(hit, separators=(",", ":")))
+            dest.write("\n")
+    finally:
+        harvest_checkpoint.close()
+
+
+@records.command()
+@click.argument("record-id", type=click.STRING)
+@click.argument("dest", type=click.Path(file_okay=False, dir_okay=True))
+@click.option(
+    "--max-workers",
+    type=click.INT,
+    default=4,
+    show_default=True,
+    help="Maximum number of files downloaded at once.",
+)
+@click.option(
+    "--max-segments",
+    type=click.INT,
+    default=4,
+    show_default=True,
+    help="Maximum number of concurrent byte ranges per large file.",
+)
+@click.pass_obj
+def download(
+    client: Optional[ZenodoClient],
+    record_id: str,
+    dest: str,
+    max_workers: int = 4,
+    max_segments: int = 4,
+):
+    """Download the files of a record, verifying their checksums
+
+    RECORD_ID the id of the record
+
+    DEST the directory to download the files into
+    """
+
+    record = actions.retrieve(record_id, client=client)
+    paths = download_files(
+        record, dest, max_workers, max_segments=max_segments, client=client
+    )
+    for path in paths:
+        click.echo(path)
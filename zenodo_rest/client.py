@@ -0,0 +1,368 @@
+import copy
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Sequence, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from zenodo_rest._json import loads, response_json
+from zenodo_rest.hooks import ClientHooks, call_hooks
+from zenodo_rest.http_cache import (
+    CacheEntry,
+    ResponseCache,
+    cache_key,
+    key_url,
+    url_below,
+)
+from zenodo_rest.ratelimit import RateLimiter, parse_retry_after
+from zenodo_rest.retry import TRANSIENT_ERRORS, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Mutating any url of a deposition invalidates the cached deposition
+_DEPOSITION_URL = re.compile(r"^(.*/api/deposit/depositions/[^/?]+)")
+
+
+class ZenodoClient:
+    """A reusable connection to a zenodo server
+
+    The client owns a pooled :class:`requests.Session`, so consecutive calls reuse
+    already established TCP/TLS connections instead of opening a new one per call.
+    Every function of this package accepts an optional client; when none is given
+    the process wide :meth:`ZenodoClient.default` client is used.
+
+    :param token: Your zenodo token
+        (defaults to the ZENODO_TOKEN envvar, resolved at request time)
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+        (defaults to the ZENODO_URL envvar, resolved at request time)
+    :type base_url: Optional[str]
+    :param pool_connections: The number of hosts to keep connection pools for
+    :type pool_connections: int
+    :param pool_maxsize: The maximum number of connections kept alive per host
+    :type pool_maxsize: int
+    :param headers: Default headers sent with every request
+    :type headers: Optional[dict]
+    :param timeout: Default timeout in seconds for every request
+    :type timeout: Optional[float]
+    :param cache: A cache for conditional GETs of depositions and records
+    :type cache: Optional[ResponseCache]
+    :param rate_limiter: Paces the requests to the limits reported by the server,
+        may be shared with other clients
+    :type rate_limiter: Optional[RateLimiter]
+    :param retry_policy: Retries idempotent requests after transient failures
+        (defaults to no retries, the :meth:`ZenodoClient.default` client has a
+        RetryPolicy with its default attempts)
+    :type retry_policy: Optional[RetryPolicy]
+    :param hooks: Callbacks around every request, e.g. a MetricsCollector
+    :type hooks: Sequence[ClientHooks]
+    """
+
+    _default: Optional["ZenodoClient"] = None
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        hooks: Sequence[ClientHooks] = (),
+    ):
+        self.token: Optional[str] = token
+        self.hooks: list[ClientHooks] = list(hooks)
+        self.cache: Optional[ResponseCache] = cache
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        self.retry_policy: Optional[RetryPolicy] = retry_policy
+        self._in_flight: dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+        self.base_url: Optional[str] = base_url
+        self.timeout: Optional[float] = timeout
+        self.session: requests.Session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+        if headers is not None:
+            self.session.headers.update(headers)
+
+    @classmethod
+    def default(cls) -> "ZenodoClient":
+        """The client shared by all calls which are not given an explicit client
+
+        It retries requests failing with 429 or a 5xx status, or a transient
+        connection error, under a default RetryPolicy.
+
+        :return: The process wide default client
+        :rtype: ZenodoClient
+        """
+
+        if cls._default is None:
+            cls._default = cls(retry_policy=RetryPolicy())
+        return cls._default
+
+    def url(self, path: str, base_url: Optional[str] = None) -> str:
+        """Build an absolute url for a path of the zenodo api
+
+        :param path: The path on the server, e.g. /api/deposit/depositions
+        :type path: str
+        :param base_url: Overrides the base url of this client
+        :type base_url: Optional[str]
+        :return: The absolute url
+        :rtype: str
+        """
+
+        if base_url is None:
+            base_url = self.base_url
+        if base_url is None:
+            base_url = os.getenv("ZENODO_URL")
+        return f"{base_url}{path}"
+
+    def auth_header(self, token: Optional[str] = None) -> dict:
+        if token is None:
+            token = self.token
+        if token is None:
+            token = os.getenv("ZENODO_TOKEN")
+        return {"Authorization": f"Bearer {token}"}
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        token: Optional[str] = None,
+        headers: Optional[dict] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """Send an authorized request over the pooled session
+
+        :param method: The HTTP verb
+        :type method: str
+        :param url: The absolute url of the request
+        :type url: str
+        :param token: Overrides the token of this client
+        :type token: Optional[str]
+        :param headers: Additional headers for this request only
+        :type headers: Optional[dict]
+        :return: The requests HTTP response, after retries if a retry policy is
+            set, the last response is returned even if its status is an error.
+            A retried DELETE answered with 404 is returned as 204, as an
+            earlier attempt deleted the resource.
+        :rtype: requests.Response
+        """
+
+        header = self.auth_header(token)
+        if headers is not None:
+            header.update(headers)
+        kwargs.setdefault("timeout", self.timeout)
+        if method not in ("GET", "HEAD"):
+            # Other urls, e.g. of buckets, are invalidated by their callers
+            match = _DEPOSITION_URL.match(url)
+            if match is not None:
+                self.invalidate(match.group(1))
+        policy = self.retry_policy
+        if policy is None or not policy.retries(method, **kwargs):
+            return self._send(method, url, header, kwargs)
+
+        data: Any = kwargs.get("data")
+        position = data.tell() if hasattr(data, "tell") else None
+        attempts = max(policy.attempts, 1)
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            if position is not None:
+                data.seek(position)
+            retry_after = 0.0
+            try:
+                response = self._send(method, url, header, kwargs)
+            except TRANSIENT_ERRORS as e:
+                if last:
+                    raise
+                reason = str(e)
+            else:
+                if attempt > 0 and method == "DELETE" and response.status_code == 404:
+                    logger.info(f"{method} {url} took effect on an earlier attempt")
+                    response.status_code = 204
+                    return response
+                if last or response.status_code not in policy.statuses:
+                    return response
+                reason = f"status {response.status_code}"
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.close()
+            delay = policy.delay(attempt, retry_after)
+            self.on_retry(method, url, attempt, reason, delay)
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def on_retry(self, method: str, url: str, attempt: int, reason: str, delay: float):
+        """Report that a failed request is sent again after delay seconds"""
+
+        logger.warning(f"{method} {url} failed ({reason}), retrying in {delay:.2f}s")
+        call_hooks(self.hooks, "on_retry", method, url, attempt, reason, delay)
+
+    def _send(
+        self, method: str, url: str, headers: dict, kwargs: dict
+    ) -> requests.Response:
+        if not self.hooks:
+            return self._send_limited(method, url, headers, kwargs)
+
+        headers = dict(headers)
+        call_hooks(self.hooks, "before_request", method, url, headers)
+        start = time.monotonic()
+        try:
+            response = self._send_limited(method, url, headers, kwargs)
+        except Exception as e:
+            elapsed = time.monotonic() - start
+            call_hooks(self.hooks, "after_response", method, url, None, elapsed, e)
+            raise
+        elapsed = time.monotonic() - start
+        call_hooks(self.hooks, "after_response", method, url, response, elapsed, None)
+        return response
+
+    def _send_limited(
+        self, method: str, url: str, headers: dict, kwargs: dict
+    ) -> requests.Response:
+        if self.rate_limiter is None:
+            return self.session.request(method, url, headers=headers, **kwargs)
+
+        # The slot is returned once the headers arrived, also for streamed bodies
+        self.rate_limiter.acquire()
+        response = None
+        try:
+            response = self.session.request(method, url, headers=headers, **kwargs)
+            return response
+        finally:
+            if response is None:
+                self.rate_limiter.release()
+            else:
+                self.rate_limiter.release(response.status_code, response.headers)
+
+    def get_cached(
+        self,
+        url: str,
+        parse: Callable[[dict], T],
+        token: Optional[str] = None,
+        headers: Optional[dict] = None,
+    ) -> T:
+        """GET and parse json, revalidating a cached response when possible
+
+        With a cache configured, the request carries If-None-Match and
+        If-Modified-Since of the cached response, and on 304 Not Modified the
+        previously parsed value is returned without parsing again.
+        Concurrent calls for the same url and credentials share a single request.
+        Every caller receives its own deep copy of the value, so modifying it
+        neither changes the cache nor the values of other callers.
+
+        :param url: The absolute url of the request
+        :type url: str
+        :param parse: Builds the returned value from the json body
+        :type parse: Callable[[dict], T]
+        :param token: Overrides the token of this client
+        :type token: Optional[str]
+        :param headers: Additional headers for this request only
+        :type headers: Optional[dict]
+        :return: The parsed body
+        :rtype: T
+        """
+
+        key = cache_key(url, self.auth_header(token)["Authorization"])
+        with self._in_flight_lock:
+            shared = self._in_flight.get(key)
+            if shared is None:
+                future: Future = Future()
+                self._in_flight[key] = future
+        if shared is not None:
+            return copy.deepcopy(shared.result())
+        try:
+            value = self._get_cached(key, url, parse, token, headers)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._in_flight_lock:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+        return copy.deepcopy(value)
+
+    def _get_cached(
+        self,
+        key: str,
+        url: str,
+        parse: Callable[[dict], T],
+        token: Optional[str],
+        headers: Optional[dict],
+    ) -> T:
+        if self.cache is None:
+            response = self.get(url, token=token, headers=headers)
+            response.raise_for_status()
+            return parse(response_json(response))
+
+        entry = self.cache.get(key)
+        header = dict(headers or {})
+        if entry is not None and entry.etag is not None:
+            header["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified is not None:
+            header["If-Modified-Since"] = entry.last_modified
+        response = self.get(url, token=token, headers=header)
+        if response.status_code == 304 and entry is not None:
+            if entry.value is None:
+                entry = entry._replace(value=parse(loads(entry.body)))
+                self.cache.put(key, entry)
+            return entry.value
+
+        response.raise_for_status()
+        value = parse(response_json(response))
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag is not None or last_modified is not None:
+            self.cache.put(key, CacheEntry(etag, last_modified, response.text, value))
+        return value
+
+    def invalidate(self, url: Optional[str]):
+        """Drop cached responses of a url and every url below it
+
+        GETs of these urls which are still in flight are not shared with later
+        calls anymore, as they may have started before a modification.
+        """
+
+        if url is None:
+            return
+        with self._in_flight_lock:
+            for key in [k for k in self._in_flight if url_below(key_url(k), url)]:
+                del self._in_flight[key]
+        if self.cache is not None:
+            self.cache.invalidate(url)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self) -> "ZenodoClient":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
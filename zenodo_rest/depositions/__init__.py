@@ -1,3 +1,17 @@
-from . import actions
+import importlib
+from typing import TYPE_CHECKING
 
-__all__: list[str] = ["actions"]
+if TYPE_CHECKING:
+    from . import actions, batch, poller, release
+
+__all__: list[str] = ["actions", "batch", "poller", "release"]
+
+
+def __getattr__(name: str):
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return importlib.import_module(f"{__name__}.{name}")
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
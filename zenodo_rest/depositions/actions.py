@@ -1,14 +1,18 @@
-import os
-from typing import Optional
 import logging
+from concurrent.futures import Future
+from typing import Callable, Iterator, Literal, Optional, Union, overload
 
 import requests
 
+from zenodo_rest._json import response_json
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.depositions.poller import PublishPoller, http_error
 from zenodo_rest.entities.deposition import Deposition
 from zenodo_rest.entities.metadata import Metadata
+from zenodo_rest.pagination import iter_pages, search_params
+from zenodo_rest.retry import RetryPolicy, call_verified
 
-logging.basicConfig()
-logger = logging.getLogger()
+logger = logging.getLogger(__name__)
 
 
 def update_metadata(
@@ -16,6 +20,7 @@ def update_metadata(
     metadata: Metadata,
     token: Optional[str] = None,
     base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
 ) -> Deposition:
     """Update the metadata of a not yet published deposition
 
@@ -28,28 +33,32 @@ def update_metadata(
     :type token: Optional[str]
     :param base_url: The url to the target zenodo server
     :type base_url: Optional[str]
+    :param client: The client to send the request with
+        (defaults to the shared ZenodoClient.default())
+    :type client: Optional[ZenodoClient]
     :return: The deposition with updated metadata
     :rtype: Deposition
     """
 
-    if token is None:
-        token = os.getenv("ZENODO_TOKEN")
-    if base_url is None:
-        base_url = os.getenv("ZENODO_URL")
-    header = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+    if client is None:
+        client = ZenodoClient.default()
 
-    response = requests.put(
-        f"{base_url}/api/deposit/depositions/{deposition_id}",
+    response = client.put(
+        client.url(f"/api/deposit/depositions/{deposition_id}", base_url),
         json={"metadata": metadata.dict(exclude_none=True)},
-        headers=header,
+        headers={"Accept": "application/json"},
+        token=token,
     )
 
     response.raise_for_status()
-    return Deposition.parse_obj(response.json())
+    return Deposition.parse_obj(response.json())._mark_fresh()
 
 
 def delete_remote(
-    deposition_id: str, token: Optional[str] = None, base_url: Optional[str] = None
+    deposition_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
 ) -> requests.Response:
     """Delete a not yet published draft of a deposition
 
@@ -60,35 +69,91 @@ def delete_remote(
     :type token: Optional[str]
     :param base_url: The url to the target zenodo server
     :type base_url: Optional[str]
+    :param client: The client to send the request with
+        (defaults to the shared ZenodoClient.default())
+    :type client: Optional[ZenodoClient]
     :return: The requests HTTP response
     :rtype: requests.Response
     """
 
-    if token is None:
-        token = os.getenv("ZENODO_TOKEN")
-    if base_url is None:
-        base_url = os.getenv("ZENODO_URL")
-    header = {
-        "Authorization": f"Bearer {token}",
-    }
-
-    response = requests.delete(
-        f"{base_url}/api/deposit/depositions/{deposition_id}",
-        headers=header,
+    if client is None:
+        client = ZenodoClient.default()
+
+    response = client.delete(
+        client.url(f"/api/deposit/depositions/{deposition_id}", base_url),
+        token=token,
     )
 
     response.raise_for_status()
     return response
 
 
+@overload
 def publish(
     deposition_id: str,
     token: Optional[str] = None,
     base_url: Optional[str] = None,
     retries: int = 0,
+    client: Optional[ZenodoClient] = None,
+    wait: Literal[True] = True,
+    poller: Optional[PublishPoller] = None,
+    accept_timeout: float = 10.0,
 ) -> Deposition:
+    ...
+
+
+@overload
+def publish(
+    deposition_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    retries: int = 0,
+    client: Optional[ZenodoClient] = None,
+    *,
+    wait: Literal[False],
+    poller: Optional[PublishPoller] = None,
+    accept_timeout: float = 10.0,
+) -> "Future[Deposition]":
+    ...
+
+
+@overload
+def publish(
+    deposition_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    retries: int = 0,
+    client: Optional[ZenodoClient] = None,
+    wait: bool = True,
+    poller: Optional[PublishPoller] = None,
+    accept_timeout: float = 10.0,
+) -> Union[Deposition, "Future[Deposition]"]:
+    ...
+
+
+def publish(
+    deposition_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    retries: int = 0,
+    client: Optional[ZenodoClient] = None,
+    wait: bool = True,
+    poller: Optional[PublishPoller] = None,
+    accept_timeout: float = 10.0,
+) -> Union[Deposition, "Future[Deposition]"]:
     """Publish a deposition
 
+    When the request fails with a server error or a timeout, the deposition is
+    retrieved to check whether it was published anyway before publishing again,
+    as often as the retry policy of the client or retries allow.
+
+    Publishing a large deposition may take minutes. With wait=False the request
+    is only waited for accept_timeout seconds, and a future is returned at once.
+    If the server did not answer in time, or answered with a transient error,
+    the poller watches the deposition until it is published, without holding a
+    thread per deposition. After an error, the poller sends the request again
+    whenever it finds the deposition not submitted, as often as retries allow.
+
     :param deposition_id: The id of the deposition to be published
     :type deposition_id: str
     :param token: Your zenodo token
@@ -96,60 +161,87 @@ def publish(
     :type token: Optional[str]
     :param base_url: The url to the target zenodo server
     :type base_url: Optional[str]
-    :return: The published deposition
-    :rtype: Deposition
+    :param retries: Overrides the number of retries of the client's retry policy
+    :type retries: int
+    :param client: The client to send the request with
+        (defaults to the shared ZenodoClient.default())
+    :type client: Optional[ZenodoClient]
+    :param wait: Whether to wait for the publication to complete
+    :type wait: bool
+    :param poller: The poller to watch pending publications with if not waiting
+        (defaults to the shared PublishPoller.default())
+    :type poller: Optional[PublishPoller]
+    :param accept_timeout: The seconds to wait for a response if not waiting
+    :type accept_timeout: float
+    :return: The published deposition, or a future of it if not waiting
+    :rtype: Union[Deposition, Future[Deposition]]
     """
 
-    if token is None:
-        token = os.getenv("ZENODO_TOKEN")
-    if base_url is None:
-        base_url = os.getenv("ZENODO_URL")
-    header = {
-        "Authorization": f"Bearer {token}",
-    }
-
-    response = requests.post(
-        f"{base_url}/api/deposit/depositions/{deposition_id}/actions/publish",
-        headers=header,
+    if client is None:
+        client = ZenodoClient.default()
+    url = client.url(
+        f"/api/deposit/depositions/{deposition_id}/actions/publish", base_url
     )
-
-    # Zenodo returns > 500 for internal server errors
-    # This includes timeouts where it is possible that a success just wasn't returned
-    if response.status_code >= 500:
-        logger.warning(f"Zenodo returned an internal error: {response.status_code}.")
-        logger.info(
-            "It can be that only a timeout occured, and the deposition was published."
-        )
-        logger.warning(
-            "Checking if the deposition was published despite Zenodo's internal error."
-        )
-        deposition = Deposition.retrieve(deposition_id)
-        if deposition.published:
-            logger.info(f"Deposition {deposition_id} was published")
-            return deposition
-        elif retries > 0:
-            logger.warning(f"Retries remaining: {retries}")
-            logger.warning(f"Deposition {deposition_id} was not published, retrying")
-            retries -= 1
-            return publish(
-                deposition_id=deposition_id,
-                token=token,
-                base_url=base_url,
-                retries=retries,
+    policy = client.retry_policy or RetryPolicy(attempts=1)
+    if retries > 0:
+        policy = RetryPolicy(retries + 1, policy.backoff, policy.max_backoff)
+
+    if not wait:
+        if poller is None:
+            poller = PublishPoller.default()
+
+        def send() -> requests.Response:
+            return client.post(url, token=token, timeout=accept_timeout)
+
+        try:
+            response = send()
+        except requests.ReadTimeout:
+            return poller.watch(deposition_id, token, base_url, client)
+        if response.status_code in policy.statuses or response.status_code >= 500:
+            logger.warning(f"Publishing returned {response.status_code}, polling")
+            error = http_error(response)
+            response.close()
+            return poller.watch(
+                deposition_id,
+                token,
+                base_url,
+                client,
+                resend=send,
+                policy=policy,
+                error=error,
             )
-        else:
-            logger.error(f"Deposition {deposition_id} was not published")
-
-    response.raise_for_status()
-    return Deposition.parse_obj(response.json())
+        response.raise_for_status()
+        future: Future = Future()
+        future.set_result(Deposition.parse_obj(response.json())._mark_fresh())
+        return future
+
+    def verify() -> Optional[Deposition]:
+        # A timeout may be reported although the deposition was published
+        deposition = Deposition.retrieve(deposition_id, token, base_url, client)
+        return deposition if deposition.submitted else None
+
+    return call_verified(
+        lambda: client.post(url, token=token),
+        lambda response: Deposition.parse_obj(response.json())._mark_fresh(),
+        verify,
+        policy,
+        f"publication of deposition {deposition_id}",
+        lambda *retry: client.on_retry("POST", url, *retry),
+    )
 
 
 def new_version(
-    deposition_id: str, token: Optional[str] = None, base_url: Optional[str] = None
+    deposition_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
 ) -> Deposition:
     """Create a new version draft of a deposition
 
-    Only one draft may exist at a time, this may fail when a draft already exists
+    Only one draft may exist at a time, this may fail when a draft already exists.
+    When the request fails with a server error or a timeout, the deposition is
+    retrieved to check whether the draft was created anyway before trying again,
+    as often as the retry policy of the client allows.
 
     :param deposition_id: The id of the deposition to create a new version of.
     :type deposition_id: str
@@ -158,26 +250,58 @@ def new_version(
     :type token: Optional[str]
     :param base_url: The url to the target zenodo server
     :type base_url: Optional[str]
+    :param client: The client to send the request with
+        (defaults to the shared ZenodoClient.default())
+    :type client: Optional[ZenodoClient]
     :return: The currently published deposition (now containing a link to the draft)
     :rtype: Deposition
     """
 
-    if token is None:
-        token = os.getenv("ZENODO_TOKEN", token)
-    if base_url is None:
-        base_url = os.getenv("ZENODO_URL")
-    header = {
-        "Authorization": f"Bearer {token}",
-    }
-
-    response = requests.post(
-        f"{base_url}/api/deposit/depositions/{deposition_id}/actions/newversion",
-        headers=header,
+    if client is None:
+        client = ZenodoClient.default()
+
+    def verify() -> Optional[Deposition]:
+        deposition = Deposition.retrieve(deposition_id, token, base_url, client)
+        draft_url = deposition.links.get("latest_draft")
+        if draft_url is None or draft_url.rsplit("/", 1)[1] == deposition.id:
+            return None
+        return deposition
+
+    url = client.url(
+        f"/api/deposit/depositions/{deposition_id}/actions/newversion", base_url
+    )
+    return call_verified(
+        lambda: client.post(url, token=token),
+        lambda response: Deposition.parse_obj(response.json())._mark_fresh(),
+        verify,
+        client.retry_policy or RetryPolicy(attempts=1),
+        f"new version of deposition {deposition_id}",
+        lambda *retry: client.on_retry("POST", url, *retry),
     )
 
-    response.raise_for_status()
-    deposition: Deposition = Deposition.parse_obj(response.json())
-    return deposition
+
+def deposition_parser(fields: Optional[list[str]]) -> Callable[[dict], Deposition]:
+    """Build the depositions of search hits, optionally only some of their fields
+
+    :param fields: Only set these fields, without validating them
+        (defaults to all fields, validated)
+    :type fields: Optional[list[str]]
+    :return: Builds a deposition from the json of a hit
+    :rtype: Callable[[dict], Deposition]
+    :raises ValueError: If a field is not a field of a deposition
+    """
+
+    if fields is None:
+        return Deposition.parse_obj
+    # The stubs of pydantic 2 type __fields__ as a deprecated property
+    unknown = set(fields) - set(Deposition.__fields__)  # type: ignore
+    if unknown:
+        raise ValueError(f"Unknown fields of a deposition: {', '.join(unknown)}")
+    # Projections are built without validation, other fields are not set
+    names = list(fields)
+    return lambda hit: Deposition.construct(
+        _fields_set=set(names), **{x: hit.get(x) for x in names}
+    )
 
 
 def search(
@@ -188,6 +312,9 @@ def search(
     size: Optional[int] = None,
     all_versions: Optional[bool] = None,
     token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+    fields: Optional[list[str]] = None,
 ) -> list[Deposition]:
     """Search for depositions
 
@@ -204,31 +331,78 @@ def search(
     :param all_versions: 'true' to show all versions, 'false' to hide other versions
     :type all_versions: Optional[str]
     :param token: your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :param client: The client to send the request with
+        (defaults to the shared ZenodoClient.default())
+    :type client: Optional[ZenodoClient]
+    :param fields: Only set these fields of the depositions, without validating
+        them, which is much faster for large results (defaults to all fields)
+    :type fields: Optional[list[str]]
     :return: The list of depositions found
     :rtype: list[Deposition]
     """
 
-    if token is None:
-        token = os.getenv("ZENODO_TOKEN")
-
-    base_url = os.getenv("ZENODO_URL")
-    header = {"Authorization": f"Bearer {token}"}
-    params: dict = {}
-    if query is not None:
-        params["q"] = query
-    if status is not None:
-        params["status"] = status
-    if sort is not None:
-        params["sort"] = sort
-    if page is not None:
-        params["page"] = page
-    if size is not None:
-        params["size"] = size
-    if all_versions:
-        params["all_versions"] = "true"
-    response = requests.get(
-        f"{base_url}/api/deposit/depositions", headers=header, params=params
+    if client is None:
+        client = ZenodoClient.default()
+
+    params = search_params(query, status, sort, page, size, all_versions)
+    response = client.get(
+        client.url("/api/deposit/depositions", base_url), params=params, token=token
     )
 
     response.raise_for_status()
-    return [Deposition.parse_obj(x) for x in response.json()]
+    parse = deposition_parser(fields)
+    return [parse(x) for x in response_json(response)]
+
+
+def iter_search(
+    query: Optional[str] = None,
+    status: Optional[str] = None,
+    sort: Optional[str] = None,
+    size: Optional[int] = None,
+    all_versions: Optional[bool] = None,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+    fields: Optional[list[str]] = None,
+) -> Iterator[Deposition]:
+    """Search for depositions, lazily following all pages of the result
+
+    Only one page is held in memory at a time, while the next page is already
+    being fetched in the background.
+
+    :param query: An elasticsearch formatted query
+    :type query: Optional[str]
+    :param status: Filter by publication status; either 'draft' or 'published'
+    :type status: Optional[str]
+    :param sort: Sort order 'bestmatch' or 'mostrecent',
+        prefix with - to sort descending.
+    :type sort: Optional[str]
+    :param size: The size limit per page
+    :type size: Optional[int]
+    :param all_versions: True to show all versions
+    :type all_versions: Optional[bool]
+    :param token: your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :param client: The client to send the requests with
+        (defaults to the shared ZenodoClient.default())
+    :type client: Optional[ZenodoClient]
+    :param fields: Only set these fields of the depositions, see search
+    :type fields: Optional[list[str]]
+    :return: The depositions found, one at a time
+    :rtype: Iterator[Deposition]
+    """
+
+    if client is None:
+        client = ZenodoClient.default()
+
+    params = search_params(query, status, sort, None, size, all_versions)
+    url = client.url("/api/deposit/depositions", base_url)
+    parse = deposition_parser(fields)
+    for hits in iter_pages(client, url, params, token=token):
+        for x in hits:
+            yield parse(x)
@@ -0,0 +1,226 @@
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.depositions import actions
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.entities.metadata import Metadata
+
+# Links of a deposition retrieved by an operation are reused by the next step
+_FRESH = float("inf")
+
+
+def _create(op: dict, token, base_url, client) -> dict:
+    deposition = Deposition.create(
+        Metadata.parse_obj(op.get("metadata", {})),
+        op.get("prereserve_doi"),
+        token,
+        base_url,
+        client,
+    )
+    return deposition.dict(exclude_none=True)
+
+
+def _update(op: dict, token, base_url, client) -> dict:
+    deposition = Deposition.retrieve(op["id"], token, base_url, client)
+    draft_id = deposition.latest_draft_id(_FRESH, token, client)
+    metadata = Metadata.parse_obj(op["metadata"])
+    return actions.update_metadata(draft_id, metadata, token, base_url, client).dict(
+        exclude_none=True
+    )
+
+
+def _upload(op: dict, token, base_url, client) -> dict:
+    deposition = Deposition.retrieve(op["id"], token, base_url, client)
+    draft = deposition.get_latest_draft(token, client, max_staleness=_FRESH)
+    bucket_files = draft.upload_files(
+        op["files"],
+        op.get("max_workers", 4),
+        token,
+        client,
+        stream=op.get("stream", False),
+    )
+    return {"id": draft.id, "files": [x.dict(exclude_none=True) for x in bucket_files]}
+
+
+def _then(future: Future, fn: Callable) -> Future:
+    """A future of fn applied to the result of future"""
+
+    chained: Future = Future()
+
+    def done(f: Future):
+        try:
+            chained.set_result(fn(f.result()))
+        except Exception as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(done)
+    return chained
+
+
+def _publish(op: dict, token, base_url, client) -> Future:
+    # Publishing may take minutes, the poller waits for it instead of a worker
+    deposition = Deposition.retrieve(op["id"], token, base_url, client)
+    draft_id = deposition.latest_draft_id(_FRESH, token, client)
+    published = actions.publish(
+        draft_id, token, base_url, op.get("retries", 0), client, wait=False
+    )
+    return _then(published, lambda x: x.dict(exclude_none=True))
+
+
+def _new_version(op: dict, token, base_url, client) -> dict:
+    deposition = Deposition.retrieve(op["id"], token, base_url, client)
+    latest_id = deposition.latest_id(_FRESH, token, client)
+    return actions.new_version(latest_id, token, base_url, client).dict(
+        exclude_none=True
+    )
+
+
+def _delete(op: dict, token, base_url, client) -> dict:
+    deposition = Deposition.retrieve(op["id"], token, base_url, client)
+    draft_id = deposition.latest_draft_id(_FRESH, token, client)
+    actions.delete_remote(draft_id, token, base_url, client)
+    return {"id": draft_id}
+
+
+OPERATIONS: dict[str, Callable[..., Union[dict, Future]]] = {
+    "create": _create,
+    "update": _update,
+    "upload": _upload,
+    "publish": _publish,
+    "new-version": _new_version,
+    "delete": _delete,
+}
+
+
+def run_operation(
+    op: dict,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> Union[dict, Future]:
+    """Run a single operation of a batch manifest
+
+    Every operation but create names an existing deposition by "id", and acts on
+    its latest draft, or its latest version for new-version, like the CLI does:
+
+    - {"op": "create", "metadata": {...}, "prereserve_doi": true}
+    - {"op": "update", "id": "123", "metadata": {...}}
+    - {"op": "upload", "id": "123", "files": ["a.csv"], "stream": false}
+    - {"op": "publish", "id": "123", "retries": 0}
+    - {"op": "new-version", "id": "123"}
+    - {"op": "delete", "id": "123"}
+
+    :param op: The operation
+    :type op: dict
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :param client: The client to send the requests with
+    :type client: Optional[ZenodoClient]
+    :return: The json of the resulting deposition or files, for publish a
+        future of it completing once the deposition is published
+    :rtype: Union[dict, Future]
+    :raises ValueError: If the operation is unknown
+    """
+
+    if client is None:
+        client = ZenodoClient.default()
+    name = op.get("op")
+    if name not in OPERATIONS:
+        raise ValueError(f"Unknown operation {name!r}")
+    return OPERATIONS[name](op, token, base_url, client)
+
+
+def run_batch(
+    lines: Iterable[str],
+    max_workers: int = 8,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> Iterator[dict]:
+    """Run the operations of a JSONL manifest concurrently
+
+    Lines run in no particular order, so operations depending on each other
+    belong in consecutive manifests. The manifest is read lazily and at most
+    twice max_workers operations are pending at once, so it may be of any size.
+    A failing line does not stop the batch, its error is reported instead.
+    Blank lines and lines starting with # are skipped.
+
+    :param lines: The lines of the manifest, one json operation each
+    :type lines: Iterable[str]
+    :param max_workers: The maximum number of operations run at once
+    :type max_workers: int
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :param client: The client to send the requests with, its pool size should
+        be at least max_workers
+    :type client: Optional[ZenodoClient]
+    :return: A result per line as it completes, with the line number, the
+        operation, ok, the seconds taken and either the result or the error
+    :rtype: Iterator[dict]
+    """
+
+    if client is None:
+        client = ZenodoClient.default()
+
+    def run(line_number: int, line: str) -> Union[dict, Future]:
+        start = time.perf_counter()
+        result: dict = {"line": line_number, "op": None, "ok": False}
+
+        def settle(output: Future) -> dict:
+            try:
+                result.update(ok=True, result=output.result())
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["seconds"] = round(time.perf_counter() - start, 6)
+            return result
+
+        try:
+            op = json.loads(line)
+            result["op"] = op.get("op")
+            output = run_operation(op, token, base_url, client)
+        except Exception as e:
+            output = Future()
+            output.set_exception(e)
+        if not isinstance(output, Future):
+            output, value = Future(), output
+            output.set_result(value)
+        if output.done():
+            return settle(output)
+        return _then(output, lambda _: settle(output))
+
+    # Operations still completing without a worker, such as publications
+    waiting: set[Future] = set()
+
+    def collect(done: set[Future]) -> Iterator[dict]:
+        for future in done:
+            if future in waiting:
+                waiting.discard(future)
+                yield future.result()
+                continue
+            value = future.result()
+            if isinstance(value, Future):
+                waiting.add(value)
+            else:
+                yield value
+
+    pending: set[Future] = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            while len(pending) >= 2 * max_workers:
+                done, _ = wait(pending | waiting, return_when=FIRST_COMPLETED)
+                pending -= done
+                yield from collect(done)
+            pending.add(executor.submit(run, line_number, line))
+        while pending or waiting:
+            done, _ = wait(pending | waiting, return_when=FIRST_COMPLETED)
+            pending -= done
+            yield from collect(done)
@@ -0,0 +1,264 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, NamedTuple, Optional
+
+import requests
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.ratelimit import parse_retry_after
+from zenodo_rest.retry import TRANSIENT_ERRORS, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class _Watch(NamedTuple):
+    deposition_id: str
+    future: Future
+    deadline: Optional[float]
+    token: Optional[str]
+    base_url: Optional[str]
+    client: Optional[ZenodoClient]
+    resend: Optional[Callable[[], requests.Response]] = None
+    policy: Optional[RetryPolicy] = None
+    error: Optional[Exception] = None
+    attempts: int = 1
+
+
+def http_error(response: requests.Response) -> requests.HTTPError:
+    """The exception raise_for_status raises for an error response"""
+
+    try:
+        response.raise_for_status()
+    except requests.HTTPError as e:
+        return e
+    raise ValueError(f"{response.status_code} is not an error status")
+
+
+class PublishPoller:
+    """Waits for many depositions to be published with a single thread
+
+    Watched depositions are retrieved by one scheduler thread, each one after a
+    delay which starts at interval and doubles, with jitter, up to max_interval
+    on every check finding it not yet submitted. The thread only runs while
+    depositions are watched.
+
+    A deposition whose publish request was answered with an error may be watched
+    with the request to send again: whenever a check finds it not submitted, the
+    request is sent again, as often and with the backoff its retry policy
+    allows, until it succeeds, and then the last error is raised.
+
+    :param interval: The seconds before the first check of a deposition
+    :type interval: float
+    :param max_interval: The maximum seconds between two checks of a deposition
+    :type max_interval: float
+    :param timeout: The default seconds after which to give up on a deposition,
+        None to wait forever
+    :type timeout: Optional[float]
+    """
+
+    _default: Optional["PublishPoller"] = None
+
+    def __init__(
+        self,
+        interval: float = 2.0,
+        max_interval: float = 60.0,
+        timeout: Optional[float] = 3600.0,
+    ):
+        self.interval: float = interval
+        self.max_interval: float = max_interval
+        self.timeout: Optional[float] = timeout
+        self._queue: list[tuple[float, int, float, _Watch]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def default(cls) -> "PublishPoller":
+        """The poller shared by all publications which are not given one
+
+        :return: The process wide default poller
+        :rtype: PublishPoller
+        """
+
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @property
+    def pending(self) -> int:
+        """The number of depositions watched"""
+
+        with self._cond:
+            return len(self._queue)
+
+    def watch(
+        self,
+        deposition_id: str,
+        token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+        timeout: Optional[float] = None,
+        resend: Optional[Callable[[], requests.Response]] = None,
+        policy: Optional[RetryPolicy] = None,
+        error: Optional[Exception] = None,
+    ) -> Future:
+        """Wait for a deposition to be published
+
+        :param deposition_id: The id of the deposition being published
+        :type deposition_id: str
+        :param token: Your zenodo token
+        :type token: Optional[str]
+        :param base_url: The url to the target zenodo server
+        :type base_url: Optional[str]
+        :param client: The client to send the requests with
+        :type client: Optional[ZenodoClient]
+        :param timeout: The seconds after which to give up
+            (defaults to the timeout of the poller)
+        :type timeout: Optional[float]
+        :param resend: Sends the publish request again, if its first attempt was
+            answered with an error
+        :type resend: Optional[Callable[[], requests.Response]]
+        :param policy: How often to send the publish request in total
+            (defaults to a single attempt)
+        :type policy: Optional[RetryPolicy]
+        :param error: The error the first attempt failed with
+        :type error: Optional[Exception]
+        :return: A future of the published deposition, failing with the last
+            error when no attempt is left, or a TimeoutError when it was not
+            published in time
+        :rtype: Future[Deposition]
+        """
+
+        if timeout is None:
+            timeout = self.timeout
+        now = time.monotonic()
+        deadline = None if timeout is None else now + timeout
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+        watch = _Watch(
+            deposition_id,
+            future,
+            deadline,
+            token,
+            base_url,
+            client,
+            resend,
+            policy or RetryPolicy(attempts=1),
+            error,
+        )
+        self._schedule(now + self.interval, self.interval, watch)
+        return future
+
+    def _schedule(self, at: float, interval: float, watch: _Watch):
+        with self._cond:
+            heapq.heappush(self._queue, (at, next(self._counter), interval, watch))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="zenodo-publish-poller", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._queue:
+                        # Exit while idle, watch starts a new thread when needed
+                        self._thread = None
+                        return
+                    wait = self._queue[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                _, _, interval, watch = heapq.heappop(self._queue)
+            self._check(interval, watch)
+
+    def _check(self, interval: float, watch: _Watch):
+        try:
+            deposition = Deposition.retrieve(
+                watch.deposition_id, watch.token, watch.base_url, watch.client
+            )
+        except TRANSIENT_ERRORS as e:
+            logger.warning(f"Checking deposition {watch.deposition_id} failed: {e}")
+            deposition = None
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code < 500:
+                watch.future.set_exception(e)
+                return
+            deposition = None
+        except Exception as e:
+            watch.future.set_exception(e)
+            return
+
+        if deposition is not None and deposition.submitted:
+            logger.info(f"Deposition {watch.deposition_id} was published")
+            watch.future.set_result(deposition)
+            return
+        delay = None
+        if deposition is not None and watch.resend is not None:
+            # Not submitted after an error response, the request was not applied
+            resent = self._resend(watch)
+            if resent is None:
+                return
+            watch, delay = resent
+        now = time.monotonic()
+        if watch.deadline is not None and now >= watch.deadline:
+            watch.future.set_exception(
+                TimeoutError(f"Deposition {watch.deposition_id} was not published")
+            )
+            return
+        if delay is None:
+            interval = min(self.max_interval, interval * 2)
+            delay = random.uniform(interval / 2, interval)
+        at = now + delay
+        if watch.deadline is not None:
+            at = min(at, watch.deadline)
+        self._schedule(at, interval, watch)
+
+    def _resend(self, watch: _Watch) -> Optional[tuple[_Watch, Optional[float]]]:
+        """Send the publish request of a watch again
+
+        :return: The updated watch and the delay until its next check, None if
+            its future is done
+        """
+
+        assert watch.resend is not None and watch.policy is not None
+        policy = watch.policy
+        if watch.attempts >= max(policy.attempts, 1):
+            watch.future.set_exception(
+                watch.error
+                or RuntimeError(f"Deposition {watch.deposition_id} was not published")
+            )
+            return None
+        logger.warning(f"Deposition {watch.deposition_id} was not published, retrying")
+        attempt = watch.attempts - 1
+        try:
+            response = watch.resend()
+        except requests.ReadTimeout:
+            # The request may still be processed, only poll from now on
+            return watch._replace(resend=None), None
+        except TRANSIENT_ERRORS as e:
+            delay = policy.delay(attempt)
+            return watch._replace(attempts=watch.attempts + 1, error=e), delay
+        except Exception as e:
+            watch.future.set_exception(e)
+            return None
+        if response.status_code in policy.statuses or response.status_code >= 500:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            error = http_error(response)
+            response.close()
+            delay = policy.delay(attempt, retry_after)
+            return watch._replace(attempts=watch.attempts + 1, error=error), delay
+        try:
+            response.raise_for_status()
+            watch.future.set_result(Deposition.parse_obj(response.json())._mark_fresh())
+        except Exception as e:
+            watch.future.set_exception(e)
+        return None
@@ -0,0 +1,132 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.depositions import actions
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.entities.metadata import Metadata
+from zenodo_rest.entities.release_result import ReleaseResult
+from zenodo_rest.files.hash_cache import HashCache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _timed(timings: dict[str, float], stage: str, fn: Callable[[], T]) -> T:
+    start = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        timings[stage] = round(time.perf_counter() - start, 6)
+        logger.info(f"Release stage {stage} took {timings[stage]:.3f}s")
+
+
+def release(
+    deposition_id: str,
+    local_dir: str,
+    metadata: Optional[Metadata] = None,
+    max_workers: int = 4,
+    delete: bool = True,
+    publish: bool = True,
+    retries: int = 0,
+    hash_cache: Optional[HashCache] = None,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> ReleaseResult:
+    """Publish a new version of a deposition with the files of a local directory
+
+    Runs new version, latest draft, file sync and metadata update, and publish as
+    a pipeline: the metadata update overlaps with the file transfers, files
+    missing locally are deleted concurrently, and publishing starts once every
+    transfer and the metadata update have been confirmed by the server. The
+    seconds taken by each stage are part of the result; files and metadata
+    overlap, so transfers is their combined wall time.
+
+    :param deposition_id: The id of the latest published version
+    :type deposition_id: str
+    :param local_dir: The directory holding the files of the new version
+    :type local_dir: str
+    :param metadata: The metadata of the new version
+        (defaults to the metadata of the previous version)
+    :type metadata: Optional[Metadata]
+    :param max_workers: The maximum number of concurrent file transfers
+    :type max_workers: int
+    :param delete: Whether to delete files of the draft missing in local_dir
+    :type delete: bool
+    :param publish: Whether to publish the new version, or leave it as a draft,
+        which is then retrieved once more to return its final files
+    :type publish: bool
+    :param retries: The number of times to retry publishing after a server error
+    :type retries: int
+    :param hash_cache: The cache of local md5s
+        (defaults to a HashCache in the default location)
+    :type hash_cache: Optional[HashCache]
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :param client: The client to send the requests with, its pool size should
+        be at least max_workers + 1
+    :type client: Optional[ZenodoClient]
+    :return: The resulting deposition, the synced files and the stage timings
+    :rtype: ReleaseResult
+    """
+
+    if client is None:
+        client = ZenodoClient.default()
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+
+    published = _timed(
+        timings,
+        "new_version",
+        lambda: actions.new_version(deposition_id, token, base_url, client),
+    )
+    # The response is fresh, so only the draft itself is fetched
+    draft = _timed(
+        timings,
+        "draft",
+        lambda: published.get_latest_draft(token, client, max_staleness=float("inf")),
+    )
+
+    def sync():
+        return _timed(
+            timings,
+            "files",
+            lambda: draft.sync_files(
+                local_dir, max_workers, delete, hash_cache, token, base_url, client
+            ),
+        )
+
+    def update():
+        return _timed(
+            timings,
+            "metadata",
+            lambda: actions.update_metadata(
+                draft.id, metadata, token, base_url, client
+            ),
+        )
+
+    def transfer():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            updated = None if metadata is None else executor.submit(update)
+            files = sync()
+            return files, draft if updated is None else updated.result()
+
+    files, deposition = _timed(timings, "transfers", transfer)
+    if publish:
+        deposition = _timed(
+            timings,
+            "publish",
+            lambda: actions.publish(draft.id, token, base_url, retries, client),
+        )
+    else:
+        # The draft was fetched before, and the metadata update answered during,
+        # the file transfers, so either may list stale files
+        deposition = Deposition.retrieve(draft.id, token, base_url, client)
+    timings["total"] = round(time.perf_counter() - start, 6)
+    return ReleaseResult(deposition=deposition, files=files, timings=timings)
@@ -1,4 +1,26 @@
-from .deposition import Deposition
-from .metadata import Metadata
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .deposition import Deposition
+    from .metadata import Metadata
 
 __all__: list[str] = ["Deposition", "Metadata"]
+
+# Deposition needs requests, Metadata only pydantic, import each when first used
+_LAZY_ATTRIBUTES = {
+    "Deposition": "zenodo_rest.entities.deposition",
+    "Metadata": "zenodo_rest.entities.metadata",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_ATTRIBUTES])
@@ -1,19 +1,30 @@
+import hashlib
+import logging
 import os
-from typing import Optional, TypeVar
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional, Union
 import tempfile
 from pathlib import Path
 from shutil import make_archive
 
 
-import requests
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
+from zenodo_rest.client import ZenodoClient
 from zenodo_rest.entities.deposition_file import DepositionFile
 from zenodo_rest.entities.metadata import Metadata
 from zenodo_rest.entities.bucket_file import BucketFile
+from zenodo_rest.entities.sync_result import SyncResult
+from zenodo_rest.files.hash_cache import HashCache
+from zenodo_rest.files.hashing import HashingReader, hashing_iter, verify_checksum
+from zenodo_rest.files.multipart import DEFAULT_PART_SIZE, upload_resumable
+from zenodo_rest.files.zipstream import iter_zip
+from zenodo_rest.retry import RetryPolicy, call_verified
 from zenodo_rest import exceptions
 
-T = TypeVar("Deposition")
+
+logger = logging.getLogger(__name__)
 
 
 class Deposition(BaseModel):
@@ -32,15 +43,43 @@ class Deposition(BaseModel):
     submitted: bool
     title: str
 
+    # time.monotonic() of when this object was last received from the server
+    _fetched_at: Optional[float] = PrivateAttr(default=None)
+
+    def _mark_fresh(self) -> "Deposition":
+        self._fetched_at = time.monotonic()
+        return self
+
+    def is_fresh(self, max_staleness: float = 0) -> bool:
+        """Whether this object was received from the server recently enough
+
+        Depositions parsed from a file or built locally are never fresh.
+
+        :param max_staleness: The maximum age in seconds
+        :type max_staleness: float
+        :return: True if it was received at most max_staleness seconds ago
+        :rtype: bool
+        """
+
+        if self._fetched_at is None:
+            return False
+        return time.monotonic() - self._fetched_at <= max_staleness
+
     @staticmethod
     def create(
         metadata: Metadata = None,
         prereserve_doi: Optional[bool] = None,
         token: Optional[str] = None,
         base_url: Optional[str] = None,
-    ) -> T:
+        client: Optional[ZenodoClient] = None,
+    ) -> "Deposition":
         """Create a deposition on the server, but do not publish it.
 
+        Only throttled requests are sent again, as often as the retry policy of
+        the client allows. After a server error or a timeout the deposition may
+        have been created anyway, so the error is raised instead of creating a
+        second one; search the drafts before calling this again.
+
         :param metadata: The metadata to be used when creating the deposition.
             (defaults to an empty Metadata object with placeholders in required fields)
         :type metadata: Metadata
@@ -50,34 +89,45 @@ class Deposition(BaseModel):
         :type token: Optional[str]
         :param base_url: The url for the target zenodo server
         :type base_url: Optional[str]
+        :param client: The client to send the request with
+            (defaults to the shared ZenodoClient.default())
+        :type client: Optional[ZenodoClient]
         :return: The Deposition object created (now containing server side created properties)
         :rtype: Deposition
         """
 
         if metadata is None:
             metadata = Metadata()
-        if token is None:
-            token = os.getenv("ZENODO_TOKEN")
-        if base_url is None:
-            base_url = os.getenv("ZENODO_URL")
+        if client is None:
+            client = ZenodoClient.default()
 
         if prereserve_doi is True:
             metadata.prereserve_doi = True
 
-        header = {"Authorization": f"Bearer {token}"}
-        response = requests.post(
-            f"{base_url}/api/deposit/depositions",
-            json={"metadata": metadata.dict(exclude_none=True)},
-            headers=header,
+        url = client.url("/api/deposit/depositions", base_url)
+        # Creating is not idempotent, and a draft created by a failed request
+        # cannot be told apart from other drafts, so only throttled requests
+        # are sent again
+        return call_verified(
+            lambda: client.post(
+                url,
+                json={"metadata": metadata.dict(exclude_none=True)},
+                token=token,
+            ),
+            lambda response: Deposition.parse_obj(response.json())._mark_fresh(),
+            None,
+            client.retry_policy or RetryPolicy(attempts=1),
+            "creation of a deposition",
+            lambda *retry: client.on_retry("POST", url, *retry),
         )
 
-        response.raise_for_status()
-        return Deposition.parse_obj(response.json())
-
     @staticmethod
     def retrieve(
-        deposition_id: str, token: Optional[str] = None, base_url: Optional[str] = None
-    ) -> T:
+        deposition_id: str,
+        token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+    ) -> "Deposition":
         """Fetch a deposition by id from the remote
 
         :param deposition_id:
@@ -86,116 +136,427 @@ class Deposition(BaseModel):
         :type token: Optional[str]
         :param base_url: The url for the target zenodo server
         :type base_url: Optional[str]
+        :param client: The client to send the request with
+            (defaults to the shared ZenodoClient.default())
+        :type client: Optional[ZenodoClient]
         :return: The deposition fetched by the remote
         :rtype: Deposition
         """
 
-        if token is None:
-            token = os.getenv("ZENODO_TOKEN")
-        if base_url is None:
-            base_url = os.getenv("ZENODO_URL")
-        header = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+        if client is None:
+            client = ZenodoClient.default()
 
-        response = requests.get(
-            f"{base_url}/api/deposit/depositions/{deposition_id}",
-            headers=header,
+        deposition = client.get_cached(
+            client.url(f"/api/deposit/depositions/{deposition_id}", base_url),
+            Deposition.parse_obj,
+            headers={"Accept": "application/json"},
+            token=token,
         )
+        return deposition._mark_fresh()
 
-        response.raise_for_status()
-        return Deposition.parse_obj(response.json())
-
-    def refresh(self, token: Optional[str] = None) -> T:
+    def refresh(
+        self, token: Optional[str] = None, client: Optional[ZenodoClient] = None
+    ) -> "Deposition":
         """Refresh this deposition
 
         :param token: Your zenodo token
         :type token: Optional[str]
+        :param client: The client to send the request with
+        :type client: Optional[ZenodoClient]
         :return: Refreshes this deposition from the remote
         :rtype: Deposition
         """
 
-        return Deposition.retrieve(self.id, token)
+        return Deposition.retrieve(self.id, token, client=client)
+
+    def resolve(
+        self,
+        max_staleness: float = 0,
+        token: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+    ) -> "Deposition":
+        """This deposition if it is fresh enough, otherwise a refreshed copy
+
+        :param max_staleness: The maximum age in seconds of links to reuse
+            (0 always refreshes, unless just received)
+        :type max_staleness: float
+        :param token: Your zenodo token
+        :type token: Optional[str]
+        :param client: The client to send the request with
+        :type client: Optional[ZenodoClient]
+        :return: A deposition received at most max_staleness seconds ago
+        :rtype: Deposition
+        """
+
+        if self.is_fresh(max_staleness):
+            return self
+        return self.refresh(token, client)
+
+    def _linked_id(
+        self,
+        link: str,
+        max_staleness: float,
+        token: Optional[str],
+        client: Optional[ZenodoClient],
+    ) -> tuple["Deposition", Optional[str]]:
+        deposition: Deposition = self.resolve(max_staleness, token, client)
+        url = deposition.links.get(link, None)
+        if url is None:
+            return deposition, None
+        return deposition, url.rsplit("/", 1)[1]
+
+    def latest_id(
+        self,
+        max_staleness: float = 0,
+        token: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+    ) -> str:
+        """The id of the latest published version of this deposition
+
+        Resolved from the links of this deposition, so at most one request is
+        sent, and none if this deposition is fresh enough.
+
+        :param max_staleness: The maximum age in seconds of links to reuse
+        :type max_staleness: float
+        :param token: Your zenodo token
+        :type token: Optional[str]
+        :param client: The client to send the request with
+        :type client: Optional[ZenodoClient]
+        :return: The id of the latest published version
+        :rtype: str
+        """
+
+        deposition, latest_id = self._linked_id("latest", max_staleness, token, client)
+        return deposition.id if latest_id is None else latest_id
+
+    def latest_draft_id(
+        self,
+        max_staleness: float = 0,
+        token: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+    ) -> str:
+        """The id of the latest draft related to this deposition
+
+        Resolved from the links of this deposition, so at most one request is
+        sent, and none if this deposition is fresh enough.
+
+        :param max_staleness: The maximum age in seconds of links to reuse
+        :type max_staleness: float
+        :param token: Your zenodo token
+        :type token: Optional[str]
+        :param client: The client to send the request with
+        :type client: Optional[ZenodoClient]
+        :return: The id of the latest draft, or a NoDraftFound exception.
+        :rtype: str
+        """
 
-    def get_latest(self, token: Optional[str] = None) -> T:
+        deposition, draft_id = self._linked_id(
+            "latest_draft", max_staleness, token, client
+        )
+        if draft_id is None:
+            raise exceptions.NoDraftFound(deposition.id)
+        return draft_id
+
+    def get_latest(
+        self,
+        token: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+        max_staleness: float = 0,
+    ) -> "Deposition":
         """Gets the latest published version of this deposition
 
         :param token: Your zenodo token
         :type token: Optional[str]
+        :param client: The client to send the request with
+        :type client: Optional[ZenodoClient]
+        :param max_staleness: The maximum age in seconds of links to reuse
+        :type max_staleness: float
         :return: The latest published version of this deposition.
         :rtype: Deposition
         """
 
-        deposition: Deposition = self.refresh(token)
-        latest_url = deposition.links.get("latest", None)
-        if latest_url is None:
+        deposition, latest_id = self._linked_id("latest", max_staleness, token, client)
+        if latest_id is None or latest_id == deposition.id:
             return deposition
-        latest_id = latest_url.rsplit("/", 1)[1]
-        return Deposition.retrieve(latest_id, token)
+        return Deposition.retrieve(latest_id, token, client=client)
 
-    def get_latest_draft(self, token: Optional[str] = None) -> T:
+    def get_latest_draft(
+        self,
+        token: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+        max_staleness: float = 0,
+    ) -> "Deposition":
         """Retrieve the latest draft related to this deposition
 
         :param token: Your zenodo token
         :type token: Optional[str]
+        :param client: The client to send the request with
+        :type client: Optional[ZenodoClient]
+        :param max_staleness: The maximum age in seconds of links to reuse
+        :type max_staleness: float
         :return: The latest draft related to this deposition, or a NoDraftFound exception.
         :rtype: Deposition
         """
 
-        deposition: Deposition = self.refresh(token)
-        latest_draft_url = deposition.links.get("latest_draft", None)
-        if latest_draft_url is None:
-            raise exceptions.NoDraftFound(deposition.id)
-
-        if token is None:
-            token = os.getenv("ZENODO_TOKEN")
-
-        header = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
-        response = requests.get(
-            latest_draft_url,
-            headers=header,
+        deposition, draft_id = self._linked_id(
+            "latest_draft", max_staleness, token, client
         )
-        response.raise_for_status()
-        return Deposition.parse_obj(response.json())
+        if draft_id is None:
+            raise exceptions.NoDraftFound(deposition.id)
+        if draft_id == deposition.id:
+            return deposition
+        return Deposition.retrieve(draft_id, token, client=client)
 
     def get_bucket(self) -> str:
         return self.links.get("bucket")
 
-    def upload_file(self, path_or_file: str, token: Optional[str] = None) -> BucketFile:
+    def upload_file(
+        self,
+        path_or_file: str,
+        token: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+        stream: bool = False,
+        resumable: bool = False,
+        part_size: int = DEFAULT_PART_SIZE,
+    ) -> BucketFile:
         """Upload or overwrite a file or path attachment for a deposition
 
         :param path_or_file: A path to zip and upload or a file_path to upload
         :type path_or_file: str
         :param token: Your zenodo token
         :type token: Optional[str]
+        :param client: The client to send the request with
+        :type client: Optional[ZenodoClient]
+        :param stream: Zip a path on the fly while uploading it, instead of writing
+            the archive to a temporary directory first. The request is then sent
+            with chunked transfer encoding.
+        :type stream: bool
+        :param resumable: Upload files larger than part_size in parts and record
+            the progress in a checkpoint file, so calling this again after a
+            failure only sends the parts missing on the server.
+        :type resumable: bool
+        :param part_size: The size in bytes of the parts of a resumable upload
+        :type part_size: int
         :return: The object for a successfully uploaded file
         :rtype: BucketFile
+        :raises ChecksumMismatch: If the checksum reported by the server differs
+            from the md5 of the bytes sent, which is computed while uploading
         """
 
         bucket_url = self.get_bucket()
-        if token is None:
-            token = os.getenv("ZENODO_TOKEN")
+        if client is None:
+            client = ZenodoClient.default()
         path = Path(path_or_file)
-        tempdir = None
-        if path.is_dir():
-            tempdir = tempfile.TemporaryDirectory()
-            zip_file = os.path.join(tempdir.name, path.stem)
-            make_archive(zip_file, "zip", root_dir=path.absolute())
-            path = Path(f"{zip_file}.zip")
-
-        header = {"Authorization": f"Bearer {token}"}
-        with open(path.absolute(), "rb") as fp:
-            r = requests.put(
-                f"{bucket_url}/{path.name}",
-                data=fp,
-                headers=header,
+        if path.is_dir() and stream:
+            md5 = hashlib.md5()
+            r = client.put(
+                f"{bucket_url}/{path.stem}.zip",
+                data=hashing_iter(iter_zip(str(path)), md5),
+                token=token,
             )
+            r.raise_for_status()
+            client.invalidate(self.links.get("self"))
+            bucket_file = BucketFile.parse_obj(r.json())
+            verify_checksum(bucket_file.key, bucket_file.checksum, md5.hexdigest())
+            return bucket_file
+        if resumable and path.is_file() and path.stat().st_size > part_size:
+            try:
+                return BucketFile.parse_obj(
+                    upload_resumable(
+                        bucket_url,
+                        str(path),
+                        part_size=part_size,
+                        token=token,
+                        client=client,
+                    )
+                )
+            finally:
+                client.invalidate(self.links.get("self"))
 
-        if tempdir is not None:
-            tempdir.cleanup()
+        tempdir = None
+        try:
+            if path.is_dir():
+                tempdir = tempfile.TemporaryDirectory()
+                zip_file = os.path.join(tempdir.name, path.stem)
+                make_archive(zip_file, "zip", root_dir=path.absolute())
+                path = Path(f"{zip_file}.zip")
+
+            with open(path.absolute(), "rb") as fp:
+                reader = HashingReader(fp)
+                r = client.put(
+                    f"{bucket_url}/{path.name}",
+                    data=reader,
+                    token=token,
+                )
+        finally:
+            if tempdir is not None:
+                tempdir.cleanup()
+        client.invalidate(self.links.get("self"))
         r.raise_for_status()
-        return BucketFile.parse_obj(r.json())
+        bucket_file = BucketFile.parse_obj(r.json())
+        verify_checksum(bucket_file.key, bucket_file.checksum, reader.hexdigest())
+        return bucket_file
+
+    def upload_files(
+        self,
+        paths: list[str],
+        max_workers: int = 4,
+        token: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+        callback: Optional[
+            Callable[[str, Union[BucketFile, Exception], float], None]
+        ] = None,
+        stream: bool = False,
+    ) -> list[BucketFile]:
+        """Upload or overwrite several files or paths concurrently
+
+        At most max_workers uploads are in flight at a time. The pool size of the
+        client should be at least max_workers, otherwise connections are discarded
+        instead of being kept alive.
+
+        :param paths: The files or paths to upload, see upload_file
+        :type paths: list[str]
+        :param max_workers: The maximum number of concurrent uploads
+        :type max_workers: int
+        :param token: Your zenodo token
+        :type token: Optional[str]
+        :param client: The client to send the requests with
+        :type client: Optional[ZenodoClient]
+        :param callback: Called with the path, the resulting BucketFile or exception
+            and the duration in seconds whenever an upload finishes
+        :type callback:
+            Optional[Callable[[str, Union[BucketFile, Exception], float], None]]
+        :param stream: Zip paths on the fly while uploading them, see upload_file
+        :type stream: bool
+        :return: The uploaded files, in the order of paths
+        :rtype: list[BucketFile]
+        :raises UploadFailed: After all uploads finished, if any of them failed
+        """
+
+        def upload(path: str) -> tuple[BucketFile, float]:
+            start = time.perf_counter()
+            bucket_file = self.upload_file(path, token, client, stream)
+            return bucket_file, time.perf_counter() - start
+
+        results: dict[str, BucketFile] = {}
+        errors: dict[str, Exception] = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(upload, path): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    bucket_file, seconds = future.result()
+                except Exception as e:
+                    logger.error(f"Uploading {path} failed: {e}")
+                    errors[path] = e
+                    if callback is not None:
+                        callback(path, e, 0.0)
+                    continue
+                logger.info(
+                    f"Uploaded {path} ({bucket_file.size} bytes) in {seconds:.2f}s"
+                )
+                results[path] = bucket_file
+                if callback is not None:
+                    callback(path, bucket_file, seconds)
+
+        seconds = time.perf_counter() - start
+        total = sum(x.size for x in results.values())
+        logger.info(
+            f"Uploaded {len(results)} files ({total} bytes) in {seconds:.2f}s, "
+            f"{total / max(seconds, 1e-9) / 1e6:.2f} MB/s"
+        )
+        uploaded = [results[path] for path in paths if path in results]
+        if errors:
+            raise exceptions.UploadFailed(errors, uploaded)
+        return uploaded
+
+    def sync_files(
+        self,
+        local_dir: str,
+        max_workers: int = 4,
+        delete: bool = True,
+        hash_cache: Optional[HashCache] = None,
+        token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+    ) -> SyncResult:
+        """Make the files of this deposition match the files of a local directory
+
+        Local md5s, read through a persistent hash cache and computed in
+        max_workers threads for files not cached yet, are compared to the
+        checksums of this deposition's files. Only new or changed files are
+        uploaded and files missing locally are deleted. The files of this object
+        are used as the remote state, so it should be freshly retrieved.
+        Zenodo buckets are flat, only the files directly in local_dir are synced.
+
+        :param local_dir: The directory holding the files of the deposition
+        :type local_dir: str
+        :param max_workers: The maximum number of concurrent uploads
+        :type max_workers: int
+        :param delete: Whether to delete remote files missing in local_dir
+        :type delete: bool
+        :param hash_cache: The cache of local md5s
+            (defaults to a HashCache in the default location)
+        :type hash_cache: Optional[HashCache]
+        :param token: Your zenodo token
+        :type token: Optional[str]
+        :param base_url: The base url of the zenodo server
+        :type base_url: Optional[str]
+        :param client: The client to send the requests with
+        :type client: Optional[ZenodoClient]
+        :return: The uploaded, deleted and unchanged files
+        :rtype: SyncResult
+        """
+
+        # A cache opened here is closed here, its connection is not shared
+        owned = hash_cache is None
+        if hash_cache is None:
+            hash_cache = HashCache()
+        remote = {file.filename: file for file in self.files or []}
+        result = SyncResult()
+        to_upload: list[str] = []
+        paths = [path for path in sorted(Path(local_dir).iterdir()) if path.is_file()]
+        local_names: set[str] = {path.name for path in paths}
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                md5s = executor.map(hash_cache.md5, paths)
+                for path, md5 in zip(paths, md5s):
+                    remote_file = remote.get(path.name)
+                    checksum = "" if remote_file is None else remote_file.checksum
+                    if checksum.rpartition(":")[2] == md5:
+                        result.unchanged.append(path.name)
+                    else:
+                        to_upload.append(str(path))
+        finally:
+            if owned:
+                hash_cache.close()
+
+        # Deletes are issued concurrently and overlap with the uploads
+        gone = [name for name in remote if delete and name not in local_names]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            deletes = executor.map(
+                lambda name: self.delete_file(remote[name].id, token, base_url, client),
+                gone,
+            )
+            if to_upload:
+                result.uploaded = self.upload_files(
+                    to_upload, max_workers, token, client
+                )
+            for name, _ in zip(gone, deletes):
+                result.deleted.append(name)
+        logger.info(
+            f"Synced {local_dir}: {len(result.uploaded)} uploaded, "
+            f"{len(result.deleted)} deleted, {len(result.unchanged)} unchanged"
+        )
+        return result
 
     def delete_file(
-        self, file_id: str, token: Optional[str] = None, base_url: Optional[str] = None
+        self,
+        file_id: str,
+        token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
     ) -> int:
         """Delete a file from this deposition if it is not yet published
 
@@ -207,37 +568,53 @@ class Deposition(BaseModel):
         :param base_url: The base url of the zenodo server
             (defaults to ZENODO_URL envvar)
         :type base_url: Optional[str]
+        :param client: The client to send the request with
+        :type client: Optional[ZenodoClient]
         :return: The HTTP response code of the deletion request.
         :rtype: int
         """
 
-        if token is None:
-            token = os.getenv("ZENODO_TOKEN")
-        if base_url is None:
-            base_url = os.getenv("ZENODO_URL")
-        header = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+        if client is None:
+            client = ZenodoClient.default()
 
-        response = requests.delete(
-            f"{base_url}/api/deposit/depositions/{self.id}/files/{file_id}",
-            headers=header,
+        response = client.delete(
+            client.url(f"/api/deposit/depositions/{self.id}/files/{file_id}", base_url),
+            headers={"Accept": "application/json"},
+            token=token,
         )
 
         response.raise_for_status()
         return response.status_code
 
     def delete_files(
-        self, token: Optional[str] = None, base_url: Optional[str] = None
+        self,
+        token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        client: Optional[ZenodoClient] = None,
+        max_workers: int = 4,
     ) -> list[int]:
         """Delete all files from this deposition if it is not yet published
 
+        The deletion requests are sent concurrently.
+
         :param token: Your zenodo token
         :type token: Optional[str]
             (defaults to ZENODO_TOKEN envvar)
         :param base_url: The base url of the zenodo server
             (defaults to ZENODO_URL envvar)
         :type base_url: Optional[str]
+        :param client: The client to send the requests with
+        :type client: Optional[ZenodoClient]
+        :param max_workers: The maximum number of concurrent deletion requests
+        :type max_workers: int
         :return: A list of the HTTP response codes of the file deletion requests
         :rtype: list[int]
         """
 
-        return [self.delete_file(file.id, token, base_url) for file in self.files]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    lambda file: self.delete_file(file.id, token, base_url, client),
+                    self.files or [],
+                )
+            )
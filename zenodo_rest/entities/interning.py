@@ -0,0 +1,47 @@
+import sys
+from typing import Any
+
+# Longer strings, such as titles, descriptions and urls, are rarely repeated
+MAX_INTERNED_LENGTH = 64
+
+
+def intern_json(value: Any, max_length: int = MAX_INTERNED_LENGTH) -> Any:
+    """Copy decoded json, sharing one object for every equal key and short string
+
+    Keys of objects are always interned, string values only up to max_length,
+    e.g. licenses, resource types, file types and affiliations repeated across
+    many records.
+
+    :param value: The decoded json
+    :type value: Any
+    :param max_length: The maximum length of interned string values
+    :type max_length: int
+    :return: An equal value
+    :rtype: Any
+    """
+
+    if isinstance(value, str):
+        return sys.intern(value) if len(value) <= max_length else value
+    if isinstance(value, dict):
+        return {sys.intern(k): intern_json(v, max_length) for k, v in value.items()}
+    if isinstance(value, list):
+        return [intern_json(x, max_length) for x in value]
+    return value
+
+
+class Slotted:
+    """A base for classes with __slots__, comparing and printing their slots"""
+
+    __slots__: tuple[str, ...] = ()
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, x) for x in self.__slots__)
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{x}={getattr(self, x)!r}" for x in self.__slots__)
+        return f"{type(self).__name__}({values})"
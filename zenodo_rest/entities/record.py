@@ -1,7 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import Optional
 
-from zenodo_rest.entities.zenodo_file import ZenodoFile
+from zenodo_rest.entities.interning import Slotted, intern_json
+from zenodo_rest.entities.zenodo_file import CompactFile, ZenodoFile
 
 
 @dataclass
@@ -18,3 +19,83 @@ class Record:
     updated: str
     conceptdoi: Optional[str] = None
     conceptrecid: Optional[str] = None
+
+    @classmethod
+    def parse_obj(cls, data: dict) -> "Record":
+        """Build a record from the json of the records api, ignoring unknown keys"""
+
+        names = {f.name for f in fields(cls)}
+        values = {k: v for k, v in data.items() if k in names}
+        values["files"] = [ZenodoFile.parse_obj(x) for x in data.get("files", [])]
+        return cls(**values)
+
+
+class CompactRecord(Slotted):
+    """A memory lean Record, for holding many records in memory
+
+    Instances have no __dict__, files are CompactFile objects and the metadata,
+    stats and links are copied with interned keys and short strings, see
+    :func:`zenodo_rest.entities.interning.intern_json`.
+    """
+
+    __slots__ = (
+        "created",
+        "doi",
+        "files",
+        "links",
+        "id",
+        "metadata",
+        "owners",
+        "revision",
+        "stats",
+        "updated",
+        "conceptdoi",
+        "conceptrecid",
+    )
+
+    def __init__(
+        self,
+        created: str,
+        doi: str,
+        files: list[CompactFile],
+        links: dict,
+        id: int,
+        metadata: dict,
+        owners: list[int],
+        revision: int,
+        stats: dict,
+        updated: str,
+        conceptdoi: Optional[str] = None,
+        conceptrecid: Optional[str] = None,
+    ):
+        self.created: str = created
+        self.doi: str = doi
+        self.files: list[CompactFile] = files
+        self.links: dict = intern_json(links, 0)
+        self.id: int = id
+        self.metadata: dict = intern_json(metadata)
+        self.owners: list[int] = owners
+        self.revision: int = revision
+        self.stats: dict = intern_json(stats)
+        self.updated: str = updated
+        self.conceptdoi: Optional[str] = conceptdoi
+        self.conceptrecid: Optional[str] = conceptrecid
+
+    @classmethod
+    def parse_obj(cls, data: dict) -> "CompactRecord":
+        """Build a record from the json of the records api, ignoring unknown keys"""
+
+        values = {k: v for k, v in data.items() if k in cls.__slots__}
+        values["files"] = [CompactFile.parse_obj(x) for x in data.get("files", [])]
+        return cls(**values)
+
+    @classmethod
+    def from_record(cls, record: Record) -> "CompactRecord":
+        values = {x: getattr(record, x) for x in cls.__slots__}
+        values["files"] = [CompactFile.from_file(x) for x in record.files]
+        return cls(**values)
+
+    def to_record(self) -> Record:
+        values = {x: getattr(self, x) for x in self.__slots__}
+        values["files"] = [x.to_file() for x in self.files]
+        return Record(**values)
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+from zenodo_rest.entities.deposition import Deposition
+from zenodo_rest.entities.sync_result import SyncResult
+
+
+class ReleaseResult(BaseModel):
+    deposition: Deposition  # the published version, or the draft if not published
+    files: SyncResult
+    timings: dict[str, float] = {}  # seconds per stage
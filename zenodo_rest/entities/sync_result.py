@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+from zenodo_rest.entities.bucket_file import BucketFile
+
+
+class SyncResult(BaseModel):
+    uploaded: list[BucketFile] = []
+    deleted: list[str] = []  # filenames
+    unchanged: list[str] = []  # filenames
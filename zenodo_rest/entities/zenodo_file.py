@@ -1,4 +1,7 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, fields
+
+from zenodo_rest.entities.interning import Slotted
 
 
 @dataclass
@@ -9,3 +12,39 @@ class ZenodoFile:
     links: dict
     size: int
     type: str
+
+    @classmethod
+    def parse_obj(cls, data: dict) -> "ZenodoFile":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+
+class CompactFile(Slotted):
+    """A memory lean ZenodoFile, without a __dict__ and with interned strings
+
+    The bucket, key, type and the keys of links are interned, as they repeat
+    across the files of a record and across versions of records.
+    """
+
+    __slots__ = ("bucket", "checksum", "key", "links", "size", "type")
+
+    def __init__(
+        self, bucket: str, checksum: str, key: str, links: dict, size: int, type: str
+    ):
+        self.bucket: str = sys.intern(bucket)
+        self.checksum: str = checksum
+        self.key: str = sys.intern(key)
+        self.links: dict = {sys.intern(k): v for k, v in links.items()}
+        self.size: int = size
+        self.type: str = sys.intern(type)
+
+    @classmethod
+    def parse_obj(cls, data: dict) -> "CompactFile":
+        return cls(**{k: data[k] for k in cls.__slots__})
+
+    @classmethod
+    def from_file(cls, file: ZenodoFile) -> "CompactFile":
+        return cls(*(getattr(file, x) for x in cls.__slots__))
+
+    def to_file(self) -> ZenodoFile:
+        return ZenodoFile(*self._values())
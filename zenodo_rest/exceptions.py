@@ -7,3 +7,38 @@ class NoDraftFound(Exception):
             f"No drafts were found for the deposition with id: {self.deposition_id} "
             "make sure that a new version of the deposition exists."
         )
+
+
+class UploadFailed(Exception):
+    def __init__(self, errors: dict, uploaded: list):
+        self.errors: dict = errors
+        self.uploaded: list = uploaded
+
+    def __str__(self):
+        failed = ", ".join(str(path) for path in self.errors)
+        return (
+            f"{len(self.errors)} of {len(self.errors) + len(self.uploaded)} "
+            f"uploads failed: {failed}"
+        )
+
+
+class ChecksumMismatch(Exception):
+    def __init__(self, name: str, expected: str, actual: str):
+        self.name: str = name
+        self.expected: str = expected
+        self.actual: str = actual
+
+    def __str__(self):
+        return (
+            f"The checksum of {self.name} does not match: "
+            f"the server reported {self.expected}, but {self.actual} was transferred."
+        )
+
+
+class UnsafePath(Exception):
+    def __init__(self, name: str, dest: str):
+        self.name: str = name
+        self.dest: str = dest
+
+    def __str__(self):
+        return f"The file {self.name!r} would be written outside of {self.dest}"
@@ -0,0 +1,44 @@
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .download import download_file, download_files
+    from .hash_cache import HashCache
+    from .hashing import HashingReader, verify_checksum
+    from .multipart import UploadCheckpoint, upload_resumable
+    from .zipstream import iter_zip
+
+__all__: list[str] = [
+    "HashCache",
+    "HashingReader",
+    "UploadCheckpoint",
+    "download_file",
+    "download_files",
+    "iter_zip",
+    "upload_resumable",
+    "verify_checksum",
+]
+
+# Only downloads and multipart uploads need requests, import each when first used
+_LAZY_ATTRIBUTES = {
+    "HashCache": "zenodo_rest.files.hash_cache",
+    "HashingReader": "zenodo_rest.files.hashing",
+    "UploadCheckpoint": "zenodo_rest.files.multipart",
+    "download_file": "zenodo_rest.files.download",
+    "download_files": "zenodo_rest.files.download",
+    "iter_zip": "zenodo_rest.files.zipstream",
+    "upload_resumable": "zenodo_rest.files.multipart",
+    "verify_checksum": "zenodo_rest.files.hashing",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_ATTRIBUTES])
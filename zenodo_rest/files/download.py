@@ -0,0 +1,275 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional, Union
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.entities.record import CompactRecord, Record
+from zenodo_rest.exceptions import ChecksumMismatch, UnsafePath
+from zenodo_rest.files.hash_cache import BUFFER_SIZE, md5_file
+from zenodo_rest.files.hashing import verify_checksum
+
+if TYPE_CHECKING:
+    from zenodo_rest.entities.deposition import Deposition
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_SEGMENT_SIZE = 256 * 1024 * 1024
+
+
+class _RangesNotSupported(Exception):
+    pass
+
+
+class RemoteFile(NamedTuple):
+    name: str
+    url: str
+    size: int
+    checksum: str
+
+
+def remote_files(
+    record_or_deposition: Union[Record, CompactRecord, "Deposition"],
+) -> list[RemoteFile]:
+    """The downloadable files of a record or a deposition
+
+    Files of a deposition listed without links cannot be downloaded, they are
+    skipped with a warning.
+    """
+
+    if isinstance(record_or_deposition, (Record, CompactRecord)):
+        return [
+            RemoteFile(
+                file.key,
+                file.links.get("self") or file.links["download"],
+                file.size,
+                file.checksum,
+            )
+            for file in record_or_deposition.files
+        ]
+    remotes = []
+    for file in record_or_deposition.files or []:
+        if not file.links or "download" not in file.links:
+            logger.warning(f"Skipping {file.filename}, it has no download link")
+            continue
+        remotes.append(
+            RemoteFile(
+                file.filename, file.links["download"], int(file.filesize), file.checksum
+            )
+        )
+    return remotes
+
+
+def _download_stream(
+    remote: RemoteFile, part: Path, token: Optional[str], client: ZenodoClient
+):
+    """Download into part in a single stream, continuing a partial download"""
+
+    md5 = hashlib.md5()
+    offset = part.stat().st_size if part.exists() else 0
+    if offset > 0:
+        # Only the local prefix is read again, to continue the md5 of the file
+        with open(part, "rb") as fp:
+            for chunk in iter(lambda: fp.read(BUFFER_SIZE), b""):
+                md5.update(chunk)
+    headers = {"Range": f"bytes={offset}-"} if 0 < offset < remote.size else None
+    with client.get(remote.url, headers=headers, stream=True, token=token) as r:
+        r.raise_for_status()
+        mode = "ab"
+        if r.status_code != 206:
+            md5 = hashlib.md5()
+            mode = "wb"
+        with open(part, mode) as fp:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                md5.update(chunk)
+                fp.write(chunk)
+    verify_checksum(remote.name, remote.checksum, md5.hexdigest())
+
+
+def _download_segment(
+    remote: RemoteFile,
+    part: Path,
+    start: int,
+    end: int,
+    token: Optional[str],
+    client: ZenodoClient,
+):
+    headers = {"Range": f"bytes={start}-{end - 1}"}
+    with client.get(remote.url, headers=headers, stream=True, token=token) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise _RangesNotSupported(remote.url)
+        with open(part, "r+b") as fp:
+            fp.seek(start)
+            for chunk in r.iter_content(CHUNK_SIZE):
+                fp.write(chunk)
+            if fp.tell() != end:
+                raise IOError(f"Segment {start}-{end} of {remote.name} is incomplete")
+
+
+def _save_progress(progress: Path, done: set[int]):
+    """Replace the progress file atomically, so it is never left half written"""
+
+    tmp = progress.with_name(f"{progress.name}.tmp")
+    tmp.write_text(json.dumps(sorted(done)))
+    os.replace(tmp, progress)
+
+
+def _download_segmented(
+    remote: RemoteFile,
+    part: Path,
+    segment_size: int,
+    max_segments: int,
+    token: Optional[str],
+    client: ZenodoClient,
+):
+    """Download into part in concurrent byte ranges, skipping finished segments
+
+    Every finished segment is recorded next to the part file at once, so even a
+    killed process only downloads the unfinished segments again. As the segments
+    arrive out of order, the checksum is verified by reading the file once
+    complete.
+    """
+
+    progress = part.with_name(f"{part.name}.json")
+    done: set[int] = set()
+    if part.exists() and progress.exists():
+        done = set(json.loads(progress.read_text()))
+    else:
+        with open(part, "wb") as fp:
+            fp.truncate(remote.size)
+        _save_progress(progress, done)
+
+    starts = [x for x in range(0, remote.size, segment_size) if x not in done]
+
+    def download(start: int) -> int:
+        end = min(start + segment_size, remote.size)
+        _download_segment(remote, part, start, end, token, client)
+        return start
+
+    with ThreadPoolExecutor(max_workers=max_segments) as executor:
+        futures = [executor.submit(download, start) for start in starts]
+        for future in as_completed(futures):
+            if future.exception() is None:
+                done.add(future.result())
+                _save_progress(progress, done)
+    for future in futures:
+        # Raises the error of the first failed segment
+        future.result()
+    verify_checksum(remote.name, remote.checksum, md5_file(str(part)))
+    progress.unlink()
+
+
+def download_file(
+    remote: RemoteFile,
+    dest: str,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    max_segments: int = 4,
+    token: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> Path:
+    """Download a file into a directory, verifying its checksum
+
+    Files of at least two segments are downloaded in concurrent byte ranges,
+    smaller ones in a single stream hashed while it is received. Data is written
+    to a .part file first, a later call continues a failed download from it.
+    A file which already exists with the right size and checksum is skipped.
+
+    :param remote: The file to download
+    :type remote: RemoteFile
+    :param dest: The directory to download into
+    :type dest: str
+    :param segment_size: The size of the byte ranges of large files
+    :type segment_size: int
+    :param max_segments: The maximum number of concurrent ranges per file
+    :type max_segments: int
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param client: The client to send the requests with
+    :type client: Optional[ZenodoClient]
+    :return: The path of the downloaded file
+    :rtype: Path
+    :raises ChecksumMismatch: If the downloaded file does not match its checksum
+    :raises UnsafePath: If the name of the file, as sent by the server, leads
+        outside of dest, e.g. ../.bashrc or /etc/passwd
+    """
+
+    if client is None:
+        client = ZenodoClient.default()
+    root = Path(dest).resolve()
+    target = (root / remote.name).resolve()
+    if target == root or not target.is_relative_to(root):
+        raise UnsafePath(remote.name, dest)
+    if target.exists() and target.stat().st_size == remote.size:
+        try:
+            verify_checksum(remote.name, remote.checksum, md5_file(str(target)))
+            return target
+        except ChecksumMismatch:
+            pass
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    part = target.with_name(f"{target.name}.part")
+    try:
+        if remote.size >= 2 * segment_size:
+            try:
+                _download_segmented(
+                    remote, part, segment_size, max_segments, token, client
+                )
+            except _RangesNotSupported:
+                logger.warning(f"Ranges are not supported, streaming {remote.name}")
+                part.with_name(f"{part.name}.json").unlink(missing_ok=True)
+                part.unlink()
+                _download_stream(remote, part, token, client)
+        else:
+            _download_stream(remote, part, token, client)
+    except ChecksumMismatch:
+        # A corrupt partial download cannot be resumed
+        part.unlink(missing_ok=True)
+        raise
+    os.replace(part, target)
+    return target
+
+
+def download_files(
+    record_or_deposition: Union[Record, "Deposition"],
+    dest: str,
+    max_workers: int = 4,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    max_segments: int = 4,
+    token: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> list[Path]:
+    """Download the files of a record or deposition in parallel
+
+    See download_file for how every file is transferred. The pool size of the
+    client should be at least max_workers times max_segments.
+
+    :param record_or_deposition: The record or deposition whose files to fetch
+    :type record_or_deposition: Union[Record, "Deposition"]
+    :param dest: The directory to download into
+    :type dest: str
+    :param max_workers: The maximum number of files downloaded at once
+    :type max_workers: int
+    :param segment_size: The size of the byte ranges of large files
+    :type segment_size: int
+    :param max_segments: The maximum number of concurrent ranges per file
+    :type max_segments: int
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param client: The client to send the requests with
+    :type client: Optional[ZenodoClient]
+    :return: The paths of the downloaded files
+    :rtype: list[Path]
+    """
+
+    def download(remote: RemoteFile) -> Path:
+        path = download_file(remote, dest, segment_size, max_segments, token, client)
+        logger.info(f"Downloaded {remote.name} ({remote.size} bytes)")
+        return path
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(download, remote_files(record_or_deposition)))
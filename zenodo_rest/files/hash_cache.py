@@ -0,0 +1,161 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+BUFFER_SIZE = 8 * 1024 * 1024
+MMAP_THRESHOLD = 64 * 1024 * 1024
+SCHEMA_VERSION = 2
+
+
+def default_cache_dir() -> Path:
+    """The directory zenodo-rest keeps its local state in
+
+    ZENODO_CACHE_DIR if set, otherwise zenodo-rest in the user's cache directory.
+    """
+
+    directory = os.getenv("ZENODO_CACHE_DIR")
+    if directory is not None:
+        return Path(directory)
+    cache = os.getenv("XDG_CACHE_HOME", os.path.join(Path.home(), ".cache"))
+    return Path(cache) / "zenodo-rest"
+
+
+def md5_file(path: str) -> str:
+    """Hash a file, memory mapping it when it is large
+
+    hashlib releases the GIL while hashing large buffers, so several files can
+    be hashed in parallel threads.
+    """
+
+    md5 = hashlib.md5()
+    with open(path, "rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                for offset in range(0, size, BUFFER_SIZE):
+                    md5.update(view[offset : offset + BUFFER_SIZE])
+                view.release()
+            return md5.hexdigest()
+        while True:
+            chunk = fp.read(BUFFER_SIZE)
+            if not chunk:
+                break
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class HashCache:
+    """A persistent index of the md5s of local files
+
+    Entries are keyed on the absolute path, size, mtime_ns and inode of a file, so
+    a file is only hashed again after it changed or was replaced. The index is a
+    sqlite database which can be shared between threads.
+
+    :param path: The database file
+        (defaults to hashes.sqlite in the default_cache_dir())
+    :type path: Optional[str]
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            self.path: Path = default_cache_dir() / "hashes.sqlite"
+        else:
+            self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            # It is only a cache, entries of older layouts are simply dropped
+            self._db.execute("DROP TABLE IF EXISTS hashes")
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, "
+            "md5 TEXT)"
+        )
+        self._db.commit()
+
+    def md5(self, path: str) -> str:
+        """The md5 of a file, hashing it only if it is not cached yet
+
+        :param path: The file to hash
+        :type path: str
+        :return: The hex md5 of the file
+        :rtype: str
+        """
+
+        absolute = os.path.abspath(path)
+        stat = os.stat(absolute)
+        key = (absolute, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT md5 FROM hashes "
+                "WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                key,
+            ).fetchone()
+        if row is not None:
+            return row[0]
+        md5 = md5_file(absolute)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)", (*key, md5)
+            )
+            self._db.commit()
+        return md5
+
+    def stats(self) -> dict:
+        """The number of entries and the total size of the files they describe"""
+
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM hashes"
+            ).fetchone()
+        return {"path": str(self.path), "entries": count, "bytes": size}
+
+    def prune(self, prefix: Optional[str] = None) -> int:
+        """Remove entries of files which were deleted or changed since hashing
+
+        :param prefix: Only check entries of paths starting with this prefix
+        :type prefix: Optional[str]
+        :return: The number of removed entries
+        :rtype: int
+        """
+
+        query = "SELECT path, size, mtime_ns, inode FROM hashes"
+        params: tuple = ()
+        if prefix is not None:
+            query += " WHERE path LIKE ? ESCAPE '\\'"
+            escaped = prefix.replace("\\", "\\\\").replace("%", "\\%")
+            params = (escaped.replace("_", "\\_") + "%",)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        stale = []
+        for path, size, mtime_ns, inode in rows:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stale.append((path,))
+                continue
+            if (stat.st_size, stat.st_mtime_ns, stat.st_ino) != (size, mtime_ns, inode):
+                stale.append((path,))
+        with self._lock:
+            self._db.executemany("DELETE FROM hashes WHERE path = ?", stale)
+            self._db.commit()
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM hashes")
+            self._db.commit()
+            self._db.execute("VACUUM")
+
+    def close(self):
+        self._db.close()
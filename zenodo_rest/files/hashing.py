@@ -0,0 +1,77 @@
+import hashlib
+import io
+import os
+from typing import BinaryIO, Iterable, Iterator
+
+from zenodo_rest.exceptions import ChecksumMismatch
+
+
+class HashingReader:
+    """Wraps a binary file and computes its md5 while it is being read
+
+    Passed as the body of a request, the bytes are hashed as they are sent, so
+    the file does not need to be read a second time to verify the upload.
+    Positions are relative to where the file was when wrapped. Seeking back
+    there restarts the md5, so a retried request is hashed again from the start.
+    """
+
+    def __init__(self, fp: BinaryIO):
+        self.fp: BinaryIO = fp
+        self.md5 = hashlib.md5()
+        self._start: int = fp.tell()
+        self._len: int = os.fstat(fp.fileno()).st_size - self._start
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fp.read(size)
+        self.md5.update(data)
+        return data
+
+    def tell(self) -> int:
+        return self.fp.tell() - self._start
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self.tell()
+        elif whence == os.SEEK_END:
+            offset += self._len
+        if offset == 0:
+            self.md5 = hashlib.md5()
+        elif offset != self.tell():
+            raise io.UnsupportedOperation("Seeking would skip bytes of the md5")
+        return self.fp.seek(self._start + offset) - self._start
+
+    def __len__(self) -> int:
+        return self._len
+
+    def hexdigest(self) -> str:
+        return self.md5.hexdigest()
+
+
+def hashing_iter(chunks: Iterable[bytes], md5) -> Iterator[bytes]:
+    """Pass chunks through, updating md5 with every one of them"""
+
+    for chunk in chunks:
+        md5.update(chunk)
+        yield chunk
+
+
+def verify_checksum(name: str, checksum: str, md5_hex: str):
+    """Compare a checksum reported by zenodo to a locally computed md5
+
+    Zenodo reports checksums either as plain hex or prefixed with the algorithm,
+    e.g. ``md5:<hex>``. Checksums of other algorithms are not verified.
+
+    :param name: The name of the file, used in the exception
+    :type name: str
+    :param checksum: The checksum reported by the server
+    :type checksum: str
+    :param md5_hex: The md5 computed while sending or receiving the file
+    :type md5_hex: str
+    :raises ChecksumMismatch: If the checksums differ
+    """
+
+    algorithm, _, value = checksum.rpartition(":")
+    if algorithm not in ("", "md5"):
+        return
+    if value.lower() != md5_hex.lower():
+        raise ChecksumMismatch(name, checksum, f"md5:{md5_hex}")
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.files.hash_cache import default_cache_dir
+from zenodo_rest.files.hashing import verify_checksum
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PART_SIZE = 64 * 1024 * 1024
+
+
+def default_checkpoint_dir() -> Path:
+    """The directory upload checkpoints are kept in
+
+    ZENODO_CHECKPOINT_DIR if set, otherwise uploads in the default_cache_dir().
+    """
+
+    directory = os.getenv("ZENODO_CHECKPOINT_DIR")
+    if directory is not None:
+        return Path(directory)
+    return default_cache_dir() / "uploads"
+
+
+class UploadCheckpoint:
+    """The progress of a multipart upload, persisted in a local json file
+
+    The file is keyed by the bucket url and the file name, and remembers which
+    parts the server acknowledged, so a failed upload can continue where it left
+    off. It is only reused for the same file size, mtime and part size.
+    """
+
+    def __init__(self, bucket_url: str, key: str, directory: Optional[Path] = None):
+        if directory is None:
+            directory = default_checkpoint_dir()
+        digest = hashlib.sha256(f"{bucket_url}/{key}".encode()).hexdigest()
+        self.path: Path = Path(directory) / f"{digest}.json"
+        self.bucket_url: str = bucket_url
+        self.key: str = key
+        self.upload_id: Optional[str] = None
+        self.size: int = 0
+        self.mtime_ns: int = 0
+        self.part_size: int = 0
+        self.parts: set[int] = set()
+
+    def load(self, size: int, mtime_ns: int, part_size: int) -> bool:
+        """Load the stored progress if it belongs to this version of the file
+
+        :return: Whether a matching checkpoint was found
+        :rtype: bool
+        """
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (data.get("size"), data.get("mtime_ns"), data.get("part_size")) != (
+            size,
+            mtime_ns,
+            part_size,
+        ):
+            return False
+        self.upload_id = data["upload_id"]
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.part_size = part_size
+        self.parts = set(data.get("parts", []))
+        return True
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "bucket_url": self.bucket_url,
+                    "key": self.key,
+                    "upload_id": self.upload_id,
+                    "size": self.size,
+                    "mtime_ns": self.mtime_ns,
+                    "part_size": self.part_size,
+                    "parts": sorted(self.parts),
+                },
+                f,
+            )
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _server_parts(
+    client: ZenodoClient, url: str, upload_id: str, token: Optional[str]
+) -> Optional[set[int]]:
+    response = client.get(url, params={"uploadId": upload_id}, token=token)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return {part["part_number"] for part in response.json().get("parts", [])}
+
+
+def upload_resumable(
+    bucket_url: str,
+    path: str,
+    key: Optional[str] = None,
+    part_size: int = DEFAULT_PART_SIZE,
+    checkpoint_dir: Optional[str] = None,
+    token: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> dict:
+    """Upload a file into a bucket in parts, continuing a previously failed upload
+
+    Uses the multipart protocol of the bucket api: the upload is initiated with
+    ``POST ?uploads``, every part is sent with ``PUT ?uploadId=&partNumber=`` and
+    the upload is completed with ``POST ?uploadId=``. Acknowledged parts are
+    recorded in a checkpoint file; calling this again after a failure asks the
+    server which parts it holds and only sends the missing ones.
+
+    :param bucket_url: The url of the bucket to upload to
+    :type bucket_url: str
+    :param path: The path of the file to upload
+    :type path: str
+    :param key: The name of the file in the bucket (defaults to the file name)
+    :type key: Optional[str]
+    :param part_size: The size in bytes of every part but the last
+    :type part_size: int
+    :param checkpoint_dir: Where to keep checkpoint files
+        (defaults to ZENODO_CHECKPOINT_DIR or the user's cache directory)
+    :type checkpoint_dir: Optional[str]
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :param client: The client to send the requests with
+    :type client: Optional[ZenodoClient]
+    :return: The json of the completed file in the bucket
+    :rtype: dict
+    :raises ChecksumMismatch: If the checksum reported for the completed file
+        differs from the md5 of the local file
+    """
+
+    if client is None:
+        client = ZenodoClient.default()
+    file = Path(path)
+    if key is None:
+        key = file.name
+    stat = file.stat()
+    url = f"{bucket_url}/{key}"
+    checkpoint = UploadCheckpoint(
+        bucket_url, key, None if checkpoint_dir is None else Path(checkpoint_dir)
+    )
+
+    loaded = checkpoint.load(stat.st_size, stat.st_mtime_ns, part_size)
+    if loaded and checkpoint.upload_id is not None:
+        parts = _server_parts(client, url, checkpoint.upload_id, token)
+        if parts is None:
+            logger.info(f"Upload {checkpoint.upload_id} of {key} expired, restarting")
+            checkpoint.upload_id = None
+        else:
+            checkpoint.parts = parts
+            logger.info(
+                f"Resuming upload of {key}, "
+                f"{len(parts)} parts were already acknowledged"
+            )
+
+    if checkpoint.upload_id is None:
+        response = client.post(
+            url,
+            params={"uploads": "", "size": stat.st_size, "partSize": part_size},
+            token=token,
+        )
+        response.raise_for_status()
+        checkpoint.upload_id = response.json()["id"]
+        checkpoint.size = stat.st_size
+        checkpoint.mtime_ns = stat.st_mtime_ns
+        checkpoint.part_size = part_size
+        checkpoint.parts = set()
+        checkpoint.save()
+
+    # Parts are read in order, so the md5 of the whole file is computed in the
+    # same pass; parts acknowledged before are read from disk, but not sent.
+    md5 = hashlib.md5()
+    part_count = max(1, -(-stat.st_size // part_size))
+    with open(file, "rb") as fp:
+        for part_number in range(part_count):
+            data = fp.read(part_size)
+            md5.update(data)
+            if part_number in checkpoint.parts:
+                continue
+            response = client.put(
+                url,
+                params={"uploadId": checkpoint.upload_id, "partNumber": part_number},
+                data=data,
+                token=token,
+            )
+            response.raise_for_status()
+            checkpoint.parts.add(part_number)
+            checkpoint.save()
+
+    response = client.post(url, params={"uploadId": checkpoint.upload_id}, token=token)
+    response.raise_for_status()
+    checkpoint.remove()
+    result = response.json()
+    if "checksum" in result:
+        verify_checksum(key, result["checksum"], md5.hexdigest())
+    return result
@@ -0,0 +1,74 @@
+import io
+import zipfile
+from pathlib import Path
+from typing import Iterator
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """A write only, unseekable file object handing out what was written so far"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(
+    path: str,
+    chunk_size: int = CHUNK_SIZE,
+    compression: int = zipfile.ZIP_DEFLATED,
+) -> Iterator[bytes]:
+    """Generate a zip archive of a directory on the fly
+
+    The archive is produced while it is being consumed, so it can be used as the
+    body of a request without writing it to disk first. Only about chunk_size bytes
+    of each file are held in memory at a time. Entries are named relative to path,
+    like shutil.make_archive(..., root_dir=path) does.
+
+    :param path: The directory to archive
+    :type path: str
+    :param chunk_size: The number of bytes read from a file at once
+    :type chunk_size: int
+    :param compression: The zipfile compression method
+    :type compression: int
+    :return: The bytes of the archive
+    :rtype: Iterator[bytes]
+    """
+
+    root = Path(path).absolute()
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as archive:
+        for file in sorted(root.rglob("*")):
+            info = zipfile.ZipInfo.from_file(file, file.relative_to(root).as_posix())
+            if info.is_dir():
+                archive.writestr(info, b"")
+                continue
+            info.compress_type = compression
+            with open(file, "rb") as src, archive.open(
+                info, "w", force_zip64=True
+            ) as dest:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = buffer.take()
+                    if data:
+                        yield data
+            data = buffer.take()
+            if data:
+                yield data
+    yield buffer.take()
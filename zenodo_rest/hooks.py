@@ -0,0 +1,73 @@
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ClientHooks:
+    """Callbacks around every request a client sends
+
+    Subclass it and override the callbacks of interest, then pass instances as
+    hooks to :class:`zenodo_rest.client.ZenodoClient` or
+    :class:`zenodo_rest.aio.client.AsyncZenodoClient`. Callbacks are called for
+    every attempt of a request, from the thread sending it, and exceptions they
+    raise are logged instead of failing the request.
+    """
+
+    def before_request(self, method: str, url: str, headers: dict):
+        """Called before a request is sent
+
+        :param method: The HTTP verb
+        :type method: str
+        :param url: The absolute url of the request
+        :type url: str
+        :param headers: The headers of this request only, may be modified
+        :type headers: dict
+        """
+
+    def after_response(
+        self,
+        method: str,
+        url: str,
+        response: Optional[Any],
+        elapsed: float,
+        error: Optional[Exception] = None,
+    ):
+        """Called once the headers of the response arrived or the request failed
+
+        :param method: The HTTP verb
+        :type method: str
+        :param url: The absolute url of the request
+        :type url: str
+        :param response: The requests or httpx response, None if the request failed
+        :type response: Optional[Any]
+        :param elapsed: The seconds until the headers of the response arrived
+        :type elapsed: float
+        :param error: The transport error the request failed with
+        :type error: Optional[Exception]
+        """
+
+    def on_retry(self, method: str, url: str, attempt: int, reason: str, delay: float):
+        """Called before a failed request is sent again
+
+        :param method: The HTTP verb
+        :type method: str
+        :param url: The absolute url of the request
+        :type url: str
+        :param attempt: The number of the failed attempt, counted from 0
+        :type attempt: int
+        :param reason: Why the attempt failed, an error or a status
+        :type reason: str
+        :param delay: The seconds until the request is sent again
+        :type delay: float
+        """
+
+
+def call_hooks(hooks: list[ClientHooks], name: str, *args):
+    """Call a callback of every hook, logging its exceptions"""
+
+    for hook in hooks:
+        try:
+            getattr(hook, name)(*args)
+        except Exception:
+            logger.exception(f"The {name} hook {hook!r} failed")
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+
+class CacheEntry(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: str
+    value: Any = None  # the parsed body, only kept in memory
+
+
+class ResponseCache:
+    """A cache of GET responses, revalidated with conditional requests
+
+    Entries are kept in an in-memory LRU and optionally on disk, so they outlive
+    the process, e.g. between CLI invocations. Only the raw body is written to
+    disk, the parsed value is rebuilt from it when needed. On disk a url has a
+    single file, holding the entry of the credentials which fetched it last, and
+    the least recently used files are removed beyond max_disk_entries.
+
+    :param max_entries: The maximum number of entries kept in memory
+    :type max_entries: int
+    :param directory: A directory to also store entries in
+    :type directory: Optional[str]
+    :param max_disk_entries: The maximum number of entries kept in directory
+    :type max_disk_entries: int
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        directory: Optional[str] = None,
+        max_disk_entries: int = 10000,
+    ):
+        self.max_entries: int = max_entries
+        self.max_disk_entries: int = max_disk_entries
+        self.directory: Optional[Path] = None
+        self._disk_entries: int = 0
+        if directory is not None:
+            self.directory = Path(directory)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._disk_entries = sum(1 for _ in self.directory.glob("*.json"))
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _file(self, url: str) -> Path:
+        assert self.directory is not None
+        return self.directory / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.directory is None:
+            return None
+        path = self._file(key_url(key))
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if data.get("key") != key:
+            return None
+        entry = CacheEntry(data["etag"], data["last_modified"], data["body"])
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry):
+        self._remember(key, entry)
+        if self.directory is None:
+            return
+        path = self._file(key_url(key))
+        new = not path.exists()
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "key": key,
+                    "etag": entry.etag,
+                    "last_modified": entry.last_modified,
+                    "body": entry.body,
+                },
+                f,
+            )
+        os.replace(tmp, path)
+        if new:
+            with self._lock:
+                self._disk_entries += 1
+                full = self._disk_entries > self.max_disk_entries
+            if full:
+                self._prune()
+
+    def _prune(self):
+        """Remove the least recently used files, down to 90% of max_disk_entries"""
+
+        assert self.directory is not None
+        used = []
+        for path in self.directory.glob("*.json"):
+            try:
+                used.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        used.sort()
+        excess = max(len(used) - int(self.max_disk_entries * 0.9), 0)
+        for _, path in used[:excess]:
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._disk_entries = len(used) - excess
+
+    def _remember(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url: str):
+        """Drop the entries of a url and of every url below it
+
+        On disk only the entry of the url itself is dropped, as only resources,
+        such as a deposition or a record, are cached.
+
+        :param url: The url, without query, whose entries to drop
+        :type url: str
+        """
+
+        with self._lock:
+            keys = [k for k in self._entries if url_below(key_url(k), url)]
+            for key in keys:
+                del self._entries[key]
+        if self.directory is None:
+            return
+        try:
+            self._file(url).unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._disk_entries -= 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._disk_entries = 0
+        if self.directory is not None:
+            for path in self.directory.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+
+def cache_key(url: str, authorization: str) -> str:
+    """Key entries by url and credentials, so users never see each other's data"""
+
+    digest = hashlib.sha256(authorization.encode()).hexdigest()[:16]
+    return f"{digest} {url}"
+
+
+def key_url(key: str) -> str:
+    """The url a cache key was built from"""
+
+    return key.split(" ", 1)[1]
+
+
+def url_below(url: str, prefix: str) -> bool:
+    """Whether url is prefix itself or a path or query below it"""
+
+    return url == prefix or url.startswith((f"{prefix}/", f"{prefix}?"))
@@ -0,0 +1,247 @@
+import bisect
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+from zenodo_rest.hooks import ClientHooks
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The first matching (method, path pattern) names the endpoint of a request
+ENDPOINTS = [
+    ("POST", r"/api/deposit/depositions/?$", "create"),
+    ("GET", r"/api/deposit/depositions/?$", "search"),
+    ("POST", r"/api/deposit/depositions/[^/]+/actions/publish$", "publish"),
+    ("POST", r"/api/deposit/depositions/[^/]+/actions/newversion$", "new_version"),
+    ("DELETE", r"/api/deposit/depositions/[^/]+/files/[^/]+$", "delete_file"),
+    ("GET", r"/api/deposit/depositions/[^/]+$", "retrieve"),
+    ("PUT", r"/api/deposit/depositions/[^/]+$", "update"),
+    ("DELETE", r"/api/deposit/depositions/[^/]+$", "delete"),
+    ("GET", r"/api/records/?$", "search_records"),
+    ("GET", r"/api/records/[^/]+$", "retrieve_record"),
+    ("PUT", r"/api/files/", "bucket_put"),
+    ("POST", r"/api/files/", "bucket_multipart"),
+    ("GET", r"/api/files/", "bucket_get"),
+    ("DELETE", r"/api/files/", "bucket_delete"),
+]
+_ENDPOINTS = [(m, re.compile(p), name) for m, p, name in ENDPOINTS]
+
+
+def endpoint(method: str, url: str) -> str:
+    """The name of the api endpoint of a request, e.g. publish or bucket_put
+
+    :param method: The HTTP verb
+    :type method: str
+    :param url: The url of the request
+    :type url: str
+    :return: The name of the endpoint, "other" for unknown ones
+    :rtype: str
+    """
+
+    path = urlparse(url).path
+    for endpoint_method, pattern, name in _ENDPOINTS:
+        if endpoint_method == method.upper() and pattern.search(path):
+            return name
+    return "other"
+
+
+def _content_length(headers: Any) -> int:
+    try:
+        return int(headers.get("Content-Length", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+class MetricsCollector(ClientHooks):
+    """Collects latencies, statuses, bytes and retries of requests per endpoint
+
+    Pass it as a hook to one or more clients. Latencies are the seconds until the
+    headers of a response arrived, counted in a histogram per endpoint. Bytes are
+    taken from the Content-Length of requests and responses, so chunked uploads
+    are not counted. Export the metrics with :func:`export_text`.
+
+    :param buckets: The upper bounds in seconds of the latency histogram
+    :type buckets: tuple[float, ...]
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms: dict[str, list[int]] = {}
+        self._seconds: defaultdict[str, float] = defaultdict(float)
+        self._requests: Counter = Counter()
+        self._sent: Counter = Counter()
+        self._received: Counter = Counter()
+        self._retries: Counter = Counter()
+
+    def after_response(
+        self,
+        method: str,
+        url: str,
+        response: Optional[Any],
+        elapsed: float,
+        error: Optional[Exception] = None,
+    ):
+        name = endpoint(method, url)
+        status = "error" if response is None else str(response.status_code)
+        sent = 0
+        request = getattr(response, "request", None)
+        if request is not None:
+            sent = _content_length(request.headers)
+        received = 0 if response is None else _content_length(response.headers)
+        with self._lock:
+            histogram = self._histograms.setdefault(name, [0] * (len(self.buckets) + 1))
+            histogram[bisect.bisect_left(self.buckets, elapsed)] += 1
+            self._seconds[name] += elapsed
+            self._requests[name, status] += 1
+            self._sent[name] += sent
+            self._received[name] += received
+
+    def on_retry(self, method: str, url: str, attempt: int, reason: str, delay: float):
+        with self._lock:
+            self._retries[endpoint(method, url)] += 1
+
+    def summary(self) -> dict[str, dict]:
+        """The metrics of every endpoint, slowest in total first
+
+        :return: Per endpoint the number of requests, total and mean seconds,
+            the upper bound of the bucket of the 95th percentile latency, bytes
+            sent and received, retries and the count of every status
+        :rtype: dict[str, dict]
+        """
+
+        with self._lock:
+            result: dict[str, dict] = {}
+            for name, histogram in self._histograms.items():
+                count = sum(histogram)
+                index, seen = 0, 0
+                for index, n in enumerate(histogram):
+                    seen += n
+                    if seen >= 0.95 * count:
+                        break
+                bounds = self.buckets + (float("inf"),)
+                result[name] = {
+                    "requests": count,
+                    "seconds": self._seconds[name],
+                    "mean_seconds": self._seconds[name] / count,
+                    "p95_seconds_below": bounds[index],
+                    "bytes_sent": self._sent[name],
+                    "bytes_received": self._received[name],
+                    "retries": self._retries[name],
+                    "statuses": {
+                        status: n
+                        for (e, status), n in self._requests.items()
+                        if e == name
+                    },
+                }
+            return dict(
+                sorted(result.items(), key=lambda x: x[1]["seconds"], reverse=True)
+            )
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            for counter in (
+                self._seconds,
+                self._requests,
+                self._sent,
+                self._received,
+                self._retries,
+            ):
+                counter.clear()
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def export_text(collector: MetricsCollector, namespace: str = "zenodo_rest") -> str:
+    """Format the metrics of a collector in the Prometheus text format
+
+    :param collector: The collector to export
+    :type collector: MetricsCollector
+    :param namespace: The prefix of the metric names
+    :type namespace: str
+    :return: The metrics, one sample per line
+    :rtype: str
+    """
+
+    n = namespace
+    lines = []
+    with collector._lock:
+        lines += [
+            f"# HELP {n}_request_duration_seconds Seconds until the response headers"
+            " arrived.",
+            f"# TYPE {n}_request_duration_seconds histogram",
+        ]
+        bounds = collector.buckets + (float("inf"),)
+        for name, histogram in sorted(collector._histograms.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, histogram):
+                cumulative += count
+                lines.append(
+                    f'{n}_request_duration_seconds_bucket{{endpoint="{name}",'
+                    f'le="{_format(bound)}"}} {cumulative}'
+                )
+            lines.append(
+                f'{n}_request_duration_seconds_sum{{endpoint="{name}"}} '
+                f"{_format(collector._seconds[name])}"
+            )
+            lines.append(
+                f'{n}_request_duration_seconds_count{{endpoint="{name}"}} {cumulative}'
+            )
+
+        lines += [
+            f"# HELP {n}_requests_total Requests sent by endpoint and status.",
+            f"# TYPE {n}_requests_total counter",
+        ]
+        for (name, status), count in sorted(collector._requests.items()):
+            lines.append(
+                f'{n}_requests_total{{endpoint="{name}",status="{status}"}} {count}'
+            )
+
+        for metric, counter, help in (
+            ("retries_total", collector._retries, "Requests sent again."),
+            ("sent_bytes_total", collector._sent, "Bytes of request bodies."),
+            ("received_bytes_total", collector._received, "Bytes of responses."),
+        ):
+            lines += [
+                f"# HELP {n}_{metric} {help}",
+                f"# TYPE {n}_{metric} counter",
+            ]
+            for name, count in sorted(counter.items()):
+                lines.append(f'{n}_{metric}{{endpoint="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def write_text(collector: MetricsCollector, path: str, namespace: str = "zenodo_rest"):
+    """Write the metrics of a collector to a file in the Prometheus text format
+
+    The file is replaced atomically, so it can be read by the textfile collector
+    of the node exporter at any time.
+
+    :param collector: The collector to export
+    :type collector: MetricsCollector
+    :param path: The file to write
+    :type path: str
+    :param namespace: The prefix of the metric names
+    :type namespace: str
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(export_text(collector, namespace))
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
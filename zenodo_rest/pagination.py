@@ -0,0 +1,99 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator, Optional, Union
+
+import requests
+
+from zenodo_rest._json import response_json
+from zenodo_rest.client import ZenodoClient
+
+# A parser returns the hits of a page and the url of the next page, or False for
+# the last page, or None if the response does not link to other pages.
+PageParser = Callable[[requests.Response], tuple[list, Union[str, bool, None]]]
+
+
+def link_header_page(
+    response: requests.Response,
+) -> tuple[list, Union[str, bool, None]]:
+    """Parse a page whose body is a list of hits linked by a Link header"""
+
+    if not response.links:
+        return response_json(response), None
+    return response_json(response), response.links.get("next", {}).get("url", False)
+
+
+def iter_pages(
+    client: ZenodoClient,
+    url: str,
+    params: dict,
+    parse: PageParser = link_header_page,
+    token: Optional[str] = None,
+) -> Iterator[list]:
+    """Follow the pages of a search, fetching the next page in the background
+
+    The next page is requested as soon as the current one arrived, so it is in
+    flight while the caller consumes the current hits. Pages are followed through
+    their next links, or by incrementing the page parameter until a page is empty
+    if the server does not send links. A page smaller than the size parameter
+    does not end the search, as servers may cap the size of pages.
+
+    :param client: The client to send the requests with
+    :type client: ZenodoClient
+    :param url: The url of the search
+    :type url: str
+    :param params: The query parameters of the first page
+    :type params: dict
+    :param parse: Extracts the hits and next link of a page
+    :type parse: PageParser
+    :param token: Your zenodo token
+    :type token: Optional[str]
+    :return: The hits of every page which is not empty
+    :rtype: Iterator[list]
+    """
+
+    def fetch(url: str, params: Optional[dict]) -> requests.Response:
+        response = client.get(url, params=params, token=token)
+        response.raise_for_status()
+        return response
+
+    page = int(params.get("page", 1))
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        future: Optional[Future] = executor.submit(fetch, url, params)
+        while future is not None:
+            hits, next_url = parse(future.result())
+            future = None
+            if isinstance(next_url, str):
+                future = executor.submit(fetch, next_url, None)
+            elif next_url is None and hits:
+                page += 1
+                future = executor.submit(fetch, url, {**params, "page": page})
+            if hits:
+                yield hits
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def search_params(
+    query: Optional[str],
+    status: Optional[str],
+    sort: Optional[str],
+    page: Optional[str],
+    size: Optional[int],
+    all_versions: Optional[bool],
+) -> dict:
+    """Build the query parameters shared by the deposition and record searches"""
+
+    params: dict = {}
+    if query is not None:
+        params["q"] = query
+    if status is not None:
+        params["status"] = status
+    if sort is not None:
+        params["sort"] = sort
+    if page is not None:
+        params["page"] = page
+    if size is not None:
+        params["size"] = size
+    if all_versions:
+        params["all_versions"] = "true"
+    return params
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+# Statuses by which a server asks its clients to slow down
+THROTTLED = (429, 503)
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> float:
+    """The seconds to wait according to a Retry-After header
+
+    :param value: Either a number of seconds or an HTTP date
+    :type value: Optional[str]
+    :param now: The current unix time (defaults to time.time())
+    :type now: Optional[float]
+    :return: The seconds to wait, 0 if the header is missing or invalid
+    :rtype: float
+    """
+
+    if not value:
+        return 0.0
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(date.timestamp() - (time.time() if now is None else now), 0.0)
+
+
+class RateLimiter:
+    """A token bucket and an adaptive concurrency limit shared by clients
+
+    Every request takes a token from the bucket and a concurrency slot before it
+    is sent. The refill rate follows the X-RateLimit-Remaining and
+    X-RateLimit-Reset headers of the responses, spreading the remaining quota over
+    the rest of the window, and Retry-After pauses all requests. The concurrency
+    limit grows by one per limit successful responses and is halved whenever the
+    server throttles (additive increase, multiplicative decrease).
+
+    The limiter is thread safe and may be shared between ZenodoClient and
+    AsyncZenodoClient, threads waiting in :meth:`acquire` and tasks awaiting
+    :meth:`acquire_async` draw from the same budget.
+
+    :param rate: The initial requests per second
+        (defaults to unlimited until the server reports its limits)
+    :type rate: Optional[float]
+    :param burst: The number of requests which may be sent at once after idling
+    :type burst: int
+    :param max_concurrency: The upper bound of the concurrency limit
+    :type max_concurrency: int
+    :param min_concurrency: The lower bound of the concurrency limit
+    :type min_concurrency: int
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 10,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+    ):
+        self.rate: Optional[float] = rate
+        self.burst: int = burst
+        self.max_concurrency: int = max_concurrency
+        self.min_concurrency: int = min_concurrency
+        self.concurrency: float = float(max_concurrency)
+        self.in_flight: int = 0
+        self.throttled: int = 0
+        self._tokens: float = float(burst)
+        self._updated: float = time.monotonic()
+        self._paused_until: float = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        if self.rate is not None:
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def _try_acquire(self) -> Optional[float]:
+        """Take a token and a slot, or return the seconds to wait for a token
+
+        Returns 0 when both were taken and None when no slot is free.
+        """
+
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.in_flight >= int(self.concurrency):
+            return None
+        self._refill(now)
+        if self.rate is not None:
+            if self._tokens < 1:
+                return (1 - self._tokens) / max(self.rate, 1e-6)
+            self._tokens -= 1
+        self.in_flight += 1
+        return 0.0
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent"""
+
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return
+                self._cond.wait(wait)
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a request may be sent"""
+
+        delay = 0.005
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait == 0:
+                return
+            if wait is None:
+                # Slots are released from other threads or tasks, poll for them
+                wait, delay = delay, min(delay * 2, 0.1)
+            await asyncio.sleep(wait)
+
+    def release(self, status: Optional[int] = None, headers: Optional[Mapping] = None):
+        """Return the slot of a request and adapt to its response
+
+        :param status: The HTTP status of the response, None if it failed
+        :type status: Optional[int]
+        :param headers: The headers of the response
+        :type headers: Optional[Mapping]
+        """
+
+        with self._cond:
+            self.in_flight -= 1
+            if status is not None:
+                self._adapt(status, headers or {})
+            self._cond.notify_all()
+
+    def _adapt(self, status: int, headers: Mapping):
+        now = time.monotonic()
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if status in THROTTLED:
+            self.throttled += 1
+            self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+            self._paused_until = max(self._paused_until, now + retry_after)
+        elif status < 400:
+            self.concurrency = min(
+                self.max_concurrency, self.concurrency + 1 / self.concurrency
+            )
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining, reset = int(remaining), float(reset)
+        except ValueError:
+            return
+        # The reset is a unix time, converted to the monotonic clock
+        window = max(reset - time.time(), 0.0)
+        if remaining <= 0:
+            self._paused_until = max(self._paused_until, now + window)
+            self._tokens = 0.0
+            return
+        self._refill(now)
+        self.rate = remaining / max(window, 1.0)
+        self._tokens = min(self._tokens, remaining)
@@ -0,0 +1,157 @@
+from typing import Iterator, Optional, Union
+
+import requests
+
+from zenodo_rest._json import response_json
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.entities.record import CompactRecord, Record
+from zenodo_rest.pagination import iter_pages, search_params
+
+
+def records_page(response: requests.Response) -> tuple[list, Union[str, bool, None]]:
+    """Parse a page whose body has the hits and the link to the next page"""
+
+    body = response_json(response)
+    if "links" not in body:
+        return body["hits"]["hits"], None
+    return body["hits"]["hits"], body["links"].get("next", False)
+
+
+def retrieve(
+    record_id: str,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> Record:
+    """Fetch a published record by id
+
+    :param record_id: The id of the record
+    :type record_id: str
+    :param token: your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :param client: The client to send the request with
+        (defaults to the shared ZenodoClient.default())
+    :type client: Optional[ZenodoClient]
+    :return: The record
+    :rtype: Record
+    """
+
+    if client is None:
+        client = ZenodoClient.default()
+
+    return client.get_cached(
+        client.url(f"/api/records/{record_id}", base_url),
+        Record.parse_obj,
+        headers={"Accept": "application/json"},
+        token=token,
+    )
+
+
+def search(
+    query: Optional[str] = None,
+    status: Optional[str] = None,
+    sort: Optional[str] = None,
+    page: Optional[str] = None,
+    size: Optional[int] = None,
+    all_versions: Optional[bool] = None,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> list[Record]:
+    """Search for published records, returning a single page
+
+    :param query: An elasticsearch formatted query
+    :type query: Optional[str]
+    :param status: Filter by publication status; either 'draft' or 'published'
+    :type status: Optional[str]
+    :param sort: Sort order 'bestmatch' or 'mostrecent',
+        prefix with - to sort descending.
+    :type sort: Optional[str]
+    :param page: The page of the search to return
+    :type page: Optional[str]
+    :param size: The size limit per page
+    :type size: Optional[int]
+    :param all_versions: True to show all versions
+    :type all_versions: Optional[bool]
+    :param token: your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :param client: The client to send the request with
+        (defaults to the shared ZenodoClient.default())
+    :type client: Optional[ZenodoClient]
+    :return: The records of the page
+    :rtype: list[Record]
+    """
+
+    if client is None:
+        client = ZenodoClient.default()
+
+    params = search_params(query, status, sort, page, size, all_versions)
+    response = client.get(
+        client.url("/api/records", base_url), params=params, token=token
+    )
+
+    response.raise_for_status()
+    return [Record.parse_obj(x) for x in response_json(response)["hits"]["hits"]]
+
+
+def iter_hits(
+    query: Optional[str] = None,
+    status: Optional[str] = None,
+    sort: Optional[str] = None,
+    size: Optional[int] = None,
+    all_versions: Optional[bool] = None,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> Iterator[dict]:
+    """Search for published records, lazily following all pages of the result
+
+    Yields the json of every hit as returned by the server. Only one page is held
+    in memory at a time, while the next page is already being fetched.
+    The parameters are the ones of search.
+
+    :return: The json of the records found, one at a time
+    :rtype: Iterator[dict]
+    """
+
+    if client is None:
+        client = ZenodoClient.default()
+
+    params = search_params(query, status, sort, None, size, all_versions)
+    url = client.url("/api/records", base_url)
+    for hits in iter_pages(client, url, params, records_page, token):
+        yield from hits
+
+
+def iter_records(
+    query: Optional[str] = None,
+    status: Optional[str] = None,
+    sort: Optional[str] = None,
+    size: Optional[int] = None,
+    all_versions: Optional[bool] = None,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+    compact: bool = False,
+) -> Iterator[Union[Record, CompactRecord]]:
+    """Search for published records, lazily following all pages of the result
+
+    Like iter_hits, but yields Record objects. The parameters are the ones of
+    search.
+
+    :param compact: Yield memory lean CompactRecord objects, e.g. to keep many
+        of them in memory
+    :type compact: bool
+    :return: The records found, one at a time
+    :rtype: Iterator[Union[Record, CompactRecord]]
+    """
+
+    parse = CompactRecord.parse_obj if compact else Record.parse_obj
+    for hit in iter_hits(
+        query, status, sort, size, all_versions, token, base_url, client
+    ):
+        yield parse(hit)
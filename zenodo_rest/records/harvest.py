@@ -0,0 +1,275 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from zenodo_rest.client import ZenodoClient
+from zenodo_rest.entities.record import CompactRecord, Record
+from zenodo_rest.files.hash_cache import default_cache_dir
+from zenodo_rest.pagination import iter_pages, search_params
+from zenodo_rest.records.actions import records_page
+
+SCHEMA_VERSION = 1
+
+
+class HarvestCheckpoint:
+    """The persistent state of incremental harvests of records
+
+    Per harvest, identified by a scope, this keeps the high-water mark, the
+    latest updated timestamp of a completed harvest, and the revision of every
+    record emitted. The state is a sqlite database which can be shared between
+    threads.
+
+    :param path: The database file
+        (defaults to harvest.sqlite in the default_cache_dir())
+    :type path: Optional[str]
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            self.path: Path = default_cache_dir() / "harvest.sqlite"
+        else:
+            self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version not in (0, SCHEMA_VERSION):
+            raise RuntimeError(
+                f"{self.path} has schema version {version}, expected {SCHEMA_VERSION}"
+            )
+        self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS high_water ("
+            "scope TEXT PRIMARY KEY, updated TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS revisions ("
+            "scope TEXT, record_id INTEGER, revision INTEGER, "
+            "PRIMARY KEY (scope, record_id)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def high_water(self, scope: str) -> Optional[str]:
+        """The latest updated timestamp of the last completed harvest"""
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT updated FROM high_water WHERE scope = ?", (scope,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set_high_water(self, scope: str, updated: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO high_water VALUES (?, ?)", (scope, updated)
+            )
+            self._db.commit()
+
+    def revisions(self, scope: str, record_ids: list[int]) -> dict[int, int]:
+        """The revisions emitted of records
+
+        :param scope: The harvest
+        :type scope: str
+        :param record_ids: The ids of the records
+        :type record_ids: list[int]
+        :return: The revision by id of the records which were emitted before
+        :rtype: dict[int, int]
+        """
+
+        if not record_ids:
+            return {}
+        marks = ", ".join("?" * len(record_ids))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT record_id, revision FROM revisions "
+                f"WHERE scope = ? AND record_id IN ({marks})",
+                (scope, *record_ids),
+            ).fetchall()
+        return dict(rows)
+
+    def mark(self, scope: str, revisions: list[tuple[int, int]]):
+        """Record that revisions of records were emitted
+
+        :param scope: The harvest
+        :type scope: str
+        :param revisions: The ids and revisions of the records
+        :type revisions: list[tuple[int, int]]
+        """
+
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO revisions VALUES (?, ?, ?)",
+                [(scope, record_id, revision) for record_id, revision in revisions],
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """The high-water mark and the number of records of every harvest"""
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT h.scope, h.updated, COUNT(r.record_id) FROM high_water h "
+                "LEFT JOIN revisions r ON r.scope = h.scope GROUP BY h.scope"
+            ).fetchall()
+        return {
+            "path": str(self.path),
+            "harvests": [
+                {"scope": json.loads(scope), "high_water": updated, "records": count}
+                for scope, updated, count in rows
+            ],
+        }
+
+    def reset(self, scope: str):
+        """Forget a harvest, so that the next one emits all records again"""
+
+        with self._lock:
+            self._db.execute("DELETE FROM high_water WHERE scope = ?", (scope,))
+            self._db.execute("DELETE FROM revisions WHERE scope = ?", (scope,))
+            self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+def _timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def harvest_scope(
+    query: Optional[str] = None,
+    all_versions: bool = False,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> str:
+    """The key of the checkpoint of a harvest, one per server, query and versions"""
+
+    if client is None:
+        client = ZenodoClient.default()
+    url = client.url("/api/records", base_url)
+    return json.dumps([url, query, bool(all_versions)])
+
+
+def harvest_hits(
+    query: Optional[str] = None,
+    all_versions: bool = False,
+    size: Optional[int] = None,
+    checkpoint: Optional[HarvestCheckpoint] = None,
+    overlap: float = 300.0,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+) -> Iterator[dict]:
+    """Search for records which are new or changed since the last harvest
+
+    Only records updated since the high-water mark of the last completed harvest,
+    minus overlap seconds, are requested, and of these only records with a
+    revision not emitted before are yielded. The overlap covers records indexed
+    late, with an updated timestamp before the high-water mark.
+
+    A record counts as emitted once the next one is requested, and the emitted
+    revisions of a page are saved before the following page. The high-water mark
+    only advances once all pages were consumed, so an interrupted harvest is
+    continued by the next one without emitting records twice.
+
+    :param query: An elasticsearch formatted query, e.g. communities:zenodo
+    :type query: Optional[str]
+    :param all_versions: True to harvest all versions of records
+    :type all_versions: bool
+    :param size: The size limit per page
+    :type size: Optional[int]
+    :param checkpoint: The state of previous harvests
+        (defaults to a HarvestCheckpoint in the default_cache_dir())
+    :type checkpoint: Optional[HarvestCheckpoint]
+    :param overlap: The seconds before the high-water mark to request again
+    :type overlap: float
+    :param token: your zenodo token
+    :type token: Optional[str]
+    :param base_url: The url to the target zenodo server
+    :type base_url: Optional[str]
+    :param client: The client to send the requests with
+        (defaults to the shared ZenodoClient.default())
+    :type client: Optional[ZenodoClient]
+    :return: The json of the new and changed records, one at a time
+    :rtype: Iterator[dict]
+    """
+
+    if checkpoint is None:
+        # A checkpoint opened here is closed here, its connection is not shared
+        checkpoint = HarvestCheckpoint()
+        try:
+            yield from harvest_hits(
+                query, all_versions, size, checkpoint, overlap, token, base_url, client
+            )
+        finally:
+            checkpoint.close()
+        return
+    if client is None:
+        client = ZenodoClient.default()
+
+    scope = harvest_scope(query, all_versions, base_url, client)
+    high_water = checkpoint.high_water(scope)
+    newest = None if high_water is None else _timestamp(high_water)
+    if newest is not None:
+        since = (newest - timedelta(seconds=overlap)).strftime("%Y-%m-%dT%H:%M:%S")
+        # Colons are special in query strings
+        escaped = since.replace(":", "\\:")
+        clause = f"updated:[{escaped} TO *]"
+        query = clause if query is None else f"({query}) AND {clause}"
+
+    # Sorting by creation, records created during the harvest shift the others
+    # to later pages, which are then seen twice instead of being skipped
+    params = search_params(query, None, "mostrecent", None, size, all_versions)
+    url = client.url("/api/records", base_url)
+    for hits in iter_pages(client, url, params, records_page, token):
+        known = checkpoint.revisions(scope, [hit["id"] for hit in hits])
+        emitted = []
+        try:
+            for hit in hits:
+                updated = _timestamp(hit["updated"])
+                if newest is None or updated > newest:
+                    newest = updated
+                if known.get(hit["id"], -1) >= hit["revision"]:
+                    continue
+                yield hit
+                emitted.append((hit["id"], hit["revision"]))
+        finally:
+            checkpoint.mark(scope, emitted)
+    if newest is not None:
+        checkpoint.set_high_water(scope, newest.isoformat())
+
+
+def harvest(
+    query: Optional[str] = None,
+    all_versions: bool = False,
+    size: Optional[int] = None,
+    checkpoint: Optional[HarvestCheckpoint] = None,
+    overlap: float = 300.0,
+    token: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: Optional[ZenodoClient] = None,
+    compact: bool = False,
+) -> Iterator[Union[Record, CompactRecord]]:
+    """Search for records which are new or changed since the last harvest
+
+    Like harvest_hits, but yields Record objects. The parameters are the ones of
+    harvest_hits.
+
+    :param compact: Yield memory lean CompactRecord objects
+    :type compact: bool
+    :return: The new and changed records, one at a time
+    :rtype: Iterator[Union[Record, CompactRecord]]
+    """
+
+    parse = CompactRecord.parse_obj if compact else Record.parse_obj
+    for hit in harvest_hits(
+        query, all_versions, size, checkpoint, overlap, token, base_url, client
+    ):
+        yield parse(hit)
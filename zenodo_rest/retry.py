@@ -0,0 +1,151 @@
+import logging
+import random
+import time
+from typing import Callable, Optional, TypeVar
+
+import requests
+
+from zenodo_rest.ratelimit import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Transport errors after which a request may be sent again
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class RetryPolicy:
+    """When and how long to wait before sending a failed request again
+
+    Requests failing with a transient error, a connection error, a timeout or
+    one of the retried statuses, are sent again after a jittered exponential
+    backoff: a random delay of up to backoff * 2 ** attempt seconds, capped at
+    max_backoff, but never less than a Retry-After of the response.
+
+    Only idempotent methods are retried by the clients, as sending them twice
+    has the effect of sending them once. Non-idempotent calls, such as publishing
+    or creating a new version, are retried by :func:`call_verified`, which
+    checks whether a failed call took effect before sending it again.
+
+    :param attempts: The maximum number of times a request is sent
+    :type attempts: int
+    :param backoff: The base delay in seconds
+    :type backoff: float
+    :param max_backoff: The maximum delay in seconds
+    :type max_backoff: float
+    :param statuses: The HTTP statuses considered transient
+    :type statuses: frozenset[int]
+    :param methods: The HTTP methods which are safe to send again
+    :type methods: frozenset[str]
+    """
+
+    def __init__(
+        self,
+        attempts: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504}),
+        methods: frozenset[str] = frozenset(
+            {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+        ),
+    ):
+        self.attempts: int = attempts
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+        self.statuses: frozenset[int] = statuses
+        self.methods: frozenset[str] = methods
+
+    def delay(self, attempt: int, retry_after: float = 0.0) -> float:
+        """The seconds to wait after the given attempt, counted from 0"""
+
+        cap = min(self.max_backoff, self.backoff * 2**attempt)
+        return max(random.uniform(0, cap), retry_after)
+
+    def retries(self, method: str, **kwargs) -> bool:
+        """Whether a request may be sent again after a transient failure
+
+        Besides an idempotent method this requires a body which can be sent
+        again: none, bytes, a form or json, or a seekable file.
+        """
+
+        if method.upper() not in self.methods:
+            return False
+        # requests takes the body as data, httpx as content
+        data = kwargs.get("data", kwargs.get("content"))
+        if data is None or isinstance(data, (bytes, str, dict, list, tuple)):
+            return "files" not in kwargs
+        return hasattr(data, "seek") and hasattr(data, "tell")
+
+
+def call_verified(
+    send: Callable[[], requests.Response],
+    parse: Callable[[requests.Response], T],
+    verify: Optional[Callable[[], Optional[T]]],
+    policy: RetryPolicy,
+    description: str = "request",
+    on_retry: Optional[Callable[[int, str, float], None]] = None,
+) -> T:
+    """Send a non-idempotent request, retrying only if it did not take effect
+
+    After a transient failure the request may or may not have been applied by
+    the server, so verify is asked for its result first, and only if it returns
+    None is the request sent again after a backoff. Throttled requests (429)
+    were not applied and are sent again without verifying. Without verify, only
+    throttled requests are sent again, other failures are raised at once.
+
+    :param send: Sends the request
+    :type send: Callable[[], requests.Response]
+    :param parse: Builds the result from a successful response
+    :type parse: Callable[[requests.Response], T]
+    :param verify: Looks up the result of a request which may have been applied,
+        None if that cannot be told
+    :type verify: Optional[Callable[[], Optional[T]]]
+    :param policy: The number of attempts and their backoff
+    :type policy: RetryPolicy
+    :param description: Names the request in log messages
+    :type description: str
+    :param on_retry: Called with the attempt, the reason of its failure and the
+        delay instead of logging a retry, e.g. :meth:`ZenodoClient.on_retry`
+    :type on_retry: Optional[Callable[[int, str, float], None]]
+    :return: The result
+    :rtype: T
+    :raises requests.HTTPError: If the last attempt failed with an error status
+    """
+
+    attempts = max(policy.attempts, 1)
+    for attempt in range(attempts):
+        retry_after = 0.0
+        try:
+            response = send()
+        except TRANSIENT_ERRORS as e:
+            logger.warning(f"The {description} failed: {e}")
+            error: Optional[Exception] = e
+            reason = str(e)
+            throttled = False
+        else:
+            if response.status_code not in policy.statuses:
+                response.raise_for_status()
+                return parse(response)
+            logger.warning(f"The {description} returned {response.status_code}")
+            error = None
+            reason = f"status {response.status_code}"
+            throttled = response.status_code == 429
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+        if not throttled and verify is not None:
+            result = verify()
+            if result is not None:
+                logger.info(f"The {description} took effect despite the error")
+                return result
+        if attempt == attempts - 1 or not (throttled or verify is not None):
+            if error is not None:
+                raise error
+            response.raise_for_status()
+        delay = policy.delay(attempt, retry_after)
+        if on_retry is None:
+            logger.warning(f"Retrying the {description} in {delay:.2f}s")
+        else:
+            on_retry(attempt, reason, delay)
+        time.sleep(delay)
+    raise AssertionError("unreachable")
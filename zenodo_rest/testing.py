@@ -0,0 +1,830 @@
+import hashlib
+import io
+import itertools
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from zenodo_rest.client import ZenodoClient
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _md5(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+class _Fault:
+    def __init__(
+        self,
+        status: int,
+        times: int,
+        method: Optional[str],
+        path: Optional[str],
+        retry_after: Optional[float],
+        applied: bool,
+    ):
+        self.applied: bool = applied
+        self.status: int = status
+        self.times: int = times
+        self.method: Optional[str] = method
+        self.path: Optional[re.Pattern] = None if path is None else re.compile(path)
+        self.retry_after: Optional[float] = retry_after
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.times <= 0:
+            return False
+        if self.method is not None and self.method != method:
+            return False
+        return self.path is None or self.path.search(path) is not None
+
+
+class FakeZenodo:
+    """An in-process stand-in for the zenodo endpoints used by this package
+
+    Serves depositions (create, retrieve, search, update, delete, publish, new
+    version and file deletion), buckets (plain, chunked and multipart uploads,
+    downloads with byte ranges) and records (retrieve and search) over HTTP on
+    localhost. Searches are paginated like zenodo's, depositions with a Link
+    header and records with links in the body, and depositions and records are
+    served with an ETag and Last-Modified honoring If-None-Match and
+    If-Modified-Since. Queries support ranges of
+    timestamps, e.g. updated:[2024-01-01 TO *], and otherwise match a text in the
+    metadata.
+
+    For benchmarks and failure tests every response can be delayed by latency,
+    bodies in both directions are throttled to bandwidth, requests can be
+    throttled to rate_limit per rate_window with the X-RateLimit headers of
+    zenodo, :meth:`fail` injects error responses and :meth:`corrupt` damages
+    uploads. Every request is recorded in requests as a (method, path) tuple.
+
+    Use it as a context manager, or call :meth:`start` and :meth:`stop`.
+
+    :param latency: The seconds to wait before handling every request
+    :type latency: float
+    :param bandwidth: The bytes per second of the bodies of each request and response
+        (defaults to unlimited)
+    :type bandwidth: Optional[float]
+    :param rate_limit: The number of requests allowed per rate_window
+        (defaults to unlimited)
+    :type rate_limit: Optional[int]
+    :param rate_window: The seconds of a rate limit window
+    :type rate_window: float
+    :param token: The only token accepted, others are answered with 401
+        (defaults to accepting any token)
+    :type token: Optional[str]
+    :param ranges: False to ignore Range headers of downloads and always send
+        whole files, like servers without support for byte ranges
+    :type ranges: bool
+    :param max_page_size: The most hits of a search page, larger sizes requested
+        are capped to it (defaults to unlimited)
+    :type max_page_size: Optional[int]
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bandwidth: Optional[float] = None,
+        rate_limit: Optional[int] = None,
+        rate_window: float = 60.0,
+        token: Optional[str] = None,
+        ranges: bool = True,
+        max_page_size: Optional[int] = None,
+    ):
+        self.latency: float = latency
+        self.bandwidth: Optional[float] = bandwidth
+        self.rate_limit: Optional[int] = rate_limit
+        self.rate_window: float = rate_window
+        self.token: Optional[str] = token
+        self.ranges: bool = ranges
+        self.max_page_size: Optional[int] = max_page_size
+        self.requests: list[tuple[str, str]] = []
+        self.depositions: dict[str, dict] = {}
+        self.buckets: dict[str, dict[str, bytes]] = {}
+        self.records: dict[str, dict] = {}
+        self.uploads: dict[str, dict] = {}
+        self._faults: list[_Fault] = []
+        self._corruptions: list[_Fault] = []
+        self._ids = itertools.count(1)
+        self._window_start: float = time.time()
+        self._window_count: int = 0
+        self._lock = threading.RLock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """The base url of the server, to be used as base_url of a client"""
+
+        if self._server is None:
+            raise RuntimeError("The server is not started")
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "FakeZenodo":
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name="fake-zenodo", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeZenodo":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def client(self, **kwargs) -> ZenodoClient:
+        """A client for this server, taking the arguments of ZenodoClient"""
+
+        kwargs.setdefault("token", self.token or "token")
+        return ZenodoClient(base_url=self.url, **kwargs)
+
+    def fail(
+        self,
+        status: int = 500,
+        times: int = 1,
+        method: Optional[str] = None,
+        path: Optional[str] = None,
+        retry_after: Optional[float] = None,
+        applied: bool = False,
+    ):
+        """Answer the next matching requests with an error
+
+        :param status: The status of the error responses, e.g. 503 or 429
+        :type status: int
+        :param times: The number of requests to fail
+        :type times: int
+        :param method: Only fail requests of this method
+        :type method: Optional[str]
+        :param path: Only fail requests whose path and query match this regex
+        :type path: Optional[str]
+        :param retry_after: The seconds of a Retry-After header to send
+        :type retry_after: Optional[float]
+        :param applied: Handle the requests before answering with the error, like
+            a gateway timing out while zenodo completes them
+        :type applied: bool
+        """
+
+        with self._lock:
+            self._faults.append(
+                _Fault(status, times, method, path, retry_after, applied)
+            )
+
+    def corrupt(self, times: int = 1, path: Optional[str] = None):
+        """Change a byte of the next uploads before storing them
+
+        The responses report the checksum of the stored bytes, like a server
+        which received the data damaged in transit.
+
+        :param times: The number of uploads to corrupt
+        :type times: int
+        :param path: Only corrupt uploads whose path and query match this regex
+        :type path: Optional[str]
+        """
+
+        with self._lock:
+            self._corruptions.append(_Fault(0, times, "PUT", path, None, True))
+
+    # State
+
+    def _bucket_url(self, bucket: str) -> str:
+        return f"{self.url}/api/files/{bucket}"
+
+    def _versions(self, deposition: dict) -> list[dict]:
+        concept = deposition["conceptrecid"]
+        return [x for x in self.depositions.values() if x["conceptrecid"] == concept]
+
+    def add_deposition(
+        self,
+        metadata: Optional[dict] = None,
+        files: Optional[dict[str, bytes]] = None,
+        publish: bool = False,
+    ) -> dict:
+        """Create a deposition directly, e.g. to set up a test
+
+        :param metadata: The metadata of the deposition
+        :type metadata: Optional[dict]
+        :param files: The contents of the files of the deposition by name
+        :type files: Optional[dict[str, bytes]]
+        :param publish: Whether to publish the deposition
+        :type publish: bool
+        :return: The json of the deposition as served
+        :rtype: dict
+        """
+
+        with self._lock:
+            deposition = self._create(metadata or {"title": "Placeholder"})
+            self.buckets[deposition["bucket"]].update(files or {})
+            if publish:
+                self._publish(deposition)
+            return self._deposition_json(deposition)
+
+    def record(self, record_id: str) -> dict:
+        """The json of a published record as served
+
+        :param record_id: The id of the record
+        :type record_id: str
+        :return: The json of the record
+        :rtype: dict
+        """
+
+        with self._lock:
+            return self._record_json(record_id)
+
+    def update_record(self, record_id: str, metadata: dict) -> dict:
+        """Change the metadata of a published record, as editing it on zenodo
+
+        :param record_id: The id of the record
+        :type record_id: str
+        :param metadata: The metadata to merge into the metadata of the record
+        :type metadata: dict
+        :return: The json of the record as served
+        :rtype: dict
+        """
+
+        with self._lock:
+            deposition = self.depositions[record_id]
+            deposition["metadata"] = {**deposition["metadata"], **metadata}
+            self._publish(deposition)
+            return self._record_json(record_id)
+
+    def _create(self, metadata: dict, concept: Optional[str] = None) -> dict:
+        deposition_id = str(next(self._ids))
+        bucket = uuid.uuid4().hex
+        self.buckets[bucket] = {}
+        deposition = {
+            "id": deposition_id,
+            "conceptrecid": concept or str(next(self._ids)),
+            "created": _now(),
+            "modified": _now(),
+            "metadata": metadata,
+            "bucket": bucket,
+            "submitted": False,
+            "state": "unsubmitted",
+            "doi": None,
+        }
+        self.depositions[deposition_id] = deposition
+        return deposition
+
+    def _publish(self, deposition: dict):
+        deposition.update(
+            submitted=True,
+            state="done",
+            modified=_now(),
+            doi=f"10.5072/zenodo.{deposition['id']}",
+        )
+        record = self.records.get(deposition["id"])
+        revision = 0 if record is None else record["revision"] + 1
+        self.records[deposition["id"]] = {
+            "created": deposition["created"] if record is None else record["created"],
+            "updated": _now(),
+            "revision": revision,
+            "deposition": deposition["id"],
+        }
+
+    def _new_version(self, deposition: dict) -> dict:
+        for version in self._versions(deposition):
+            if not version["submitted"]:
+                return version
+        draft = self._create(dict(deposition["metadata"]), deposition["conceptrecid"])
+        self.buckets[draft["bucket"]].update(self.buckets[deposition["bucket"]])
+        return draft
+
+    def _file_id(self, key: str) -> str:
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    def _deposition_json(self, deposition: dict) -> dict:
+        base = self.url
+        deposition_id = deposition["id"]
+        self_url = f"{base}/api/deposit/depositions/{deposition_id}"
+        bucket_url = self._bucket_url(deposition["bucket"])
+        links = {
+            "self": self_url,
+            "bucket": bucket_url,
+            "files": f"{self_url}/files",
+            "publish": f"{self_url}/actions/publish",
+            "newversion": f"{self_url}/actions/newversion",
+        }
+        versions = self._versions(deposition)
+        drafts = [x for x in versions if not x["submitted"]]
+        if drafts:
+            links["latest_draft"] = f"{base}/api/deposit/depositions/{drafts[0]['id']}"
+        published = [x for x in versions if x["submitted"]]
+        if published:
+            latest = max(published, key=lambda x: int(x["id"]))
+            links["latest"] = f"{base}/api/records/{latest['id']}"
+        files = [
+            {
+                "id": self._file_id(key),
+                "filename": key,
+                "filesize": str(len(data)),
+                "checksum": _md5(data),
+                "links": {
+                    "self": f"{self_url}/files/{self._file_id(key)}",
+                    "download": f"{bucket_url}/{key}",
+                },
+            }
+            for key, data in sorted(self.buckets[deposition["bucket"]].items())
+        ]
+        return {
+            "created": deposition["created"],
+            "doi": deposition["doi"],
+            "doi_url": (
+                None
+                if deposition["doi"] is None
+                else f"https://doi.org/" f"{deposition['doi']}"
+            ),
+            "files": files,
+            "id": deposition_id,
+            "links": links,
+            "metadata": deposition["metadata"],
+            "modified": deposition["modified"],
+            "owner": 1,
+            "record_id": int(deposition_id),
+            "record_url": None,
+            "state": deposition["state"],
+            "submitted": deposition["submitted"],
+            "title": deposition["metadata"].get("title", ""),
+            "conceptrecid": deposition["conceptrecid"],
+        }
+
+    def _record_json(self, record_id: str) -> dict:
+        record = self.records[record_id]
+        deposition = self.depositions[record["deposition"]]
+        bucket = deposition["bucket"]
+        bucket_url = self._bucket_url(bucket)
+        latest = max(
+            (x for x in self._versions(deposition) if x["submitted"]),
+            key=lambda x: int(x["id"]),
+        )
+        return {
+            "created": record["created"],
+            "updated": record["updated"],
+            "revision": record["revision"],
+            "doi": deposition["doi"],
+            "conceptdoi": f"10.5072/zenodo.{deposition['conceptrecid']}",
+            "conceptrecid": deposition["conceptrecid"],
+            "id": int(record_id),
+            "metadata": deposition["metadata"],
+            "owners": [1],
+            "stats": {},
+            "links": {
+                "self": f"{self.url}/api/records/{record_id}",
+                "latest": f"{self.url}/api/records/{latest['id']}",
+                "bucket": bucket_url,
+            },
+            "files": [
+                {
+                    "bucket": bucket,
+                    "checksum": f"md5:{_md5(data)}",
+                    "key": key,
+                    "links": {"self": f"{bucket_url}/{key}"},
+                    "size": len(data),
+                    "type": key.rpartition(".")[2],
+                }
+                for key, data in sorted(self.buckets[bucket].items())
+            ],
+        }
+
+    def _bucket_file_json(self, bucket: str, key: str) -> dict:
+        data = self.buckets[bucket][key]
+        url = f"{self._bucket_url(bucket)}/{key}"
+        return {
+            "key": key,
+            "mimetype": "application/octet-stream",
+            "checksum": f"md5:{_md5(data)}",
+            "version_id": uuid.uuid4().hex,
+            "size": len(data),
+            "created": _now(),
+            "updated": _now(),
+            "links": {"self": url, "version": url, "uploads": f"{url}?uploads"},
+            "is_head": True,
+            "delete_marker": False,
+        }
+
+    def _bucket_owner(self, bucket: str) -> Optional[dict]:
+        for deposition in self.depositions.values():
+            if deposition["bucket"] == bucket:
+                return deposition
+        return None
+
+    def _rate_limit_headers(self) -> tuple[bool, dict]:
+        if self.rate_limit is None:
+            return True, {}
+        now = time.time()
+        if now - self._window_start >= self.rate_window:
+            self._window_start, self._window_count = now, 0
+        self._window_count += 1
+        reset = self._window_start + self.rate_window
+        headers = {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(self.rate_limit - self._window_count, 0)),
+            "X-RateLimit-Reset": str(int(reset)),
+        }
+        allowed = self._window_count <= self.rate_limit
+        if not allowed:
+            headers["Retry-After"] = str(max(int(reset - now + 0.999), 1))
+        return allowed, headers
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        self.status: int = status
+        self.message: str = message
+
+
+def _page(
+    items: list, query: dict, max_size: Optional[int], default_size: int = 10
+) -> tuple[list, bool]:
+    page = int(query.get("page", ["1"])[0])
+    size = int(query.get("size", [str(default_size)])[0])
+    if max_size is not None:
+        size = min(size, max_size)
+    start = (page - 1) * size
+    return items[start : start + size], start + size < len(items)
+
+
+def _sorted(items: list[dict], query: dict, key: str) -> list[dict]:
+    sort = query.get("sort", ["mostrecent"])[0]
+    if sort.lstrip("-") != "mostrecent":
+        return items
+    return sorted(items, key=lambda x: x[key], reverse=not sort.startswith("-"))
+
+
+# A range of timestamps, e.g. updated:[2024-01-01T00\:00\:00 TO *]
+_RANGE = re.compile(r"(\w+):\[(\S+) TO (\S+)\]")
+
+
+def _timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("\\", ""))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _matches(q: Optional[str], item: dict) -> bool:
+    """Whether an item matches ranges of timestamps and a text in its metadata"""
+
+    if not q:
+        return True
+    for field, low, high in _RANGE.findall(q):
+        if item.get(field) is None:
+            return False
+        value = _timestamp(item[field])
+        if low != "*" and value < _timestamp(low):
+            return False
+        if high != "*" and value > _timestamp(high):
+            return False
+    text = " ".join(re.sub(r"\bAND\b|[()]", " ", _RANGE.sub(" ", q)).split())
+    return not text or text.lower() in json.dumps(item.get("metadata", {})).lower()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and bodies are written separately, avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+    fake: FakeZenodo
+
+    routes = [
+        ("GET", r"/api/deposit/depositions", "search_depositions"),
+        ("POST", r"/api/deposit/depositions", "create_deposition"),
+        ("GET", r"/api/deposit/depositions/(\w+)", "get_deposition"),
+        ("PUT", r"/api/deposit/depositions/(\w+)", "update_deposition"),
+        ("DELETE", r"/api/deposit/depositions/(\w+)", "delete_deposition"),
+        ("POST", r"/api/deposit/depositions/(\w+)/actions/publish", "publish"),
+        ("POST", r"/api/deposit/depositions/(\w+)/actions/newversion", "new_version"),
+        ("DELETE", r"/api/deposit/depositions/(\w+)/files/(\w+)", "delete_file"),
+        ("PUT", r"/api/files/(\w+)/(.+)", "put_object"),
+        ("POST", r"/api/files/(\w+)/(.+)", "post_object"),
+        ("GET", r"/api/files/(\w+)/(.+)", "get_object"),
+        ("DELETE", r"/api/files/(\w+)/(.+)", "delete_object"),
+        ("GET", r"/api/records", "search_records"),
+        ("GET", r"/api/records/(\w+)", "get_record"),
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    # Transport
+
+    def _throttle(self, size: int):
+        if self.fake.bandwidth:
+            time.sleep(size / self.fake.bandwidth)
+
+    def _read_body(self) -> bytes:
+        chunks = []
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                self._throttle(size)
+            return b"".join(chunks)
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining > 0:
+            chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+            self._throttle(len(chunk))
+        return b"".join(chunks)
+
+    def _send(
+        self,
+        status: int,
+        body: bytes = b"",
+        headers: Optional[dict] = None,
+        content_type: str = "application/json",
+    ):
+        self.send_response(status)
+        for name, value in {**self.extra_headers, **(headers or {})}.items():
+            self.send_header(name, value)
+        if body:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        for start in range(0, len(body), CHUNK_SIZE):
+            chunk = body[start : start + CHUNK_SIZE]
+            self.wfile.write(chunk)
+            self._throttle(len(chunk))
+
+    def _send_json(self, obj, status: int = 200, headers: Optional[dict] = None):
+        self._send(status, json.dumps(obj).encode(), headers)
+
+    def _send_cacheable(self, obj: dict, modified: str):
+        body = json.dumps(obj, sort_keys=True).encode()
+        headers = {
+            "ETag": f'"{_md5(body)}"',
+            "Last-Modified": format_datetime(_timestamp(modified), usegmt=True),
+        }
+        if "If-None-Match" in self.headers:
+            not_modified = self.headers["If-None-Match"] == headers["ETag"]
+        elif "If-Modified-Since" in self.headers:
+            since = parsedate_to_datetime(self.headers["If-Modified-Since"])
+            not_modified = _timestamp(modified).replace(microsecond=0) <= since
+        else:
+            not_modified = False
+        if not_modified:
+            return self._send(304, headers=headers)
+        self._send(200, body, headers)
+
+    def _handle(self, method: str):
+        fake = self.fake
+        url = urlparse(self.path)
+        self.query = parse_qs(url.query, keep_blank_values=True)
+        self.extra_headers: dict = {}
+        self.body = self._read_body() if method in ("POST", "PUT") else b""
+        if fake.latency:
+            time.sleep(fake.latency)
+        with fake._lock:
+            fake.requests.append((method, self.path))
+            allowed, self.extra_headers = fake._rate_limit_headers()
+            fault = next(
+                (f for f in fake._faults if f.matches(method, self.path)), None
+            )
+            if fault is not None:
+                fault.times -= 1
+            corruption = next(
+                (c for c in fake._corruptions if c.matches(method, self.path)), None
+            )
+            if corruption is not None and self.body:
+                corruption.times -= 1
+                self.body = bytes([self.body[0] ^ 0xFF]) + self.body[1:]
+        if not allowed:
+            return self._send_json({"status": 429, "message": "Too many requests"}, 429)
+        if fault is not None and not fault.applied:
+            return self._send_fault(fault)
+        if fake.token is not None:
+            if self.headers.get("Authorization") != f"Bearer {fake.token}":
+                return self._send_json({"status": 401, "message": "Unauthorized"}, 401)
+        if fault is None:
+            return self._route(method, url.path)
+
+        wfile, self.wfile = self.wfile, io.BytesIO()
+        try:
+            self._route(method, url.path)
+        finally:
+            self.wfile = wfile
+        self._send_fault(fault)
+
+    def _send_fault(self, fault: _Fault):
+        headers = {}
+        if fault.retry_after is not None:
+            headers["Retry-After"] = str(fault.retry_after)
+        message = {"status": fault.status, "message": "Injected fault"}
+        self._send_json(message, fault.status, headers)
+
+    def _route(self, method: str, path: str):
+        for route_method, pattern, name in self.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match is not None:
+                try:
+                    with self.fake._lock:
+                        return getattr(self, name)(*match.groups())
+                except _HTTPError as e:
+                    return self._send_json(
+                        {"status": e.status, "message": e.message}, e.status
+                    )
+        self._send_json({"status": 404, "message": "Not found"}, 404)
+
+    # Depositions
+
+    def _deposition(self, deposition_id: str) -> dict:
+        deposition = self.fake.depositions.get(deposition_id)
+        if deposition is None:
+            raise _HTTPError(404, "PID does not exist")
+        return deposition
+
+    def _draft(self, deposition_id: str) -> dict:
+        deposition = self._deposition(deposition_id)
+        if deposition["submitted"]:
+            raise _HTTPError(403, "The deposition is published")
+        return deposition
+
+    def search_depositions(self):
+        fake = self.fake
+        items = [fake._deposition_json(x) for x in fake.depositions.values()]
+        status = self.query.get("status", [None])[0]
+        if status == "draft":
+            items = [x for x in items if not x["submitted"]]
+        elif status == "published":
+            items = [x for x in items if x["submitted"]]
+        items = [x for x in items if _matches(self.query.get("q", [""])[0], x)]
+        items = _sorted(items, self.query, "created")
+        hits, more = _page(items, self.query, self.fake.max_page_size)
+        url = f"{fake.url}/api/deposit/depositions"
+        params = {k: v[0] for k, v in self.query.items()}
+        page = int(params.get("page", 1))
+        links = [f'<{url}?{urlencode({**params, "page": page})}>; rel="self"']
+        if more:
+            links.append(
+                f'<{url}?{urlencode({**params, "page": page + 1})}>; rel="next"'
+            )
+        self._send_json(hits, headers={"Link": ", ".join(links)})
+
+    def create_deposition(self):
+        body = json.loads(self.body or b"{}")
+        deposition = self.fake._create(body.get("metadata") or {})
+        self._send_json(self.fake._deposition_json(deposition), 201)
+
+    def get_deposition(self, deposition_id: str):
+        deposition = self._deposition(deposition_id)
+        self._send_cacheable(
+            self.fake._deposition_json(deposition), deposition["modified"]
+        )
+
+    def update_deposition(self, deposition_id: str):
+        deposition = self._draft(deposition_id)
+        deposition["metadata"] = json.loads(self.body)["metadata"]
+        deposition["modified"] = _now()
+        self._send_json(self.fake._deposition_json(deposition))
+
+    def delete_deposition(self, deposition_id: str):
+        deposition = self._draft(deposition_id)
+        del self.fake.depositions[deposition_id]
+        del self.fake.buckets[deposition["bucket"]]
+        self._send(204)
+
+    def publish(self, deposition_id: str):
+        deposition = self._draft(deposition_id)
+        self.fake._publish(deposition)
+        self._send_json(self.fake._deposition_json(deposition), 202)
+
+    def new_version(self, deposition_id: str):
+        deposition = self._deposition(deposition_id)
+        if not deposition["submitted"]:
+            raise _HTTPError(400, "The deposition is not published")
+        self.fake._new_version(deposition)
+        self._send_json(self.fake._deposition_json(deposition), 201)
+
+    def delete_file(self, deposition_id: str, file_id: str):
+        deposition = self._draft(deposition_id)
+        files = self.fake.buckets[deposition["bucket"]]
+        for key in list(files):
+            if self.fake._file_id(key) == file_id:
+                del files[key]
+                return self._send(204)
+        raise _HTTPError(404, "File does not exist")
+
+    # Buckets
+
+    def _bucket(self, bucket: str, writable: bool = False) -> dict[str, bytes]:
+        files = self.fake.buckets.get(bucket)
+        if files is None:
+            raise _HTTPError(404, "Bucket does not exist")
+        owner = self.fake._bucket_owner(bucket)
+        if writable and owner is not None and owner["submitted"]:
+            raise _HTTPError(403, "The bucket is locked")
+        return files
+
+    def put_object(self, bucket: str, key: str):
+        files = self._bucket(bucket, writable=True)
+        if "uploadId" in self.query:
+            upload = self.fake.uploads.get(self.query["uploadId"][0])
+            if upload is None:
+                raise _HTTPError(404, "Upload does not exist")
+            upload["parts"][int(self.query["partNumber"][0])] = self.body
+            return self._send_json({})
+        files[key] = self.body
+        self._send_json(self.fake._bucket_file_json(bucket, key), 201)
+
+    def post_object(self, bucket: str, key: str):
+        files = self._bucket(bucket, writable=True)
+        if "uploads" in self.query:
+            upload_id = uuid.uuid4().hex
+            self.fake.uploads[upload_id] = {"bucket": bucket, "key": key, "parts": {}}
+            return self._send_json({"id": upload_id}, 201)
+        upload = self.fake.uploads.pop(self.query.get("uploadId", [""])[0], None)
+        if upload is None:
+            raise _HTTPError(404, "Upload does not exist")
+        parts = upload["parts"]
+        files[key] = b"".join(parts[n] for n in sorted(parts))
+        self._send_json(self.fake._bucket_file_json(bucket, key))
+
+    def get_object(self, bucket: str, key: str):
+        if "uploadId" in self.query:
+            upload = self.fake.uploads.get(self.query["uploadId"][0])
+            if upload is None:
+                raise _HTTPError(404, "Upload does not exist")
+            parts = [{"part_number": n} for n in sorted(upload["parts"])]
+            return self._send_json({"parts": parts})
+        data = self._bucket(bucket).get(key)
+        if data is None:
+            raise _HTTPError(404, "Object does not exist")
+        if not self.fake.ranges:
+            return self._send(200, data, {}, "application/octet-stream")
+        headers = {"Accept-Ranges": "bytes"}
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match is None:
+            return self._send(200, data, headers, "application/octet-stream")
+        start = int(match.group(1))
+        end = int(match.group(2)) + 1 if match.group(2) else len(data)
+        end = min(end, len(data))
+        if start >= len(data):
+            raise _HTTPError(416, "Range not satisfiable")
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(data)}"
+        self._send(206, data[start:end], headers, "application/octet-stream")
+
+    def delete_object(self, bucket: str, key: str):
+        files = self._bucket(bucket, writable=True)
+        if files.pop(key, None) is None:
+            raise _HTTPError(404, "Object does not exist")
+        self._send(204)
+
+    # Records
+
+    def search_records(self):
+        fake = self.fake
+        items = [fake._record_json(x) for x in fake.records]
+        if self.query.get("all_versions", ["false"])[0].lower() not in ("1", "true"):
+            items = [x for x in items if x["links"]["latest"] == x["links"]["self"]]
+        items = [x for x in items if _matches(self.query.get("q", [""])[0], x)]
+        items = _sorted(items, self.query, "created")
+        hits, more = _page(items, self.query, self.fake.max_page_size)
+        url = f"{fake.url}/api/records"
+        params = {k: v[0] for k, v in self.query.items()}
+        page = int(params.get("page", 1))
+        links = {"self": f"{url}?{urlencode({**params, 'page': page})}"}
+        if more:
+            links["next"] = f"{url}?{urlencode({**params, 'page': page + 1})}"
+        self._send_json({"hits": {"hits": hits, "total": len(items)}, "links": links})
+
+    def get_record(self, record_id: str):
+        if record_id not in self.fake.records:
+            raise _HTTPError(404, "PID does not exist")
+        record = self.fake._record_json(record_id)
+        self._send_cacheable(record, record["updated"])